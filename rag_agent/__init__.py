@@ -12,15 +12,16 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import os
+# The agent is built on first access to `root_agent`, not at import: that is
+# when credentials are looked up and ADK and Vertex AI are loaded (see
+# agent.get_root_agent).
 
-import google.auth
+__all__ = ["root_agent"]
 
-_, project_id = google.auth.default()
-os.environ.setdefault("GOOGLE_CLOUD_PROJECT", project_id)
-os.environ.setdefault("GOOGLE_CLOUD_LOCATION", "europe-west4")  # Changed to europe-west4 for RAG Engine support
-os.environ.setdefault("GOOGLE_GENAI_USE_VERTEXAI", "True")
 
-from .agent import root_agent
+def __getattr__(name: str):
+    if name == "root_agent":
+        from .agent import get_root_agent
 
-__all__ = ["root_agent"]
+        return get_root_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
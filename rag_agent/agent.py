@@ -12,10 +12,14 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import os
+import asyncio
 import logging
+import os
+import threading
 import uuid
+from collections.abc import Awaitable, Callable
 from pathlib import Path
+
 import yaml
 from dotenv import load_dotenv
 
@@ -45,74 +49,534 @@ def load_config():
 
 load_config()
 
-from contextlib import contextmanager
-from google.adk.agents import Agent
-from google.adk.tools.retrieval.vertex_ai_rag_retrieval import VertexAiRagRetrieval
-from vertexai.preview import rag
+# Only light modules are imported here. ADK, Vertex AI and the retrieval
+# backends take seconds to import and set up, so the agent, its retrieval tool
+# and the Runner pool are built on first use (see get_root_agent); importing
+# this module, e.g. from the Temporal worker, stays cheap.
+from contextlib import nullcontext
 
 try:
-    from .prompts import return_instructions_root
+    from .cache import (
+        AnswerCache,
+        CacheLookup,
+        LRUTTLCache,
+        SemanticCache,
+        corpus_generation,
+        fingerprint,
+    )
+    from .catalog import resolve_corpus_name
+    from .prompts import (
+        return_instructions_history_summary,
+        return_instructions_root,
+        return_instructions_small_talk,
+    )
+    from .router import CORPUS, SMALL_TALK, classify_intent, is_escalation
+    from .telemetry import AgentRunTelemetry
 except ImportError:
-    from prompts import return_instructions_root  # loaded as top-level (e.g. from temporal worker)
+    # loaded as top-level (e.g. from temporal worker)
+    from cache import (
+        AnswerCache,
+        CacheLookup,
+        LRUTTLCache,
+        SemanticCache,
+        corpus_generation,
+        fingerprint,
+    )
+    from catalog import resolve_corpus_name
+    from prompts import (
+        return_instructions_history_summary,
+        return_instructions_root,
+        return_instructions_small_talk,
+    )
+    from router import CORPUS, SMALL_TALK, classify_intent, is_escalation
+    from telemetry import AgentRunTelemetry
 
-try:
-    from openinference.instrumentation import using_session
-except ImportError:
-    # Optional: openinference-instrumentation-google-adk not installed (tracing disabled)
-    @contextmanager
-    def using_session(session_id=None):
-        yield
-    logger.info("openinference not installed; tracing disabled")
-
-
-ask_vertex_retrieval = VertexAiRagRetrieval(
-    name='retrieve_rag_documentation',
-    description=(
-        'Use this tool to retrieve documentation and reference materials for the question from the RAG corpus,'
-    ),
-    rag_resources=[
-        rag.RagResource(
-            # please fill in your own rag corpus
-            # here is a sample rag corpus for testing purpose
-            # e.g. projects/123/locations/us-central1/ragCorpora/456
-            rag_corpus=os.environ.get("RAG_CORPUS")
+
+MODEL = os.environ.get("ROOT_AGENT_MODEL", "gemini-2.0-flash-001")
+# Tool-less model for small talk routed around the root agent (see router.py).
+SMALL_TALK_MODEL = os.environ.get("SMALL_TALK_MODEL", "gemini-2.0-flash-lite-001")
+
+# Guards the lazily built singletons below; re-entrant because building the
+# agent builds the retrieval tool.
+_init_lock = threading.RLock()
+
+
+def _default_google_environment() -> None:
+    """Fill in the Google Cloud settings the agent needs, on first use.
+
+    google.auth.default() looks for credentials (possibly asking the metadata
+    server), so it only runs when the project isn't configured already.
+    """
+    if not os.environ.get("GOOGLE_CLOUD_PROJECT"):
+        import google.auth
+
+        _, project_id = google.auth.default()
+        if project_id:
+            os.environ["GOOGLE_CLOUD_PROJECT"] = project_id
+    os.environ.setdefault("GOOGLE_CLOUD_LOCATION", "europe-west4")  # Changed to europe-west4 for RAG Engine support
+    os.environ.setdefault("GOOGLE_GENAI_USE_VERTEXAI", "True")
+
+
+_rag_corpus: str | None = None
+
+
+def get_rag_corpus() -> str:
+    """RAG_CORPUS as a resource name; it may be configured as a display name looked up in the local catalog."""
+    global _rag_corpus
+    if _rag_corpus is None:
+        with _init_lock:
+            if _rag_corpus is None:
+                _rag_corpus = resolve_corpus_name(os.environ.get("RAG_CORPUS") or "")
+    return _rag_corpus
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    return os.environ.get(name, str(default)).strip().lower() in ("1", "true", "yes", "on")
+
+
+def build_answer_cache() -> AnswerCache | None:
+    """Build the answer cache from ANSWER_CACHE_* settings (None when disabled)."""
+    if not _env_flag("ANSWER_CACHE_ENABLED", True):
+        return None
+    ttl = float(os.environ.get("ANSWER_CACHE_TTL_SECONDS", 3600))
+    exact = LRUTTLCache(
+        max_entries=int(os.environ.get("ANSWER_CACHE_MAX_ENTRIES", 1024)),
+        ttl_seconds=ttl,
+    )
+    if not _env_flag("ANSWER_CACHE_SEMANTIC", False):
+        return AnswerCache(exact)
+    semantic = SemanticCache(
+        max_entries=int(os.environ.get("ANSWER_CACHE_SEMANTIC_MAX_ENTRIES", 512)),
+        max_distance=float(os.environ.get("ANSWER_CACHE_SEMANTIC_MAX_DISTANCE", 0.05)),
+        ttl_seconds=ttl,
+    )
+    try:
+        from .embeddings import VertexTextEmbedder
+    except ImportError:
+        from embeddings import VertexTextEmbedder
+    return AnswerCache(exact, semantic, VertexTextEmbedder())
+
+
+answer_cache = build_answer_cache()
+
+
+def answer_cache_namespace(route: str = CORPUS) -> str:
+    """Cached answers are only valid for the same route, corpus contents, model and instructions."""
+    if route == SMALL_TALK:
+        return "|".join((SMALL_TALK, SMALL_TALK_MODEL, fingerprint(return_instructions_small_talk())))
+    backend = getattr(get_retrieval_tool(), "backend", None)
+    if backend is not None:
+        corpus = repr(backend.cache_identity())
+    else:
+        rag_corpus = get_rag_corpus()
+        corpus = f"{rag_corpus}@{corpus_generation(rag_corpus)}"
+    return "|".join((
+        CORPUS,
+        corpus,
+        MODEL,
+        fingerprint(return_instructions_root()),
+    ))
+
+
+RETRIEVAL_BACKEND = os.environ.get("RETRIEVAL_BACKEND", "vertex")
+LOCAL_INDEX_DIR = os.environ.get("LOCAL_INDEX_DIR", str(Path(__file__).parent / "local_index"))
+
+
+def build_retrieval_tool(
+    name: str,
+    description: str,
+    rag_resources: list,
+    similarity_top_k: int,
+    vector_distance_threshold: float,
+):
+    """Build the retrieval tool for RETRIEVAL_BACKEND ("vertex", "vertex-builtin" or "local").
+
+    The Vertex backend sits behind a local result cache unless
+    RETRIEVAL_CACHE_ENABLED is off. Adaptive top-k, near-duplicate removal
+    and context packing are switched separately, by RETRIEVAL_ADAPTIVE_ENABLED.
+    "vertex-builtin" uses the stock VertexAiRagRetrieval (Gemini's built-in
+    retrieval), with none of these. The local backend searches the index in
+    LOCAL_INDEX_DIR, built by build_local_index.py.
+    """
+    try:
+        from .retrieval import LocalIndexBackend, RetrievalTool, VertexRagBackend
+    except ImportError:
+        from retrieval import LocalIndexBackend, RetrievalTool, VertexRagBackend
+
+    # Adaptive top-k, near-duplicate removal and context packing;
+    # RETRIEVAL_INITIAL_TOP_K equal to similarity_top_k, RETRIEVAL_DEDUP_MAX_BITS=-1
+    # and RETRIEVAL_CONTEXT_TOKENS=0 turn them off one at a time.
+    if _env_flag("RETRIEVAL_ADAPTIVE_ENABLED", True):
+        budget = int(os.environ.get("RETRIEVAL_CONTEXT_TOKENS", 3000))
+        dedup_max_bits = int(os.environ.get("RETRIEVAL_DEDUP_MAX_BITS", 6))
+        adaptive = {
+            "initial_top_k": int(os.environ.get("RETRIEVAL_INITIAL_TOP_K", 4)),
+            "strong_distance": float(os.environ.get("RETRIEVAL_STRONG_DISTANCE", 0.4)),
+            "min_strong": int(os.environ.get("RETRIEVAL_MIN_STRONG", 2)),
+            "context_token_budget": budget or None,
+            "dedup_max_bits": dedup_max_bits if dedup_max_bits >= 0 else None,
+        }
+    else:
+        adaptive = {"dedup_max_bits": None}
+
+    if RETRIEVAL_BACKEND == "local":
+        max_distance = os.environ.get("LOCAL_INDEX_MAX_DISTANCE")
+        return RetrievalTool(
+            name=name,
+            description=description,
+            backend=LocalIndexBackend(
+                LOCAL_INDEX_DIR, nprobe=int(os.environ.get("LOCAL_INDEX_NPROBE", 16))
+            ),
+            similarity_top_k=similarity_top_k,
+            vector_distance_threshold=float(max_distance) if max_distance else None,
+            **adaptive,
+        )
+    if RETRIEVAL_BACKEND == "vertex-builtin":
+        from google.adk.tools.retrieval.vertex_ai_rag_retrieval import (
+            VertexAiRagRetrieval,
         )
-    ],
-    similarity_top_k=10,
-    vector_distance_threshold=0.6,
-)
-
-with using_session(session_id=uuid.uuid4()):
-    root_agent = Agent(
-        model='gemini-2.0-flash-001',
-        name='ask_rag_agent',
-        instruction=return_instructions_root(),
-        tools=[
-            ask_vertex_retrieval,
-        ]
+
+        return VertexAiRagRetrieval(
+            name=name,
+            description=description,
+            rag_resources=rag_resources,
+            similarity_top_k=similarity_top_k,
+            vector_distance_threshold=vector_distance_threshold,
+        )
+    if RETRIEVAL_BACKEND != "vertex":
+        raise ValueError(
+            f"Unknown RETRIEVAL_BACKEND {RETRIEVAL_BACKEND!r}; use 'vertex', 'vertex-builtin' or 'local'"
+        )
+    cache = None
+    if _env_flag("RETRIEVAL_CACHE_ENABLED", True):
+        cache = LRUTTLCache(
+            max_entries=int(os.environ.get("RETRIEVAL_CACHE_MAX_ENTRIES", 2048)),
+            ttl_seconds=float(os.environ.get("RETRIEVAL_CACHE_TTL_SECONDS", 600)),
+        )
+    return RetrievalTool(
+        name=name,
+        description=description,
+        backend=VertexRagBackend(rag_resources=rag_resources),
+        similarity_top_k=similarity_top_k,
+        vector_distance_threshold=vector_distance_threshold,
+        cache=cache,
+        **adaptive,
+    )
+
+
+_ask_vertex_retrieval = None
+
+
+def get_retrieval_tool():
+    """The agent's retrieval tool, built on first use."""
+    global _ask_vertex_retrieval
+    if _ask_vertex_retrieval is None:
+        with _init_lock:
+            if _ask_vertex_retrieval is None:
+                _default_google_environment()
+                from vertexai.preview import rag
+
+                _ask_vertex_retrieval = build_retrieval_tool(
+                    name='retrieve_rag_documentation',
+                    description=(
+                        'Use this tool to retrieve documentation and reference materials for the question from the RAG corpus,'
+                    ),
+                    rag_resources=[
+                        rag.RagResource(
+                            # please fill in your own rag corpus
+                            # here is a sample rag corpus for testing purpose
+                            # e.g. projects/123/locations/us-central1/ragCorpora/456
+                            rag_corpus=get_rag_corpus() or None
+                        )
+                    ],
+                    similarity_top_k=10,
+                    vector_distance_threshold=0.6,
+                )
+    return _ask_vertex_retrieval
+
+
+def _tracing_session():
+    try:
+        from openinference.instrumentation import using_session
+    except ImportError:
+        # Optional: openinference-instrumentation-google-adk not installed (tracing disabled)
+        logger.info("openinference not installed; tracing disabled")
+        return nullcontext()
+    return using_session(session_id=uuid.uuid4())
+
+
+_root_agent = None
+
+
+def get_root_agent():
+    """The root agent, built (with its retrieval tool) on first use."""
+    global _root_agent
+    if _root_agent is None:
+        with _init_lock:
+            if _root_agent is None:
+                from google.adk.agents import Agent
+
+                retrieval_tool = get_retrieval_tool()
+                with _tracing_session():
+                    _root_agent = Agent(
+                        model=MODEL,
+                        name='ask_rag_agent',
+                        instruction=return_instructions_root(),
+                        tools=[
+                            retrieval_tool,
+                        ]
+                    )
+    return _root_agent
+
+
+def __getattr__(name: str):
+    # `root_agent` and friends are still importable from this module (ADK's
+    # agent loader looks for `root_agent`), but are only built when accessed.
+    if name == "root_agent":
+        return get_root_agent()
+    if name == "ask_vertex_retrieval":
+        return get_retrieval_tool()
+    if name == "RAG_CORPUS":
+        return get_rag_corpus()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+ROUTER_ENABLED = _env_flag("ROUTER_ENABLED", True)
+ROUTER_MIN_CONFIDENCE = float(os.environ.get("ROUTER_MIN_CONFIDENCE", 0.8))
+ROUTER_CASCADE = _env_flag("ROUTER_CASCADE", False)
+
+
+def build_small_talk_agent(model=None):
+    from google.adk.agents import Agent
+
+    return Agent(
+        model=model or SMALL_TALK_MODEL,
+        name='small_talk_agent',
+        instruction=return_instructions_small_talk(),
     )
 
 
-async def ask_rag_agent(query: str) -> str:
-    """Async entrypoint: run the RAG agent and return the response text."""
+_runner_pool = None
+
+
+def get_runner_pool():
+    """Process-wide Runner and session pool shared by every ask_rag_agent call."""
+    global _runner_pool
+    if _runner_pool is None:
+        with _init_lock:
+            if _runner_pool is None:
+                try:
+                    from .runner_pool import RunnerPool
+                except ImportError:
+                    from runner_pool import RunnerPool
+
+                _runner_pool = RunnerPool(
+                    agent=get_root_agent(),
+                    app_name="rag_agent",
+                    idle_ttl_seconds=float(os.environ.get("SESSION_IDLE_TTL_SECONDS", 900)),
+                )
+    return _runner_pool
+
+
+SESSION_DB_PATH = os.environ.get("SESSION_DB_PATH", str(Path(__file__).parent / "sessions.db"))
+SESSION_HISTORY_TOKENS = int(os.environ.get("SESSION_HISTORY_TOKENS", 2000))
+SESSION_SUMMARIZE = _env_flag("SESSION_SUMMARIZE", False)
+SESSION_RETENTION_SECONDS = float(os.environ.get("SESSION_RETENTION_SECONDS", 7 * 24 * 3600))
+
+
+async def _summarize_history(summary: str, turns: list[tuple[str, str]]) -> str:
+    """Fold `turns` into `summary` with the small model."""
+    from google import genai
+    from google.genai import types
+
+    transcript = "\n".join(f"{role}: {text}" for role, text in turns)
+    response = await genai.Client().aio.models.generate_content(
+        model=SMALL_TALK_MODEL,
+        contents=f"Summary so far:\n{summary or '(none)'}\n\nTurns to fold in:\n{transcript}",
+        config=types.GenerateContentConfig(system_instruction=return_instructions_history_summary()),
+    )
+    return (response.text or summary).strip()
+
+
+_conversation_pool = None
+
+
+def get_conversation_pool():
+    """Runner pool for multi-turn sessions, persisted to SESSION_DB_PATH; built on first use."""
+    global _conversation_pool
+    if _conversation_pool is None:
+        with _init_lock:
+            if _conversation_pool is None:
+                try:
+                    from .runner_pool import RunnerPool
+                    from .sessions import SqliteSessionService
+                except ImportError:
+                    from runner_pool import RunnerPool
+                    from sessions import SqliteSessionService
+
+                _conversation_pool = RunnerPool(
+                    agent=get_root_agent(),
+                    app_name="rag_agent",
+                    session_service=SqliteSessionService(
+                        SESSION_DB_PATH,
+                        history_token_budget=SESSION_HISTORY_TOKENS,
+                        summarizer=_summarize_history if SESSION_SUMMARIZE else None,
+                        retention_seconds=SESSION_RETENTION_SECONDS,
+                    ),
+                    idle_ttl_seconds=float(os.environ.get("SESSION_IDLE_TTL_SECONDS", 900)),
+                    delete_on_evict=False,
+                )
+    return _conversation_pool
+
+
+_small_talk_pool = None
+
+
+def get_small_talk_pool():
+    """Runner pool for the small-talk agent, built on first use."""
+    global _small_talk_pool
+    if _small_talk_pool is None:
+        with _init_lock:
+            if _small_talk_pool is None:
+                try:
+                    from .runner_pool import RunnerPool
+                except ImportError:
+                    from runner_pool import RunnerPool
+
+                _default_google_environment()
+                _small_talk_pool = RunnerPool(
+                    agent=build_small_talk_agent(),
+                    app_name="rag_agent_small_talk",
+                    idle_ttl_seconds=float(os.environ.get("SESSION_IDLE_TTL_SECONDS", 900)),
+                )
+    return _small_talk_pool
+
+
+def warm_up() -> None:
+    """Build the agent, its retrieval tool and the Runner pools ahead of the first request."""
+    get_runner_pool()
+    if ROUTER_ENABLED:
+        get_small_talk_pool()
+
+
+async def _run_agent(
+    pool,
+    query: str,
+    on_partial: Callable[[str], Awaitable[None]] | None,
+    user_id: str = "temporal",
+    session_id: str | None = None,
+) -> list[str]:
+    """Run `pool`'s agent on `query`; returns the text of its final events.
+
+    Without `session_id` the run gets a fresh session that is deleted
+    afterwards; with one, that session is continued (or created) and kept.
+    """
     from google.adk.agents.run_config import RunConfig, StreamingMode
-    from google.adk.runners import Runner
-    from google.adk.sessions import InMemorySessionService
     from google.genai import types
 
-    session_service = InMemorySessionService()
-    session = await session_service.create_session(user_id="temporal", app_name="rag_agent")
-    runner = Runner(agent=root_agent, session_service=session_service, app_name="rag_agent")
     message = types.Content(role="user", parts=[types.Part.from_text(text=query)])
     parts = []
-    async for event in runner.run_async(
-        new_message=message,
-        user_id="temporal",
-        session_id=session.id,
-        run_config=RunConfig(streaming_mode=StreamingMode.SSE),
-    ):
-        if event.content and event.content.parts:
-            for part in event.content.parts:
-                if getattr(part, "text", None):
-                    parts.append(part.text)
-    return "\n".join(parts) if parts else "No response from agent."
+    run_telemetry = AgentRunTelemetry(model=pool.runner.agent.model)
+    async with pool.session(user_id, session_id, keep=session_id is not None) as session_id:
+        async for event in pool.runner.run_async(
+            new_message=message,
+            user_id=user_id,
+            session_id=session_id,
+            run_config=RunConfig(streaming_mode=StreamingMode.SSE),
+        ):
+            if not (event.content and event.content.parts):
+                continue
+            run_telemetry.observe(event)
+            texts = [part.text for part in event.content.parts if getattr(part, "text", None)]
+            if event.partial:
+                if on_partial is not None:
+                    for text in texts:
+                        await on_partial(text)
+            else:
+                parts.extend(texts)
+    return parts
+
+
+async def _answer_small_talk(query: str, on_partial) -> list[str] | None:
+    """Answer with the small-talk agent; None if it escalates."""
+    # Hold back streamed text until we know the reply isn't an escalation.
+    parts = await _run_agent(get_small_talk_pool(), query, on_partial=None)
+    if not parts or is_escalation("".join(parts)):
+        logger.info("Small-talk agent escalated to the root agent")
+        return None
+    if on_partial is not None:
+        await on_partial("\n".join(parts))
+    return parts
+
+
+async def _cached_answer(query: str, route: str) -> CacheLookup | None:
+    """Look `query` up in the answer cache under `route`'s namespace; None when caching is off."""
+    if answer_cache is None:
+        return None
+    if answer_cache.semantic is not None:
+        # The semantic tier makes a blocking embedding call.
+        lookup = await asyncio.to_thread(answer_cache.get, query, answer_cache_namespace(route))
+    else:
+        lookup = answer_cache.get(query, answer_cache_namespace(route))
+    if lookup.answer is not None:
+        logger.info(f"Answer cache hit ({lookup.tier})")
+    return lookup
+
+
+async def _cache_hit(
+    answer: str, on_partial: Callable[[str], Awaitable[None]] | None
+) -> str:
+    """Return a cached answer, streaming it as one delta so streaming clients see it too."""
+    if on_partial is not None:
+        await on_partial(answer)
+    return answer
+
+
+async def ask_rag_agent(
+    query: str,
+    on_partial: Callable[[str], Awaitable[None]] | None = None,
+    *,
+    user_id: str | None = None,
+    session_id: str | None = None,
+) -> str:
+    """Async entrypoint: run the RAG agent and return the response text.
+
+    Small talk is routed to a tool-less small model first (see router.py).
+    With SSE streaming the runner yields partial events carrying text deltas,
+    followed by a final event with the aggregated text. Deltas are passed to
+    `on_partial` as they arrive; only final events make up the returned answer.
+
+    With `session_id`, the query is one turn of a persistent conversation
+    (see sessions.py): the root agent sees the session's earlier turns, and
+    the answer cache and router are skipped since answers depend on them.
+    """
+    if session_id is not None:
+        # Answers depend on the conversation so far, so the same question can
+        # need a different answer in each session (or later in this one): a
+        # cached answer would ignore that history, and the router's small-talk
+        # model doesn't see it at all.
+        parts = await _run_agent(
+            get_conversation_pool(), query, on_partial, user_id=user_id or "anonymous", session_id=session_id
+        )
+        return "\n".join(parts) if parts else "No response from agent."
+
+    parts = None
+    if ROUTER_ENABLED:
+        route = classify_intent(query)
+        if route.intent == SMALL_TALK and (ROUTER_CASCADE or route.confidence >= ROUTER_MIN_CONFIDENCE):
+            lookup = await _cached_answer(query, SMALL_TALK)
+            if lookup is not None and lookup.answer is not None:
+                return await _cache_hit(lookup.answer, on_partial)
+            parts = await _answer_small_talk(query, on_partial)
+    if parts is None:
+        # Escalated small talk is answered, and cached, by the root agent.
+        lookup = await _cached_answer(query, CORPUS)
+        if lookup is not None and lookup.answer is not None:
+            return await _cache_hit(lookup.answer, on_partial)
+        parts = await _run_agent(get_runner_pool(), query, on_partial)
+    if not parts:
+        return "No response from agent."
+    answer = "\n".join(parts)
+    if lookup is not None:
+        answer_cache.put(lookup, answer)
+    return answer
@@ -0,0 +1,292 @@
+"""
+Offline micro-benchmarks for each stage of the request hot path.
+
+Uses a fake Gemini model and a fake retrieval backend (see fakes.py), so no
+network or credentials are needed. The workflow stage runs RAGAgentWorkflow
+in Temporal's time-skipping test environment (downloaded and cached by the
+SDK on first use) against a stub activity; it is skipped if that environment
+can't start.
+
+    python rag_agent/benchmarks/bench_components.py
+    python rag_agent/benchmarks/bench_components.py --compare rag_agent/benchmarks/results/components-abc1234.json
+
+Each stage reports p50/p95/p99 latency, and from a separate tracemalloc pass
+the peak memory allocated per call and the memory still retained afterwards.
+Results are written as JSON (by default to benchmarks/results/, named after
+the current commit) so runs can be compared across commits.
+"""
+
+import argparse
+import asyncio
+import dataclasses
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+import uuid
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+
+_root = Path(__file__).resolve().parent.parent
+for _path in (_root, _root / "temporal", Path(__file__).resolve().parent):
+    if str(_path) not in sys.path:
+        sys.path.insert(0, str(_path))
+
+# Run as a script: fakes.py and the agent's modules are importable once the
+# directories above are on the path.
+from fakes import (  # noqa: E402
+    FakeGemini,
+    FakeRetrievalBackend,
+    fake_retrieval_tool,
+    install_fake_agent,
+)
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+QUERY = "What does the annual report say about research and development spending?"
+
+
+def percentile(samples: list[float], q: float) -> float:
+    """Nearest-rank percentile of sorted `samples`."""
+    index = max(0, min(len(samples) - 1, round(q / 100 * len(samples)) - 1))
+    return samples[index]
+
+
+async def measure(
+    name: str,
+    fn: Callable[[], Awaitable[object]],
+    iterations: int,
+    warmup: int = 20,
+    alloc_iterations: int = 50,
+) -> dict:
+    for _ in range(warmup):
+        await fn()
+
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+
+    # Allocation pass, kept separate because tracing slows everything down.
+    tracemalloc.start()
+    peaks = []
+    baseline = tracemalloc.get_traced_memory()[0]
+    for _ in range(alloc_iterations):
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        await fn()
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+
+    result = {
+        "iterations": iterations,
+        "mean_us": statistics.fmean(samples),
+        "p50_us": percentile(samples, 50),
+        "p95_us": percentile(samples, 95),
+        "p99_us": percentile(samples, 99),
+        "alloc_peak_kib": statistics.median(peaks) / 1024,
+        "retained_kib_per_call": retained / alloc_iterations / 1024,
+    }
+    print(
+        f"{name:<34} p50={result['p50_us']:10.1f}us  p95={result['p95_us']:10.1f}us  "
+        f"p99={result['p99_us']:10.1f}us  alloc={result['alloc_peak_kib']:8.1f}KiB  "
+        f"retained={result['retained_kib_per_call']:6.2f}KiB/call"
+    )
+    return result
+
+
+async def bench_retrieval(results: dict, iterations: int) -> None:
+    from cache import LRUTTLCache
+
+    uncached = fake_retrieval_tool(FakeRetrievalBackend())
+    results["retrieval_tool.miss"] = await measure(
+        "retrieval_tool.miss", lambda: uncached.retrieve(QUERY), iterations
+    )
+    cached = fake_retrieval_tool(
+        FakeRetrievalBackend(), cache=LRUTTLCache(max_entries=128, ttl_seconds=600)
+    )
+    results["retrieval_tool.hit"] = await measure(
+        "retrieval_tool.hit", lambda: cached.retrieve(QUERY), iterations
+    )
+
+
+async def bench_answer_cache(results: dict, iterations: int) -> None:
+    from cache import AnswerCache, LRUTTLCache
+
+    cache = AnswerCache(LRUTTLCache(max_entries=1024, ttl_seconds=3600))
+    cache.put(cache.get(QUERY, "bench"), "cached answer")
+
+    async def lookup() -> None:
+        assert cache.get(QUERY, "bench").answer is not None
+
+    results["answer_cache.exact_hit"] = await measure(
+        "answer_cache.exact_hit", lookup, iterations
+    )
+
+
+async def bench_agent(results: dict, iterations: int, model: FakeGemini) -> None:
+    agent = install_fake_agent(model)
+
+    results["ask_rag_agent"] = await measure(
+        "ask_rag_agent", lambda: agent.ask_rag_agent(QUERY), iterations
+    )
+
+    async def on_partial(text: str) -> None:
+        pass
+
+    results["ask_rag_agent.streaming"] = await measure(
+        "ask_rag_agent.streaming",
+        lambda: agent.ask_rag_agent(QUERY, on_partial=on_partial),
+        iterations,
+    )
+    results["ask_rag_agent.small_talk"] = await measure(
+        "ask_rag_agent.small_talk",
+        lambda: agent.ask_rag_agent("Hello there!"),
+        iterations,
+    )
+
+
+async def bench_activity(results: dict, iterations: int, model: FakeGemini) -> None:
+    from temporalio.testing import ActivityEnvironment
+
+    import activities
+
+    install_fake_agent(model)
+    env = ActivityEnvironment()
+    # Attempt 1 raises the demo failure; measure the successful path.
+    env.info = dataclasses.replace(env.info, attempt=2)
+    results["activity.retrieve_and_generate"] = await measure(
+        "activity.retrieve_and_generate",
+        lambda: env.run(activities.retrieve_and_generate, QUERY),
+        iterations,
+    )
+
+
+async def bench_workflow(results: dict, iterations: int) -> None:
+    from temporalio import activity
+    from temporalio.testing import WorkflowEnvironment
+    from temporalio.worker import Worker
+
+    from workflow import RAGAgentWorkflow
+
+    @activity.defn(name="retrieve_and_generate")
+    async def stub_retrieve_and_generate(query: str, stream: bool = False) -> str:
+        return "stub answer"
+
+    try:
+        env = await WorkflowEnvironment.start_time_skipping()
+    except Exception as e:
+        print(f"{'workflow.RAGAgentWorkflow':<34} skipped: {e}")
+        return
+    task_queue = f"bench-{uuid.uuid4()}"
+    async with env:
+        async with Worker(
+            env.client,
+            task_queue=task_queue,
+            workflows=[RAGAgentWorkflow],
+            activities=[stub_retrieve_and_generate],
+        ):
+
+            async def run_workflow() -> None:
+                await env.client.execute_workflow(
+                    RAGAgentWorkflow.run,
+                    QUERY,
+                    id=f"bench-{uuid.uuid4()}",
+                    task_queue=task_queue,
+                )
+
+            results["workflow.RAGAgentWorkflow"] = await measure(
+                "workflow.RAGAgentWorkflow",
+                run_workflow,
+                iterations,
+                warmup=5,
+                alloc_iterations=10,
+            )
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=_root,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results: dict, baseline_path: str) -> None:
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nvs {baseline_path} ({baseline.get('commit')}):")
+    for name, result in results.items():
+        old = baseline["results"].get(name)
+        if old is None:
+            continue
+        print(
+            f"{name:<34} p50 {100 * (result['p50_us'] / old['p50_us'] - 1):+6.1f}%  "
+            f"p99 {100 * (result['p99_us'] / old['p99_us'] - 1):+6.1f}%  "
+            f"alloc {result['alloc_peak_kib'] - old['alloc_peak_kib']:+8.1f}KiB"
+        )
+
+
+async def main(args) -> None:
+    model = FakeGemini(answer_chunks=args.answer_chunks)
+    results: dict = {}
+    stages = {
+        "retrieval": lambda: bench_retrieval(results, args.iterations),
+        "answer_cache": lambda: bench_answer_cache(results, args.iterations),
+        "agent": lambda: bench_agent(results, args.iterations, model),
+        "activity": lambda: bench_activity(results, args.iterations, model),
+        "workflow": lambda: bench_workflow(results, args.workflow_iterations),
+    }
+    for name, run in stages.items():
+        if not args.only or name in args.only:
+            await run()
+
+    commit = git_commit()
+    output = args.json or str(RESULTS_DIR / f"components-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(
+            {
+                "benchmark": "components",
+                "commit": commit,
+                "timestamp": time.time(),
+                "python": sys.version.split()[0],
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+    print(f"\nResults written to {output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=300)
+    parser.add_argument("--workflow-iterations", type=int, default=50)
+    parser.add_argument(
+        "--answer-chunks", type=int, default=8, help="Streamed chunks per fake answer"
+    )
+    parser.add_argument(
+        "--only",
+        action="append",
+        choices=["retrieval", "answer_cache", "agent", "activity", "workflow"],
+        help="Run only these stages (repeatable)",
+    )
+    parser.add_argument(
+        "--json",
+        help="Results file (default: benchmarks/results/components-<commit>.json)",
+    )
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    asyncio.run(main(parser.parse_args()))
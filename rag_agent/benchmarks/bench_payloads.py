@@ -0,0 +1,293 @@
+"""
+Benchmark workflow history size and replay time with and without the payload codec.
+
+Needs no Temporal server: for each answer size, RAGAgentWorkflow histories are
+built event by event the way the server records a streamed answer (the
+query, one `publish_partial` signal and workflow task per streamed delta, the
+activity result and the workflow result), with every payload encoded by the
+data converter under test, and then replayed with Temporal's Replayer using
+the same converter. Answer text is cut from the repository's Markdown files,
+so it compresses like real prose rather than like synthetic filler.
+
+    python rag_agent/benchmarks/bench_payloads.py
+    python rag_agent/benchmarks/bench_payloads.py --answer-chars 4000 --deltas 40 --json payloads.json
+
+Codecs compared: "plain" (the SDK's default converter), "zlib", "zstd" (when
+the zstandard package is installed) and "zlib+offload", which also offloads
+payloads over --offload-bytes to a local blob store in a temporary directory.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections.abc import AsyncIterator
+from pathlib import Path
+
+from temporalio.api.common.v1 import ActivityType, Payloads, WorkflowType
+from temporalio.api.enums.v1 import EventType
+from temporalio.api.history.v1 import (
+    ActivityTaskCompletedEventAttributes,
+    ActivityTaskScheduledEventAttributes,
+    ActivityTaskStartedEventAttributes,
+    HistoryEvent,
+    WorkflowExecutionCompletedEventAttributes,
+    WorkflowExecutionSignaledEventAttributes,
+    WorkflowExecutionStartedEventAttributes,
+    WorkflowTaskCompletedEventAttributes,
+    WorkflowTaskScheduledEventAttributes,
+    WorkflowTaskStartedEventAttributes,
+)
+from temporalio.api.taskqueue.v1 import TaskQueue
+from temporalio.client import WorkflowHistory
+from temporalio.converter import DataConverter, default
+from temporalio.worker import Replayer
+
+_root = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(_root / "temporal"), str(_root)]
+
+# The worker's modules are importable once rag_agent/temporal/ is on the path.
+from codec import CompressionCodec, LocalBlobStore, data_converter, zstandard  # noqa: E402
+from shared import TASK_QUEUE, PartialAnswer  # noqa: E402
+from workflow import RAGAgentWorkflow  # noqa: E402
+
+QUERY = "What does the annual report say about research and development spending?"
+
+
+def corpus_text() -> str:
+    return " ".join(
+        " ".join(path.read_text().split()) for path in sorted(_root.parent.glob("*.md"))
+    )
+
+
+def answer_text(corpus: str, chars: int, rng: random.Random) -> str:
+    """`chars` characters of prose from a random offset in `corpus` (repeated if it is shorter)."""
+    text = corpus * (chars // len(corpus) + 2)
+    start = rng.randrange(len(corpus))
+    return text[start : start + chars]
+
+
+class HistoryBuilder:
+    """Appends history events in order, encoding payloads with `converter`."""
+
+    def __init__(self, converter: DataConverter):
+        self.converter = converter
+        self.events: list[HistoryEvent] = []
+        self.task_queue = TaskQueue(name=TASK_QUEUE)
+
+    async def payloads(self, *values) -> Payloads:
+        return Payloads(payloads=await self.converter.encode(list(values)))
+
+    def add(self, event_type: int, **attributes) -> int:
+        event = HistoryEvent(
+            event_id=len(self.events) + 1, event_type=event_type, **attributes
+        )
+        event.event_time.GetCurrentTime()
+        self.events.append(event)
+        return event.event_id
+
+    def workflow_task(self) -> int:
+        scheduled = self.add(
+            EventType.EVENT_TYPE_WORKFLOW_TASK_SCHEDULED,
+            workflow_task_scheduled_event_attributes=WorkflowTaskScheduledEventAttributes(
+                task_queue=self.task_queue
+            ),
+        )
+        started = self.add(
+            EventType.EVENT_TYPE_WORKFLOW_TASK_STARTED,
+            workflow_task_started_event_attributes=WorkflowTaskStartedEventAttributes(
+                scheduled_event_id=scheduled
+            ),
+        )
+        return self.add(
+            EventType.EVENT_TYPE_WORKFLOW_TASK_COMPLETED,
+            workflow_task_completed_event_attributes=WorkflowTaskCompletedEventAttributes(
+                scheduled_event_id=scheduled, started_event_id=started
+            ),
+        )
+
+
+async def answer_history(
+    converter: DataConverter, workflow_id: str, answer: str, deltas: int
+) -> WorkflowHistory:
+    """The history of a RAGAgentWorkflow run that streamed `answer` in `deltas` signals."""
+    history = HistoryBuilder(converter)
+    history.add(
+        EventType.EVENT_TYPE_WORKFLOW_EXECUTION_STARTED,
+        workflow_execution_started_event_attributes=WorkflowExecutionStartedEventAttributes(
+            workflow_type=WorkflowType(name="RAGAgentWorkflow"),
+            task_queue=history.task_queue,
+            input=await history.payloads(QUERY),
+        ),
+    )
+    completed = history.workflow_task()
+    scheduled = history.add(
+        EventType.EVENT_TYPE_ACTIVITY_TASK_SCHEDULED,
+        activity_task_scheduled_event_attributes=ActivityTaskScheduledEventAttributes(
+            activity_id="1",
+            activity_type=ActivityType(name="retrieve_and_generate"),
+            task_queue=history.task_queue,
+            input=await history.payloads(QUERY, True),
+            workflow_task_completed_event_id=completed,
+        ),
+    )
+    started = history.add(
+        EventType.EVENT_TYPE_ACTIVITY_TASK_STARTED,
+        activity_task_started_event_attributes=ActivityTaskStartedEventAttributes(
+            scheduled_event_id=scheduled, attempt=1
+        ),
+    )
+    step = -(-len(answer) // max(1, deltas))
+    for offset in range(0, len(answer), step):
+        history.add(
+            EventType.EVENT_TYPE_WORKFLOW_EXECUTION_SIGNALED,
+            workflow_execution_signaled_event_attributes=WorkflowExecutionSignaledEventAttributes(
+                signal_name="publish_partial",
+                input=await history.payloads(
+                    PartialAnswer(1, answer[offset : offset + step])
+                ),
+            ),
+        )
+        history.workflow_task()
+    result = await history.payloads(answer)
+    history.add(
+        EventType.EVENT_TYPE_ACTIVITY_TASK_COMPLETED,
+        activity_task_completed_event_attributes=ActivityTaskCompletedEventAttributes(
+            result=result, scheduled_event_id=scheduled, started_event_id=started
+        ),
+    )
+    completed = history.workflow_task()
+    history.add(
+        EventType.EVENT_TYPE_WORKFLOW_EXECUTION_COMPLETED,
+        workflow_execution_completed_event_attributes=WorkflowExecutionCompletedEventAttributes(
+            result=result, workflow_task_completed_event_id=completed
+        ),
+    )
+    return WorkflowHistory(workflow_id, history.events)
+
+
+def history_bytes(history: WorkflowHistory) -> int:
+    return sum(event.ByteSize() for event in history.events)
+
+
+async def _iterate(histories: list[WorkflowHistory]) -> AsyncIterator[WorkflowHistory]:
+    for history in histories:
+        yield history
+
+
+async def bench(
+    name: str,
+    converter: DataConverter,
+    answers: list[str],
+    deltas: int,
+    runs: int,
+) -> dict[str, float]:
+    start = time.perf_counter()
+    histories = [
+        await answer_history(converter, f"bench-payloads-{i}", answer, deltas)
+        for i, answer in enumerate(answers)
+    ]
+    build_s = time.perf_counter() - start
+    replayer = Replayer(workflows=[RAGAgentWorkflow], data_converter=converter)
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        await replayer.replay_workflows(_iterate(histories))
+        samples.append(time.perf_counter() - start)
+    return {
+        "history_bytes": statistics.fmean(
+            history_bytes(history) for history in histories
+        ),
+        "encode_ms": build_s * 1000 / len(histories),
+        "replay_ms": statistics.median(samples) * 1000 / len(histories),
+    }
+
+
+async def main(args) -> None:
+    rng = random.Random(0)
+    corpus = corpus_text()
+    with tempfile.TemporaryDirectory(prefix="bench-payloads-") as blob_dir:
+        converters = {
+            "plain": default(),
+            "zlib": data_converter(CompressionCodec("zlib")),
+            "zstd": data_converter(CompressionCodec("zstd"))
+            if zstandard is not None
+            else None,
+            "zlib+offload": data_converter(
+                CompressionCodec(
+                    "zlib",
+                    blob_store=LocalBlobStore(blob_dir),
+                    offload_bytes=args.offload_bytes,
+                )
+            ),
+        }
+        results: dict[str, dict[str, dict[str, float]]] = {}
+        for chars in args.answer_chars:
+            answers = [answer_text(corpus, chars, rng) for _ in range(args.histories)]
+            print(
+                f"\n{chars}-character answers, {args.deltas} streamed deltas, {args.histories} histories"
+            )
+            results[str(chars)] = {}
+            for name, converter in converters.items():
+                if converter is None:
+                    print(f"  {name:<14} skipped: zstandard isn't installed")
+                    continue
+                result = await bench(name, converter, answers, args.deltas, args.runs)
+                plain = results[str(chars)].get("plain", result)
+                result["size_ratio"] = result["history_bytes"] / plain["history_bytes"]
+                result["replay_ratio"] = result["replay_ms"] / plain["replay_ms"]
+                results[str(chars)][name] = result
+                print(
+                    f"  {name:<14} history={result['history_bytes'] / 1024:9.1f}KiB ({result['size_ratio']:5.2f}x)  "
+                    f"encode={result['encode_ms']:7.2f}ms  "
+                    f"replay={result['replay_ms']:7.2f}ms ({result['replay_ratio']:5.2f}x)"
+                )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(
+                {
+                    "benchmark": "payloads",
+                    "python": sys.version.split()[0],
+                    "args": vars(args),
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--answer-chars",
+        type=int,
+        action="append",
+        help="Answer sizes to benchmark (repeatable; default 2000, 20000 and 60000)",
+    )
+    parser.add_argument(
+        "--deltas",
+        type=int,
+        default=20,
+        help="Streamed partial-answer signals per answer",
+    )
+    parser.add_argument(
+        "--histories", type=int, default=20, help="Histories per answer size"
+    )
+    parser.add_argument(
+        "--runs", type=int, default=5, help="Replays of each set of histories"
+    )
+    parser.add_argument(
+        "--offload-bytes",
+        type=int,
+        default=16 * 1024,
+        help="Offload threshold for zlib+offload (the codec's own default is 128 KiB)",
+    )
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+    args.answer_chars = args.answer_chars or [2000, 20000, 60000]
+    asyncio.run(main(args))
@@ -0,0 +1,92 @@
+"""
+Benchmark per-call Runner/session setup: fresh objects per call vs. RunnerPool.
+
+Runs fully offline (no model call is made), e.g.:
+
+    python rag_agent/benchmarks/bench_runner_setup.py --iterations 2000
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+from google.adk.agents import Agent
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+
+_root = Path(__file__).resolve().parent.parent
+if str(_root) not in sys.path:
+    sys.path.insert(0, str(_root))
+
+# Run as a script: the agent's modules are importable once rag_agent/ is on the path.
+from runner_pool import RunnerPool  # noqa: E402
+
+
+def _agent() -> Agent:
+    return Agent(model="gemini-2.0-flash-001", name="bench_agent", instruction="bench")
+
+
+async def per_call_setup(agent: Agent) -> None:
+    """What ask_rag_agent did before RunnerPool."""
+    session_service = InMemorySessionService()
+    session = await session_service.create_session(
+        user_id="temporal", app_name="rag_agent"
+    )
+    Runner(agent=agent, session_service=session_service, app_name="rag_agent")
+    assert session.id
+
+
+def pooled_setup(pool: RunnerPool):
+    async def run() -> None:
+        async with pool.session(user_id="temporal") as session_id:
+            assert session_id and pool.runner
+
+    return run
+
+
+async def measure(name: str, fn, iterations: int) -> dict:
+    for _ in range(min(50, iterations)):
+        await fn()
+    tracemalloc.start()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - start) * 1e6)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    samples.sort()
+    result = {
+        "name": name,
+        "mean_us": statistics.fmean(samples),
+        "p50_us": samples[len(samples) // 2],
+        "p95_us": samples[int(len(samples) * 0.95) - 1],
+        "retained_kib": current / 1024,
+        "peak_kib": peak / 1024,
+    }
+    print(
+        f"{name:<10} mean={result['mean_us']:9.1f}us  p50={result['p50_us']:9.1f}us  "
+        f"p95={result['p95_us']:9.1f}us  retained={result['retained_kib']:8.1f}KiB  "
+        f"peak={result['peak_kib']:8.1f}KiB"
+    )
+    return result
+
+
+async def main(iterations: int) -> None:
+    agent = _agent()
+    pool = RunnerPool(agent=agent)
+    before = await measure("per-call", lambda: per_call_setup(agent), iterations)
+    after = await measure("pooled", pooled_setup(pool), iterations)
+    print(
+        f"\nSpeed-up (mean): {before['mean_us'] / after['mean_us']:.1f}x, live sessions after run: {len(pool)}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=1000)
+    asyncio.run(main(parser.parse_args().iterations))
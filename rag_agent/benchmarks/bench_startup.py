@@ -0,0 +1,194 @@
+"""
+Benchmark worker cold start: module import times and time to first polled task.
+
+Each import is timed in a fresh interpreter, so results include everything the
+module drags in. "workflow sandbox" times how long Temporal takes to load and
+validate the workflow definitions, which is paid by every workflow worker.
+"first task" spawns `temporal/worker.py` and times how long it takes from
+process start until a trivial workflow queued beforehand completes; it needs
+a Temporal server (--address) or downloads a local dev server.
+
+    python rag_agent/benchmarks/bench_startup.py --runs 5
+    python rag_agent/benchmarks/bench_startup.py --max workflow=0.8 --max "workflow sandbox=1.5"
+
+--max makes the script exit non-zero when a measurement regresses past a budget.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from pathlib import Path
+
+_root = Path(__file__).resolve().parent.parent
+_temporal = _root / "temporal"
+
+# name -> statement timed in a fresh interpreter with rag_agent/ and temporal/ on sys.path
+IMPORTS = {
+    "shared": "import shared",
+    "workflow": "import workflow",
+    "activities": "import activities",
+    "worker": "import worker",
+    "agent": "import agent",
+    "agent build": "import agent; agent.warm_up()",
+    "workflow sandbox": (
+        "from temporalio.worker import Replayer; import worker; Replayer(workflows=worker.WORKFLOWS)"
+    ),
+}
+
+_TIMER = """
+import sys, time
+sys.path[:0] = [{temporal!r}, {root!r}]
+start = time.perf_counter()
+{statement}
+print("ELAPSED", time.perf_counter() - start)
+"""
+
+
+def time_statement(statement: str) -> float:
+    code = _TIMER.format(temporal=str(_temporal), root=str(_root), statement=statement)
+    proc = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, cwd=_temporal
+    )
+    for line in proc.stdout.splitlines():
+        if line.startswith("ELAPSED "):
+            return float(line.split()[1])
+    raise RuntimeError(f"{statement!r} failed:\n{proc.stderr[-2000:]}")
+
+
+async def time_first_task(address: str | None, role: str) -> float:
+    from temporalio.client import Client
+    from temporalio.testing import WorkflowEnvironment
+
+    sys.path[:0] = [str(_temporal)]
+    from codec import data_converter
+    from shared import TASK_QUEUE, BatchInput, BatchResult
+
+    env = None
+    if address:
+        client = await Client.connect(address, data_converter=data_converter())
+    else:
+        env = await WorkflowEnvironment.start_local(data_converter=data_converter())
+        client = env.client
+        address = client.service_client.config.target_host
+    try:
+        # An empty batch completes in a single workflow task and never calls the model.
+        handle = await client.start_workflow(
+            "RAGAgentBatchWorkflow",
+            BatchInput(queries=[]),
+            id=f"bench-startup-{uuid.uuid4()}",
+            task_queue=TASK_QUEUE,
+            result_type=BatchResult,
+        )
+        start = time.perf_counter()
+        worker = subprocess.Popen(
+            [sys.executable, "worker.py", "--role", role],
+            cwd=_temporal,
+            env={**os.environ, "TEMPORAL_ADDRESS": address},
+            stdout=subprocess.DEVNULL,
+        )
+        try:
+            await handle.result()
+            return time.perf_counter() - start
+        finally:
+            worker.terminate()
+            worker.wait()
+    finally:
+        if env is not None:
+            await env.shutdown()
+
+
+def summarize(samples: list[float]) -> dict[str, float]:
+    return {
+        "median_s": statistics.median(samples),
+        "min_s": min(samples),
+        "max_s": max(samples),
+        "runs": len(samples),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1].strip())
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument(
+        "--only", action="append", help="Only run these measurements (repeatable)"
+    )
+    parser.add_argument(
+        "--skip-first-task", action="store_true", help="Don't start a Temporal server"
+    )
+    parser.add_argument(
+        "--address", help="Existing Temporal server for the first-task measurement"
+    )
+    parser.add_argument(
+        "--role", default="all", help="Worker role for the first-task measurement"
+    )
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument(
+        "--max",
+        action="append",
+        default=[],
+        metavar="NAME=SECONDS",
+        help="Fail if the median for NAME exceeds SECONDS (repeatable)",
+    )
+    args = parser.parse_args()
+
+    results: dict[str, dict[str, float]] = {}
+    for name, statement in IMPORTS.items():
+        if args.only and name not in args.only:
+            continue
+        try:
+            results[name] = summarize(
+                [time_statement(statement) for _ in range(args.runs)]
+            )
+        except RuntimeError as e:
+            print(f"{name:18s} skipped: {str(e).splitlines()[-1]}")
+            continue
+        print(
+            f"{name:18s} {results[name]['median_s'] * 1000:8.0f} ms (median of {args.runs})"
+        )
+
+    if not args.skip_first_task and (not args.only or "first task" in args.only):
+        try:
+            samples = [
+                asyncio.run(time_first_task(args.address, args.role))
+                for _ in range(args.runs)
+            ]
+        except Exception as e:
+            print(f"{'first task':18s} skipped: {e!r}")
+        else:
+            results["first task"] = summarize(samples)
+            print(
+                f"{'first task':18s} {results['first task']['median_s'] * 1000:8.0f} ms (median of {args.runs})"
+            )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(
+                {
+                    "benchmark": "startup",
+                    "python": sys.version.split()[0],
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+
+    failed = False
+    for budget in args.max:
+        name, _, seconds = budget.rpartition("=")
+        measured = results.get(name, {}).get("median_s")
+        if measured is not None and measured > float(seconds):
+            print(
+                f"REGRESSION: {name} took {measured:.3f}s, budget {float(seconds):.3f}s"
+            )
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""Offline stand-ins for Gemini and the retrieval backend, for benchmarks.
+
+`FakeGemini` plays the agent's two model turns without a network call: the
+first asks for the retrieval tool, the second streams a canned answer built
+from the retrieved titles (as partial chunks followed by the aggregated text,
+like SSE streaming does). Without tools (the small-talk agent) it answers
+straight away. `FakeRetrievalBackend` returns fixed chunks, so the
+real `RetrievalTool` code runs on top of it.
+
+`install_fake_agent()` points the lazily built singletons in agent.py at
+these, so `ask_rag_agent` and the Temporal activities run end to end offline.
+"""
+
+import asyncio
+import random
+import sys
+from collections.abc import AsyncGenerator
+from pathlib import Path
+from typing import Any
+
+from google.adk.agents import Agent
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+from google.genai import types
+
+_root = Path(__file__).resolve().parent.parent
+if str(_root) not in sys.path:
+    sys.path.insert(0, str(_root))
+
+# The agent's modules are importable once rag_agent/ is on the path.
+from prompts import return_instructions_root  # noqa: E402
+from retrieval import RetrievalTool  # noqa: E402
+
+TOOL_NAME = "retrieve_rag_documentation"
+
+
+class FakeGemini(BaseLlm):
+    model: str = "fake-gemini"
+    answer_chunks: int = 8
+    chunk_words: int = 12
+    latency_seconds: float = 0.0
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        if self.latency_seconds:
+            await asyncio.sleep(self.latency_seconds)
+        last = llm_request.contents[-1] if llm_request.contents else None
+        tool_result = None
+        for part in last.parts if last and last.parts else []:
+            if part.function_response is not None:
+                tool_result = part.function_response.response
+        if tool_result is None and llm_request.tools_dict:
+            query = "".join(
+                part.text or "" for part in (last.parts if last and last.parts else [])
+            )
+            yield LlmResponse(
+                content=types.Content(
+                    role="model",
+                    parts=[
+                        types.Part(
+                            function_call=types.FunctionCall(
+                                name=TOOL_NAME, args={"query": query}
+                            )
+                        )
+                    ],
+                ),
+                turn_complete=True,
+            )
+            return
+
+        chunks = [
+            " ".join(f"word{i}_{j}" for j in range(self.chunk_words)) + " "
+            for i in range(self.answer_chunks)
+        ]
+        if tool_result is not None:
+            chunks.append(f"Citations: {tool_result!s:.200}")
+        if stream:
+            for chunk in chunks:
+                yield LlmResponse(
+                    content=types.Content(role="model", parts=[types.Part(text=chunk)]),
+                    partial=True,
+                )
+        text = "".join(chunks)
+        yield LlmResponse(
+            content=types.Content(role="model", parts=[types.Part(text=text)]),
+            turn_complete=True,
+            usage_metadata=types.GenerateContentResponseUsageMetadata(
+                prompt_token_count=len(str(llm_request.contents)) // 4,
+                candidates_token_count=len(text) // 4,
+            ),
+        )
+
+
+def _filler_text(seed: int, chars: int) -> str:
+    # Distinct per chunk, so near-duplicate removal keeps every chunk.
+    rng = random.Random(seed)
+    words = []
+    while sum(map(len, words)) + len(words) < chars:
+        words.append(rng.choice(_FILLER_WORDS))
+    return " ".join(words)[:chars]
+
+
+_FILLER_WORDS = "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor".split()
+
+
+class FakeRetrievalBackend:
+    def __init__(
+        self, chunks: int = 10, chunk_chars: int = 1000, latency_seconds: float = 0.0
+    ):
+        self.latency_seconds = latency_seconds
+        self.chunks = [
+            {
+                "title": f"document_{i}.pdf",
+                "source_uri": f"gs://bench/document_{i}.pdf",
+                "distance": 0.1 + i * 0.02,
+                "text": _filler_text(i, chunk_chars),
+            }
+            for i in range(chunks)
+        ]
+
+    def cache_identity(self) -> tuple:
+        return ("fake",)
+
+    def retrieve(
+        self, query: str, top_k: int, max_distance: float | None
+    ) -> list[dict[str, Any]]:
+        if self.latency_seconds:
+            import time
+
+            time.sleep(self.latency_seconds)
+        return [dict(chunk) for chunk in self.chunks[:top_k]]
+
+
+def fake_retrieval_tool(
+    backend: FakeRetrievalBackend | None = None, cache=None
+) -> RetrievalTool:
+    return RetrievalTool(
+        name=TOOL_NAME,
+        description="Retrieve documentation from the (fake) corpus.",
+        backend=backend or FakeRetrievalBackend(),
+        similarity_top_k=10,
+        cache=cache,
+    )
+
+
+def fake_agent(
+    model: FakeGemini | None = None, tool: RetrievalTool | None = None
+) -> Agent:
+    return Agent(
+        model=model or FakeGemini(),
+        name="ask_rag_agent",
+        instruction=return_instructions_root(),
+        tools=[tool or fake_retrieval_tool()],
+    )
+
+
+def install_fake_agent(
+    model: FakeGemini | None = None,
+    tool: RetrievalTool | None = None,
+    answer_cache=None,
+):
+    """Make agent.ask_rag_agent use the fakes; returns the agent module."""
+    import agent
+    from runner_pool import RunnerPool
+
+    tool = tool or fake_retrieval_tool()
+    with agent._init_lock:
+        agent._ask_vertex_retrieval = tool
+        agent._root_agent = fake_agent(model, tool)
+        agent._runner_pool = None
+        agent._conversation_pool = None
+        agent._small_talk_pool = RunnerPool(
+            agent=agent.build_small_talk_agent(
+                FakeGemini(model="fake-gemini-small", answer_chunks=1)
+            ),
+            app_name="rag_agent_small_talk",
+        )
+        agent.answer_cache = answer_cache
+    return agent
@@ -0,0 +1,144 @@
+"""
+Build a local vector index from the documents in the 'data/' folder.
+
+This is the same folder upload_documents.py uploads to the RAG corpus. The
+index lets the agent retrieve offline with RETRIEVAL_BACKEND=local:
+
+    python build_local_index.py                       # offline hashing embeddings
+    python build_local_index.py --embedding-model text-embedding-004
+
+PDFs are extracted and chunked in parallel, one process per core (see
+shared_libraries/pdf_text.py), with headers and footers dropped; each chunk's
+source_uri points at its first page ("report.pdf#page=3").
+"""
+
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from embeddings import get_embedder
+from local_index import build_index
+from shared_libraries.pdf_text import pdf_chunks
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+LOCAL_INDEX_DIR = os.getenv(
+    "LOCAL_INDEX_DIR", os.path.join(os.path.dirname(__file__), "local_index")
+)
+
+
+def read_document(path):
+    """Return the text of a TXT file."""
+    with open(path, encoding="utf-8", errors="replace") as f:
+        return f.read()
+
+
+def chunk_text(text, chunk_chars=1000, overlap_chars=200):
+    """Split text into overlapping windows, breaking at whitespace where possible."""
+    if not 0 <= overlap_chars < chunk_chars:
+        raise ValueError("overlap_chars must be smaller than chunk_chars")
+    text = " ".join(text.split())
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(len(text), start + chunk_chars)
+        if end < len(text):
+            space = text.rfind(" ", start + chunk_chars // 2, end)
+            end = space if space > 0 else end
+        chunks.append(text[start:end].strip())
+        if end >= len(text):
+            break
+        start = end - overlap_chars if end - overlap_chars > start else end
+    return [chunk for chunk in chunks if chunk]
+
+
+def collect_chunks(paths, chunk_chars, overlap_chars, workers=None):
+    pdfs = [path for path in paths if path.endswith(".pdf")]
+    with ProcessPoolExecutor(
+        workers, mp_context=multiprocessing.get_context("spawn")
+    ) as pool:
+        extracted = {
+            path: pool.submit(pdf_chunks, path, chunk_chars, overlap_chars)
+            for path in pdfs
+        }
+        chunks = []
+        for path in paths:
+            filename = os.path.basename(path)
+            try:
+                if path in extracted:
+                    pieces = [
+                        {
+                            "title": filename,
+                            "source_uri": f"{path}#page={piece.first_page}",
+                            "text": piece.text,
+                        }
+                        for piece in extracted[path].result()
+                    ]
+                else:
+                    pieces = [
+                        {"title": filename, "source_uri": path, "text": piece}
+                        for piece in chunk_text(
+                            read_document(path), chunk_chars, overlap_chars
+                        )
+                    ]
+            except Exception as e:
+                print(f"❌ Could not read {filename}: {e}")
+                continue
+            print(f"📄 {filename}: {len(pieces)} chunks")
+            chunks += pieces
+    return chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build a local vector index for offline retrieval."
+    )
+    parser.add_argument(
+        "paths",
+        nargs="*",
+        help=f"Files to index (default: PDF/TXT files in {DATA_DIR})",
+    )
+    parser.add_argument("--out", default=LOCAL_INDEX_DIR)
+    parser.add_argument(
+        "--embedding-model",
+        default="hashing",
+        help="'hashing' (offline) or a Vertex AI embedding model",
+    )
+    parser.add_argument("--kind", choices=["auto", "flat", "ivf"], default="auto")
+    parser.add_argument("--chunk-chars", type=int, default=1000)
+    parser.add_argument("--overlap-chars", type=int, default=200)
+    parser.add_argument(
+        "--workers", type=int, help="Processes extracting PDFs (default: one per core)"
+    )
+    args = parser.parse_args()
+
+    paths = args.paths
+    if not paths:
+        if not os.path.isdir(DATA_DIR):
+            print(f"No {DATA_DIR} directory. Add your documents there first.")
+            return
+        paths = [
+            os.path.join(DATA_DIR, f)
+            for f in sorted(os.listdir(DATA_DIR))
+            if f.endswith((".pdf", ".txt"))
+        ]
+
+    chunks = collect_chunks(paths, args.chunk_chars, args.overlap_chars, args.workers)
+    if not chunks:
+        print("No text found to index.")
+        return
+
+    start = time.perf_counter()
+    embedder = get_embedder(args.embedding_model)
+    vectors = embedder.embed_many([chunk["text"] for chunk in chunks])
+    print(f"Embedded {len(chunks)} chunks in {time.perf_counter() - start:.1f}s")
+
+    build_index(
+        chunks, vectors, args.out, kind=args.kind, embedding_model=args.embedding_model
+    )
+    print(f"✅ Wrote index to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
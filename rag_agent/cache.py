@@ -0,0 +1,291 @@
+"""In-process caches used in front of the RAG agent.
+
+`LRUTTLCache` is a size-bounded, expiring key/value cache for exact lookups.
+`SemanticCache` keeps embeddings in a preallocated NumPy matrix and returns a
+stored value when a new vector is within a cosine distance of a cached one.
+`AnswerCache` layers the two in front of `ask_rag_agent`.
+
+`corpus_generation` / `mark_corpus_changed` let upload scripts running in
+other processes invalidate anything cached for a corpus. They share a stamp
+file under RAG_CORPUS_STAMP_DIR, so with agents and ingest workers on more
+than one host that directory must be on storage they all mount.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass, field
+from typing import Any
+
+import numpy as np
+
+
+def normalize_query(query: str) -> str:
+    """Lower-case and collapse whitespace so trivially different queries share a key."""
+    return " ".join(query.lower().split())
+
+
+def fingerprint(text: str) -> str:
+    """Short, stable hash used to fold long strings (e.g. prompts) into cache keys."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+CORPUS_STAMP_DIR = os.environ.get(
+    "RAG_CORPUS_STAMP_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "rag_agent", "corpora"),
+)
+
+
+def _corpus_stamp_path(corpus: str) -> str:
+    return os.path.join(CORPUS_STAMP_DIR, fingerprint(corpus) + ".stamp")
+
+
+def corpus_generation(corpus: str) -> int:
+    """Changes whenever `mark_corpus_changed` is called for `corpus`; fold it into cache keys."""
+    try:
+        return os.stat(_corpus_stamp_path(corpus)).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
+def mark_corpus_changed(corpus: str) -> None:
+    """Record that files were added to or removed from `corpus`."""
+    os.makedirs(CORPUS_STAMP_DIR, exist_ok=True)
+    path = _corpus_stamp_path(corpus)
+    with open(path, "a"):
+        pass
+    os.utime(path, ns=(time.time_ns(), time.time_ns()))
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class LRUTTLCache:
+    """Thread-safe LRU cache whose entries also expire after `ttl_seconds`."""
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600.0):
+        if max_entries <= 0:
+            raise ValueError("max_entries must be positive")
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.stats = CacheStats()
+        self._entries: OrderedDict[Any, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Any) -> Any | None:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return value
+
+    def put(self, key: Any, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def pop(self, key: Any) -> Any | None:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        return entry[1] if entry else None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SemanticCache:
+    """Nearest-neighbour cache over unit-normalised embeddings.
+
+    Entries live in fixed-size NumPy arrays so a lookup is one matrix-vector
+    product. Each entry belongs to a namespace (corpus, model, prompt) and only
+    matches lookups in the same namespace. When full, the least recently used
+    slot is overwritten. Namespaces with no live entries are forgotten when a
+    new one is added, so a stream of corpus generations doesn't pile up.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 512,
+        max_distance: float = 0.05,
+        ttl_seconds: float = 3600.0,
+    ):
+        if max_entries <= 0:
+            raise ValueError("max_entries must be positive")
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.ttl_seconds = ttl_seconds
+        self.stats = CacheStats()
+        self._vectors: np.ndarray | None = None  # allocated on first put
+        self._namespace_ids = np.full(max_entries, -1, dtype=np.int32)
+        self._expires_at = np.zeros(max_entries, dtype=np.float64)
+        self._last_used = np.zeros(max_entries, dtype=np.float64)
+        self._values: list[Any] = [None] * max_entries
+        self._namespaces: dict[str, int] = {}
+        self._next_namespace_id = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _unit(vector: Sequence[float]) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        return v / norm if norm else v
+
+    def get(self, namespace: str, vector: Sequence[float]) -> Any | None:
+        now = time.monotonic()
+        with self._lock:
+            ns_id = self._namespaces.get(namespace)
+            if self._vectors is None or ns_id is None:
+                self.stats.misses += 1
+                return None
+            live = (self._namespace_ids == ns_id) & (self._expires_at > now)
+            if not live.any():
+                self.stats.misses += 1
+                return None
+            v = self._unit(vector)
+            if v.shape[0] != self._vectors.shape[1]:
+                self.stats.misses += 1
+                return None
+            similarity = np.where(live, self._vectors @ v, -np.inf)
+            best = int(np.argmax(similarity))
+            if 1.0 - float(similarity[best]) > self.max_distance:
+                self.stats.misses += 1
+                return None
+            self._last_used[best] = now
+            self.stats.hits += 1
+            return self._values[best]
+
+    def put(self, namespace: str, vector: Sequence[float], value: Any) -> None:
+        now = time.monotonic()
+        v = self._unit(vector)
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != v.shape[0]:
+                self._vectors = np.zeros(
+                    (self.max_entries, v.shape[0]), dtype=np.float32
+                )
+                self._namespace_ids.fill(-1)
+            ns_id = self._namespaces.get(namespace)
+            if ns_id is None:
+                self._prune_namespaces(now)
+                ns_id = self._namespaces[namespace] = self._next_namespace_id
+                self._next_namespace_id += 1
+            free = np.flatnonzero((self._namespace_ids < 0) | (self._expires_at <= now))
+            if free.size:
+                slot = int(free[0])
+                if self._namespace_ids[slot] >= 0:
+                    self.stats.expirations += 1
+            else:
+                slot = int(np.argmin(self._last_used))
+                self.stats.evictions += 1
+            self._vectors[slot] = v
+            self._namespace_ids[slot] = ns_id
+            self._expires_at[slot] = now + self.ttl_seconds
+            self._last_used[slot] = now
+            self._values[slot] = value
+
+    def _prune_namespaces(self, now: float) -> None:
+        # Ids aren't reused, so slots still tagged with a dropped id never match.
+        live = self._namespace_ids[
+            (self._namespace_ids >= 0) & (self._expires_at > now)
+        ]
+        in_use = set(np.unique(live).tolist())
+        self._namespaces = {
+            name: ns_id for name, ns_id in self._namespaces.items() if ns_id in in_use
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._namespace_ids.fill(-1)
+            self._values = [None] * self.max_entries
+            self._namespaces.clear()
+
+    def __len__(self) -> int:
+        return int((self._namespace_ids >= 0).sum())
+
+
+@dataclass
+class CacheLookup:
+    """Result of `AnswerCache.get`; pass it back to `AnswerCache.put` on a miss."""
+
+    namespace: str
+    key: str
+    answer: str | None = None
+    tier: str | None = None
+    embedding: Sequence[float] | None = field(default=None, repr=False)
+
+
+class AnswerCache:
+    """Exact-match tier backed by an optional semantic tier."""
+
+    def __init__(
+        self,
+        exact: LRUTTLCache,
+        semantic: SemanticCache | None = None,
+        embed: Callable[[str], Sequence[float]] | None = None,
+    ):
+        if semantic is not None and embed is None:
+            raise ValueError("a semantic tier needs an embedding function")
+        self.exact = exact
+        self.semantic = semantic
+        self.embed = embed
+
+    def get(self, query: str, namespace: str) -> CacheLookup:
+        normalized = normalize_query(query)
+        lookup = CacheLookup(namespace=namespace, key=f"{namespace}|{normalized}")
+        answer = self.exact.get(lookup.key)
+        if answer is not None:
+            lookup.answer, lookup.tier = answer, "exact"
+            return lookup
+        if self.semantic is not None:
+            lookup.embedding = self.embed(normalized)
+            answer = self.semantic.get(namespace, lookup.embedding)
+            if answer is not None:
+                lookup.answer, lookup.tier = answer, "semantic"
+                # Promote so the next identical query skips the embedding call.
+                self.exact.put(lookup.key, answer)
+        return lookup
+
+    def put(self, lookup: CacheLookup, answer: str) -> None:
+        self.exact.put(lookup.key, answer)
+        if self.semantic is not None and lookup.embedding is not None:
+            self.semantic.put(lookup.namespace, lookup.embedding, answer)
+
+    def clear(self) -> None:
+        self.exact.clear()
+        if self.semantic is not None:
+            self.semantic.clear()
+
+    def stats(self) -> dict[str, CacheStats]:
+        stats = {"exact": self.exact.stats}
+        if self.semantic is not None:
+            stats["semantic"] = self.semantic.stats
+        return stats
@@ -0,0 +1,390 @@
+"""Local SQLite catalog of RAG corpora and their RagFiles.
+
+Finding a corpus by display name or listing a corpus's files through the
+Vertex AI API means paging through every corpus or file on each call. The
+catalog mirrors that metadata locally, indexed by display name and content
+hash, so lookups are a single indexed query:
+
+- Uploads and deletes made through this repo write through to the catalog
+  (see `ConcurrentUploader(catalog=...)` and `IncrementalSync`).
+- `refresh_corpora` lists corpora (a handful of rows) and marks a corpus's
+  files stale when its update time or file count changed remotely.
+- `refresh_files` only pages through a corpus's files when they are stale or
+  older than `max_age_seconds`.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from typing import Any
+
+CATALOG_PATH = os.getenv(
+    "RAG_CATALOG_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "rag_agent", "catalog.sqlite3"),
+)
+# Re-list a corpus's files at least this often, in case remote changes went unnoticed.
+FILES_MAX_AGE_SECONDS = float(os.getenv("RAG_CATALOG_FILES_MAX_AGE_SECONDS", 3600))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS corpora (
+    name TEXT PRIMARY KEY,
+    display_name TEXT NOT NULL,
+    description TEXT NOT NULL DEFAULT '',
+    update_time TEXT NOT NULL DEFAULT '',
+    rag_files_count INTEGER,
+    files_refreshed_at REAL,
+    files_stale INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS corpora_display_name ON corpora (display_name);
+
+CREATE TABLE IF NOT EXISTS rag_files (
+    name TEXT PRIMARY KEY,
+    corpus_name TEXT NOT NULL,
+    display_name TEXT NOT NULL,
+    description TEXT NOT NULL DEFAULT '',
+    size_bytes INTEGER,
+    sha256 TEXT NOT NULL DEFAULT '',
+    source TEXT NOT NULL DEFAULT '',
+    create_time TEXT NOT NULL DEFAULT '',
+    update_time TEXT NOT NULL DEFAULT '',
+    recorded_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS rag_files_corpus_display_name ON rag_files (corpus_name, display_name);
+CREATE INDEX IF NOT EXISTS rag_files_sha256 ON rag_files (sha256) WHERE sha256 != '';
+"""
+
+
+@dataclass
+class CorpusRecord:
+    name: str
+    display_name: str
+    description: str
+    update_time: str
+    rag_files_count: int | None
+    files_refreshed_at: float | None
+    files_stale: bool
+
+
+@dataclass
+class FileRecord:
+    name: str
+    corpus_name: str
+    display_name: str
+    description: str
+    size_bytes: int | None
+    sha256: str
+    source: str
+    create_time: str
+    update_time: str
+    recorded_at: float
+
+
+def _timestamp(value: Any) -> str:
+    if not value:
+        return ""
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+
+def _list_corpora() -> Iterable[Any]:
+    from vertexai.preview import rag
+
+    return rag.list_corpora()
+
+
+def _list_files(corpus_name: str) -> Iterable[Any]:
+    from vertexai.preview import rag
+
+    return rag.list_files(corpus_name=corpus_name)
+
+
+class CorpusCatalog:
+    """Thread-safe handle on the catalog database; cheap to create, one per process is enough."""
+
+    def __init__(self, path: str = CATALOG_PATH):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            # WAL lets upload scripts write while the agent reads.
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def _query(self, sql: str, params: tuple = ()) -> list[sqlite3.Row]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _write(self, statements: Iterable[tuple[str, tuple]]) -> None:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for sql, params in statements:
+                    self._conn.execute(sql, params)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    # Corpora
+
+    def find_corpus(self, display_name: str) -> CorpusRecord | None:
+        rows = self._query(
+            "SELECT * FROM corpora WHERE display_name = ? ORDER BY name LIMIT 1",
+            (display_name,),
+        )
+        return (
+            CorpusRecord(**{**rows[0], "files_stale": bool(rows[0]["files_stale"])})
+            if rows
+            else None
+        )
+
+    def get_corpus(self, name: str) -> CorpusRecord | None:
+        rows = self._query("SELECT * FROM corpora WHERE name = ?", (name,))
+        return (
+            CorpusRecord(**{**rows[0], "files_stale": bool(rows[0]["files_stale"])})
+            if rows
+            else None
+        )
+
+    def record_corpus(self, corpus: Any) -> None:
+        """Add or update a corpus returned by the API (e.g. just created)."""
+        self._write([self._upsert_corpus(corpus)])
+
+    @staticmethod
+    def _upsert_corpus(corpus: Any) -> tuple[str, tuple]:
+        count = getattr(corpus, "rag_files_count", None)
+        # A corpus whose update time or file count moved has files we haven't seen.
+        return (
+            """
+            INSERT INTO corpora (name, display_name, description, update_time, rag_files_count)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (name) DO UPDATE SET
+                display_name = excluded.display_name,
+                description = excluded.description,
+                files_stale = files_stale
+                    OR update_time != excluded.update_time
+                    OR rag_files_count IS NOT excluded.rag_files_count,
+                update_time = excluded.update_time,
+                rag_files_count = excluded.rag_files_count
+            """,
+            (
+                corpus.name,
+                corpus.display_name or "",
+                corpus.description or "",
+                _timestamp(getattr(corpus, "update_time", None)),
+                count,
+            ),
+        )
+
+    def refresh_corpora(
+        self, list_fn: Callable[[], Iterable[Any]] = _list_corpora
+    ) -> int:
+        """Mirror the project's corpora; returns how many there are."""
+        corpora = list(list_fn())
+        names = [corpus.name for corpus in corpora]
+        statements = [self._upsert_corpus(corpus) for corpus in corpora]
+        placeholders = ",".join("?" * len(names))
+        statements += [
+            (
+                f"DELETE FROM rag_files WHERE corpus_name NOT IN ({placeholders})",
+                tuple(names),
+            ),
+            (f"DELETE FROM corpora WHERE name NOT IN ({placeholders})", tuple(names)),
+        ]
+        self._write(statements)
+        return len(corpora)
+
+    # RagFiles
+
+    def record_file(
+        self,
+        corpus_name: str,
+        rag_file: Any,
+        display_name: str | None = None,
+        description: str | None = None,
+        sha256: str = "",
+        source: str = "",
+    ) -> None:
+        """Add or update one RagFile, e.g. straight after uploading it."""
+        self._write(
+            [
+                (
+                    "INSERT OR IGNORE INTO corpora (name, display_name) VALUES (?, '')",
+                    (corpus_name,),
+                ),
+                (
+                    """
+                INSERT INTO rag_files (
+                    name, corpus_name, display_name, description, size_bytes, sha256, source,
+                    create_time, update_time, recorded_at
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (name) DO UPDATE SET
+                    display_name = excluded.display_name,
+                    description = excluded.description,
+                    size_bytes = COALESCE(excluded.size_bytes, size_bytes),
+                    sha256 = CASE WHEN excluded.sha256 != '' THEN excluded.sha256 ELSE sha256 END,
+                    source = CASE WHEN excluded.source != '' THEN excluded.source ELSE source END,
+                    create_time = excluded.create_time,
+                    update_time = excluded.update_time,
+                    recorded_at = excluded.recorded_at
+                """,
+                    (
+                        rag_file.name,
+                        corpus_name,
+                        display_name
+                        if display_name is not None
+                        else rag_file.display_name or "",
+                        description
+                        if description is not None
+                        else getattr(rag_file, "description", "") or "",
+                        getattr(rag_file, "size_bytes", None),
+                        sha256,
+                        source,
+                        _timestamp(getattr(rag_file, "create_time", None)),
+                        _timestamp(getattr(rag_file, "update_time", None)),
+                        time.time(),
+                    ),
+                ),
+            ]
+        )
+
+    def remove_file(self, name: str) -> None:
+        self._write([("DELETE FROM rag_files WHERE name = ?", (name,))])
+
+    def refresh_files(
+        self,
+        corpus_name: str,
+        max_age_seconds: float = FILES_MAX_AGE_SECONDS,
+        force: bool = False,
+        list_fn: Callable[[str], Iterable[Any]] = _list_files,
+    ) -> bool:
+        """Re-list the corpus's files if they are stale or old; returns whether it did.
+
+        Content hashes and sources recorded at upload time are kept for files
+        that are still present.
+        """
+        corpus = self.get_corpus(corpus_name)
+        fresh = (
+            corpus is not None
+            and not corpus.files_stale
+            and corpus.files_refreshed_at is not None
+            and time.time() - corpus.files_refreshed_at < max_age_seconds
+        )
+        if fresh and not force:
+            return False
+        started = time.time()
+        rag_files = list(list_fn(corpus_name))
+        statements = [
+            (
+                "INSERT OR IGNORE INTO corpora (name, display_name) VALUES (?, '')",
+                (corpus_name,),
+            )
+        ]
+        for rag_file in rag_files:
+            statements.append(
+                (
+                    """
+                INSERT INTO rag_files (
+                    name, corpus_name, display_name, description, size_bytes, create_time, update_time, recorded_at
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (name) DO UPDATE SET
+                    display_name = excluded.display_name,
+                    description = excluded.description,
+                    size_bytes = excluded.size_bytes,
+                    create_time = excluded.create_time,
+                    update_time = excluded.update_time,
+                    recorded_at = excluded.recorded_at
+                """,
+                    (
+                        rag_file.name,
+                        corpus_name,
+                        rag_file.display_name or "",
+                        getattr(rag_file, "description", "") or "",
+                        getattr(rag_file, "size_bytes", None),
+                        _timestamp(getattr(rag_file, "create_time", None)),
+                        _timestamp(getattr(rag_file, "update_time", None)),
+                        started,
+                    ),
+                )
+            )
+        # Anything not confirmed by this listing (or recorded since it started) is gone.
+        statements += [
+            (
+                "DELETE FROM rag_files WHERE corpus_name = ? AND recorded_at < ?",
+                (corpus_name, started),
+            ),
+            (
+                "UPDATE corpora SET files_stale = 0, files_refreshed_at = ? WHERE name = ?",
+                (started, corpus_name),
+            ),
+        ]
+        self._write(statements)
+        return True
+
+    def list_files(self, corpus_name: str) -> list[FileRecord]:
+        rows = self._query(
+            "SELECT * FROM rag_files WHERE corpus_name = ? ORDER BY display_name, name",
+            (corpus_name,),
+        )
+        return [FileRecord(**row) for row in rows]
+
+    def find_files(
+        self,
+        corpus_name: str,
+        display_name: str | None = None,
+        sha256: str | None = None,
+    ) -> list[FileRecord]:
+        """Files in the corpus with the given display name and/or content hash."""
+        sql = "SELECT * FROM rag_files WHERE corpus_name = ?"
+        params: list[Any] = [corpus_name]
+        if display_name is not None:
+            sql += " AND display_name = ?"
+            params.append(display_name)
+        if sha256 is not None:
+            sql += " AND sha256 = ?"
+            params.append(sha256)
+        return [
+            FileRecord(**row)
+            for row in self._query(sql + " ORDER BY name", tuple(params))
+        ]
+
+
+_catalog: CorpusCatalog | None = None
+
+
+def get_catalog() -> CorpusCatalog:
+    """Process-wide catalog at CATALOG_PATH."""
+    global _catalog
+    if _catalog is None:
+        _catalog = CorpusCatalog()
+    return _catalog
+
+
+def resolve_corpus_name(corpus: str, catalog: CorpusCatalog | None = None) -> str:
+    """Turn a corpus display name into its resource name; resource names pass through untouched.
+
+    The catalog is consulted first and only refreshed from the API on a miss.
+    """
+    if not corpus or corpus.startswith("projects/"):
+        return corpus
+    catalog = catalog or get_catalog()
+    record = catalog.find_corpus(corpus)
+    if record is None:
+        catalog.refresh_corpora()
+        record = catalog.find_corpus(corpus)
+    if record is None:
+        raise ValueError(f"No RAG corpus with display name {corpus!r}")
+    return record.name
@@ -0,0 +1,154 @@
+"""Fitting retrieved chunks into the model's context.
+
+`pack_context` keeps the best chunks (in the order retrieved, nearest first)
+until a token budget is spent, truncating the chunk that crosses the budget at
+a word boundary. Every packed chunk keeps its title: the citation rules in
+prompts.py rely on it. Token counts are estimated from character counts, which
+is close enough for budgeting and needs no tokenizer round trip.
+
+`drop_near_duplicates` runs first: corpora built from repeated uploads return
+the same passage several times, which wastes budget and duplicates citations.
+Each chunk gets a 64-bit SimHash of its word 3-shingles, and chunks within a
+few bits (Hamming distance) of a better-scoring chunk are dropped.
+"""
+
+import re
+from typing import Any
+
+import numpy as np
+
+# Roughly 4 characters per token for English text with Gemini's tokenizer.
+CHARS_PER_TOKEN = 4
+# The JSON keys and punctuation wrapping each chunk in the tool response.
+CHUNK_OVERHEAD_TOKENS = 8
+# SimHash fingerprints this many bits apart or fewer are near-duplicates.
+NEAR_DUPLICATE_MAX_BITS = 6
+
+_WORD = re.compile(r"\w+")
+_BITS = np.arange(64, dtype=np.uint64)
+# Odd multipliers mixing the word hashes at each position of a shingle.
+_SHINGLE_MULTIPLIERS = np.array(
+    [0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9], dtype=np.uint64
+)
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def chunk_tokens(chunk: dict[str, Any]) -> int:
+    return (
+        CHUNK_OVERHEAD_TOKENS
+        + estimate_tokens(chunk["title"] or "")
+        + estimate_tokens(chunk["text"])
+    )
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    limit = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    cut = text.rfind(" ", 0, limit - 1)
+    return text[: cut if cut > limit // 2 else limit - 1].rstrip() + "…"
+
+
+def pack_context(
+    chunks: list[dict[str, Any]],
+    token_budget: int,
+    min_partial_tokens: int = 64,
+) -> list[dict[str, Any]]:
+    """The leading `chunks` that fit in `token_budget` estimated tokens.
+
+    The first chunk that doesn't fit is truncated to the remaining budget if at
+    least `min_partial_tokens` of its text would survive; the best chunk is
+    always included, truncated if need be.
+    """
+    packed = []
+    remaining = token_budget
+    for chunk in chunks:
+        cost = chunk_tokens(chunk)
+        if cost <= remaining:
+            packed.append(chunk)
+            remaining -= cost
+            continue
+        text_budget = remaining - (cost - estimate_tokens(chunk["text"]))
+        if not packed:
+            text_budget = max(text_budget, min_partial_tokens)
+        if text_budget >= min_partial_tokens:
+            packed.append({**chunk, "text": _truncate(chunk["text"], text_budget)})
+        break
+    return packed
+
+
+def simhash(text: str, shingle_size: int = 3) -> int:
+    """64-bit SimHash of the word `shingle_size`-shingles of `text`.
+
+    Word hashes come from `hash()`, so fingerprints are only comparable within
+    one process (string hashing is salted per process).
+    """
+    words = _WORD.findall(text.lower())
+    if not words:
+        return 0
+    hashes = np.array([hash(word) for word in words], dtype=np.int64).view(np.uint64)
+    size = min(shingle_size, len(hashes), len(_SHINGLE_MULTIPLIERS))
+    count = len(hashes) - size + 1
+    shingles = np.zeros(count, dtype=np.uint64)
+    for offset in range(size):
+        shingles ^= hashes[offset : offset + count] * _SHINGLE_MULTIPLIERS[offset]
+    shingles ^= shingles >> np.uint64(29)
+    # Each shingle votes on every bit; the fingerprint keeps the majority.
+    votes = ((shingles[:, None] >> _BITS) & np.uint64(1)).sum(axis=0, dtype=np.int64)
+    return int(
+        np.bitwise_or.reduce(
+            np.uint64(1) << _BITS[2 * votes > count], initial=np.uint64(0)
+        )
+    )
+
+
+def hamming_distances(fingerprints: np.ndarray) -> np.ndarray:
+    """Pairwise Hamming distances between uint64 fingerprints, as an (n, n) array."""
+    xor = fingerprints[:, None] ^ fingerprints[None, :]
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(xor)
+    # NumPy < 2.0: count the set bits of each fingerprint's 8 bytes.
+    return (
+        np.unpackbits(xor.view(np.uint8), axis=-1)
+        .reshape(*xor.shape, 64)
+        .sum(axis=-1, dtype=np.uint8)
+    )
+
+
+def drop_near_duplicates(
+    chunks: list[dict[str, Any]],
+    max_bits: int = NEAR_DUPLICATE_MAX_BITS,
+) -> tuple[list[dict[str, Any]], int]:
+    """`chunks` without near-duplicates, and the estimated tokens that saved.
+
+    Of each group of near-duplicates, the copy with the lowest distance (best
+    score) is kept, with its own title for citations; the order of `chunks` is
+    otherwise preserved.
+    """
+    if len(chunks) < 2:
+        return chunks, 0
+    fingerprints = np.array(
+        [simhash(chunk["text"]) for chunk in chunks], dtype=np.uint64
+    )
+    close = hamming_distances(fingerprints) <= max_bits
+    # Best first; chunks without a distance keep their retrieval order, last.
+    order = sorted(
+        range(len(chunks)),
+        key=lambda i: (
+            chunks[i].get("distance") is None,
+            chunks[i].get("distance") or 0.0,
+            i,
+        ),
+    )
+    kept: list[int] = []
+    for i in order:
+        if not close[i, kept].any():
+            kept.append(i)
+    if len(kept) == len(chunks):
+        return chunks, 0
+    keep = set(kept)
+    saved = sum(chunk_tokens(chunk) for i, chunk in enumerate(chunks) if i not in keep)
+    return [chunk for i, chunk in enumerate(chunks) if i in keep], saved
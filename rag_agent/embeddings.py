@@ -0,0 +1,86 @@
+"""Text embedding helpers shared by the semantic cache and retrieval code."""
+
+import hashlib
+import itertools
+import os
+import re
+import threading
+
+import numpy as np
+
+DEFAULT_EMBEDDING_MODEL = os.environ.get("RAG_EMBEDDING_MODEL", "text-embedding-004")
+
+
+class VertexTextEmbedder:
+    """Callable that embeds a single string with a Vertex AI text embedding model.
+
+    The model client is created on first use so importing this module stays cheap.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_EMBEDDING_MODEL):
+        self.model_name = model_name
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _get_model(self):
+        with self._lock:
+            if self._model is None:
+                from vertexai.language_models import TextEmbeddingModel
+
+                self._model = TextEmbeddingModel.from_pretrained(self.model_name)
+            return self._model
+
+    def __call__(self, text: str) -> np.ndarray:
+        [embedding] = self._get_model().get_embeddings([text])
+        return np.asarray(embedding.values, dtype=np.float32)
+
+    def embed_many(self, texts: list[str], batch_size: int = 16) -> np.ndarray:
+        """Embed many texts, `batch_size` per request (the API caps inputs per call)."""
+        model = self._get_model()
+        rows = []
+        for start in range(0, len(texts), batch_size):
+            rows += [
+                e.values
+                for e in model.get_embeddings(texts[start : start + batch_size])
+            ]
+        return np.asarray(rows, dtype=np.float32)
+
+
+class HashingEmbedder:
+    """Offline embedder: signed feature hashing of word unigrams and bigrams.
+
+    Far weaker than a learned model, but deterministic, dependency-free and
+    fast enough for load tests and small local corpora.
+    """
+
+    model_name = "hashing"
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+
+    def _features(self, text: str) -> list[str]:
+        words = re.findall(r"\w+", text.lower())
+        return words + [f"{a} {b}" for a, b in itertools.pairwise(words)]
+
+    def __call__(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in self._features(text):
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            h = int.from_bytes(digest, "little")
+            vector[h % self.dim] += 1.0 if (h >> 63) & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def embed_many(self, texts: list[str], batch_size: int = 0) -> np.ndarray:
+        return (
+            np.stack([self(text) for text in texts])
+            if texts
+            else np.zeros((0, self.dim), np.float32)
+        )
+
+
+def get_embedder(name: str):
+    """Return the embedder for `name`: "hashing" or a Vertex AI embedding model name."""
+    if name == HashingEmbedder.model_name:
+        return HashingEmbedder()
+    return VertexTextEmbedder(name)
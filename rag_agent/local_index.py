@@ -0,0 +1,266 @@
+"""In-process vector indexes for offline and low-latency retrieval.
+
+An index is a directory of plain files that are memory-mapped at load time,
+so opening even a large index is instant and pages are shared between worker
+processes:
+
+    index.json         kind ("flat" or "ivf"), dimension, embedding model, sizes
+    vectors.npy        float32 unit vectors, one row per chunk
+    chunks.jsonl       one {"title", "source_uri", "text"} object per row
+    chunk_offsets.npy  byte offset of each row's line in chunks.jsonl
+    centroids.npy      (ivf) cluster centroids
+    list_offsets.npy   (ivf) rows of cluster i are list_offsets[i]:list_offsets[i + 1]
+
+`BruteForceIndex` scores every vector with one matrix-vector product and is
+exact; it is the right choice for small corpora. `IVFIndex` clusters vectors
+with spherical k-means and only scans the `nprobe` closest clusters, trading a
+little recall for sub-linear search on large corpora.
+"""
+
+import json
+import mmap
+import os
+import shutil
+from collections.abc import Sequence
+from typing import Any
+
+import numpy as np
+
+INDEX_FORMAT_VERSION = 1
+# Above this many chunks "auto" builds an IVF index instead of a flat one.
+FLAT_INDEX_MAX_ROWS = 20000
+
+
+def _unit_rows(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the `k` highest scores, best first."""
+    k = min(k, scores.shape[0])
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates])]
+
+
+class _ChunkStore:
+    """Reads chunk metadata lazily from a memory-mapped JSON lines file."""
+
+    def __init__(self, path: str, offsets: np.ndarray):
+        self._file = open(path, "rb")
+        self._map = (
+            mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            if offsets.size
+            else b""
+        )
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return int(self._offsets.shape[0])
+
+    def __getitem__(self, row: int) -> dict[str, Any]:
+        start = int(self._offsets[row])
+        end = self._map.find(b"\n", start)
+        return json.loads(self._map[start : end if end >= 0 else None])
+
+
+class BruteForceIndex:
+    kind = "flat"
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        chunks: Sequence[dict[str, Any]],
+        path: str | None = None,
+    ):
+        self.vectors = vectors
+        self.chunks = chunks
+        self.path = path
+
+    def __len__(self) -> int:
+        return int(self.vectors.shape[0])
+
+    def _results(
+        self, rows: np.ndarray, scores: np.ndarray, max_distance: float | None
+    ) -> list[dict[str, Any]]:
+        results = []
+        for row, score in zip(rows, scores, strict=True):
+            distance = 1.0 - float(score)
+            if max_distance is not None and distance > max_distance:
+                break
+            results.append({**self.chunks[int(row)], "distance": distance})
+        return results
+
+    def search(
+        self, query: Sequence[float], top_k: int = 10, max_distance: float | None = None
+    ) -> list[dict[str, Any]]:
+        """Return up to `top_k` chunks closest to `query` by cosine distance, nearest first."""
+        if not len(self):
+            return []
+        scores = self.vectors @ _unit_rows(query)
+        rows = _top_k(scores, top_k)
+        return self._results(rows, scores[rows], max_distance)
+
+
+class IVFIndex(BruteForceIndex):
+    kind = "ivf"
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        chunks: Sequence[dict[str, Any]],
+        centroids: np.ndarray,
+        list_offsets: np.ndarray,
+        nprobe: int = 16,
+        path: str | None = None,
+    ):
+        super().__init__(vectors, chunks, path)
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.nprobe = nprobe
+
+    def search(
+        self, query: Sequence[float], top_k: int = 10, max_distance: float | None = None
+    ) -> list[dict[str, Any]]:
+        if not len(self):
+            return []
+        q = _unit_rows(query)
+        lists = _top_k(self.centroids @ q, self.nprobe)
+        rows = np.concatenate(
+            [np.arange(self.list_offsets[i], self.list_offsets[i + 1]) for i in lists]
+        )
+        if not rows.size:
+            return []
+        scores = self.vectors[rows] @ q
+        best = _top_k(scores, top_k)
+        return self._results(rows[best], scores[best], max_distance)
+
+
+def spherical_kmeans(
+    vectors: np.ndarray,
+    n_clusters: int,
+    iterations: int = 10,
+    sample_size: int = 100000,
+    seed: int = 0,
+) -> np.ndarray:
+    """Cluster unit vectors by cosine similarity; returns unit-norm centroids."""
+    rng = np.random.default_rng(seed)
+    sample = vectors
+    if vectors.shape[0] > sample_size:
+        sample = vectors[rng.choice(vectors.shape[0], sample_size, replace=False)]
+    centroids = sample[rng.choice(sample.shape[0], n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = assign_clusters(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, sample)
+        empty = np.bincount(assignment, minlength=n_clusters) == 0
+        # Re-seed empty clusters from random points so every list is used.
+        sums[empty] = sample[rng.choice(sample.shape[0], int(empty.sum()))]
+        centroids = _unit_rows(sums)
+    return centroids
+
+
+def assign_clusters(
+    vectors: np.ndarray, centroids: np.ndarray, batch_size: int = 8192
+) -> np.ndarray:
+    """Nearest centroid for every vector, in batches to bound memory."""
+    assignment = np.empty(vectors.shape[0], dtype=np.int64)
+    for start in range(0, vectors.shape[0], batch_size):
+        batch = vectors[start : start + batch_size]
+        assignment[start : start + batch_size] = np.argmax(batch @ centroids.T, axis=1)
+    return assignment
+
+
+def build_index(
+    chunks: list[dict[str, Any]],
+    vectors: np.ndarray,
+    out_dir: str,
+    kind: str = "auto",
+    n_clusters: int | None = None,
+    embedding_model: str = "",
+) -> str:
+    """Write an index for `chunks` and their embeddings to `out_dir`, replacing any old one."""
+    if len(chunks) != len(vectors):
+        raise ValueError(f"{len(chunks)} chunks but {len(vectors)} vectors")
+    if kind == "auto":
+        kind = "flat" if len(chunks) <= FLAT_INDEX_MAX_ROWS else "ivf"
+    if kind not in ("flat", "ivf"):
+        raise ValueError(f"unknown index kind {kind!r}")
+    vectors = _unit_rows(vectors).reshape(len(chunks), -1)
+
+    tmp_dir = out_dir.rstrip(os.sep) + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    meta: dict[str, Any] = {
+        "version": INDEX_FORMAT_VERSION,
+        "kind": kind,
+        "dim": int(vectors.shape[1]),
+        "rows": len(chunks),
+        "embedding_model": embedding_model,
+    }
+    if kind == "ivf":
+        n_clusters = n_clusters or max(1, min(len(chunks), int(np.sqrt(len(chunks)))))
+        centroids = spherical_kmeans(vectors, n_clusters)
+        assignment = assign_clusters(vectors, centroids)
+        order = np.argsort(assignment, kind="stable")
+        vectors = vectors[order]
+        chunks = [chunks[i] for i in order]
+        list_offsets = np.concatenate(
+            [[0], np.cumsum(np.bincount(assignment, minlength=n_clusters))]
+        )
+        np.save(os.path.join(tmp_dir, "centroids.npy"), centroids)
+        np.save(
+            os.path.join(tmp_dir, "list_offsets.npy"), list_offsets.astype(np.int64)
+        )
+        meta["clusters"] = n_clusters
+
+    np.save(os.path.join(tmp_dir, "vectors.npy"), vectors)
+    offsets = np.zeros(len(chunks), dtype=np.int64)
+    with open(os.path.join(tmp_dir, "chunks.jsonl"), "wb") as f:
+        for i, chunk in enumerate(chunks):
+            offsets[i] = f.tell()
+            record = {key: chunk.get(key) for key in ("title", "source_uri", "text")}
+            f.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+    np.save(os.path.join(tmp_dir, "chunk_offsets.npy"), offsets)
+    with open(os.path.join(tmp_dir, "index.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+
+    # Swap the finished index into place so readers never see a partial one.
+    old_dir = out_dir.rstrip(os.sep) + ".old"
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(out_dir):
+        os.rename(out_dir, old_dir)
+    os.rename(tmp_dir, out_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return out_dir
+
+
+def load_index_meta(path: str) -> dict[str, Any]:
+    with open(os.path.join(path, "index.json")) as f:
+        return json.load(f)
+
+
+def load_index(path: str, nprobe: int = 16) -> BruteForceIndex:
+    """Open an index directory written by `build_index`, memory-mapping its arrays."""
+    meta = load_index_meta(path)
+    if meta.get("version") != INDEX_FORMAT_VERSION:
+        raise ValueError(f"{path}: unsupported index version {meta.get('version')}")
+    vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+    chunks = _ChunkStore(
+        os.path.join(path, "chunks.jsonl"),
+        np.load(os.path.join(path, "chunk_offsets.npy"), mmap_mode="r"),
+    )
+    if meta["kind"] == "ivf":
+        return IVFIndex(
+            vectors,
+            chunks,
+            centroids=np.load(os.path.join(path, "centroids.npy")),
+            list_offsets=np.load(os.path.join(path, "list_offsets.npy")),
+            nprobe=nprobe,
+            path=path,
+        )
+    return BruteForceIndex(vectors, chunks, path=path)
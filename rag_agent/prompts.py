@@ -106,3 +106,34 @@ def return_instructions_root() -> str:
         """
 
     return instruction_prompt_v1
+
+
+def return_instructions_small_talk() -> str:
+    """Instructions for the tool-less model that handles greetings and chit-chat."""
+
+    return """
+        You are the friendly front desk of an AI assistant that answers questions
+        about a specialized corpus of documents. The user is making small talk
+        (a greeting, thanks, or a question about you). Reply briefly and warmly
+        in English, and offer to help with questions about the documents.
+
+        Never state facts about the documents or any other subject yourself.
+        If the message actually asks for information, reply with exactly
+        ESCALATE and nothing else.
+        """
+
+
+def return_instructions_history_summary() -> str:
+    """Instructions for folding old conversation turns into a running summary."""
+
+    return """
+        You maintain a running summary of a conversation between a user and an
+        assistant that answers questions from a corpus of documents. You are
+        given the summary so far (possibly empty) and the turns that are about
+        to be dropped from the conversation history.
+
+        Write an updated summary, in at most 150 words, that keeps what later
+        questions may refer back to: the topics asked about, the key facts and
+        figures in the answers, and the titles of the documents they cited.
+        Reply with the summary only.
+        """
@@ -0,0 +1,258 @@
+"""Retrieval backends and the agent's retrieval tool.
+
+A backend turns a query into a list of chunks, each a dict with at least
+"title", "source_uri", "text" and "distance". `VertexRagBackend` queries a
+Vertex AI RAG corpus; `LocalIndexBackend` searches an in-process vector index
+built by `build_local_index.py`. `RetrievalTool` exposes any backend to the
+agent as a function tool, optionally behind a result cache, with adaptive
+top-k, near-duplicate removal and token-budgeted context packing (see
+context.py).
+"""
+
+import asyncio
+import logging
+import os
+from typing import Any, Protocol
+
+from google.adk.tools.retrieval.base_retrieval_tool import BaseRetrievalTool
+from google.adk.tools.tool_context import ToolContext
+
+try:
+    from .cache import LRUTTLCache, corpus_generation, normalize_query
+    from .context import (
+        NEAR_DUPLICATE_MAX_BITS,
+        chunk_tokens,
+        drop_near_duplicates,
+        pack_context,
+    )
+    from .embeddings import get_embedder
+    from .local_index import load_index, load_index_meta
+    from .telemetry import context_tokens_saved, stage
+except ImportError:
+    from cache import LRUTTLCache, corpus_generation, normalize_query
+    from context import (
+        NEAR_DUPLICATE_MAX_BITS,
+        chunk_tokens,
+        drop_near_duplicates,
+        pack_context,
+    )
+    from embeddings import get_embedder
+    from local_index import load_index, load_index_meta
+    from telemetry import context_tokens_saved, stage
+
+logger = logging.getLogger(__name__)
+
+
+class RetrievalBackend(Protocol):
+    def cache_identity(self) -> tuple:
+        """Identifies the data being searched; changes whenever that data changes."""
+
+    def retrieve(
+        self, query: str, top_k: int, max_distance: float | None
+    ) -> list[dict[str, Any]]:
+        """Blocking retrieval of up to `top_k` chunks, nearest first."""
+
+
+class VertexRagBackend:
+    def __init__(
+        self, rag_resources: list | None = None, rag_corpora: list[str] | None = None
+    ):
+        self.rag_resources = rag_resources
+        self.rag_corpora = rag_corpora
+
+    def corpora(self) -> tuple[str, ...]:
+        names = [resource.rag_corpus for resource in self.rag_resources or []]
+        names += list(self.rag_corpora or [])
+        return tuple(sorted(name for name in names if name))
+
+    def cache_identity(self) -> tuple:
+        corpora = self.corpora()
+        return (
+            "vertex",
+            corpora,
+            tuple(corpus_generation(corpus) for corpus in corpora),
+        )
+
+    def retrieve(
+        self, query: str, top_k: int, max_distance: float | None
+    ) -> list[dict[str, Any]]:
+        from vertexai.preview import rag
+
+        response = rag.retrieval_query(
+            text=query,
+            rag_resources=self.rag_resources,
+            rag_corpora=self.rag_corpora,
+            similarity_top_k=top_k,
+            vector_distance_threshold=max_distance,
+        )
+        return [
+            {
+                "title": context.source_display_name or context.source_uri,
+                "source_uri": context.source_uri,
+                "distance": context.distance,
+                "text": context.text,
+            }
+            for context in response.contexts.contexts
+        ]
+
+
+class LocalIndexBackend:
+    """Searches a memory-mapped local index, embedding queries with the model it was built with.
+
+    The index is reopened when its index.json changes, so a `build_index`
+    swap is picked up by running workers without a restart.
+    """
+
+    def __init__(self, path: str, nprobe: int = 16):
+        self.path = path
+        self.nprobe = nprobe
+        self._stamp: tuple[int, int] | None = None
+        self._refresh()
+
+    def _index_stamp(self) -> tuple[int, int]:
+        # A rebuild swaps in a new directory, so the inode changes even when
+        # the mtime does not.
+        stat = os.stat(os.path.join(self.path, "index.json"))
+        return stat.st_mtime_ns, stat.st_ino
+
+    def _refresh(self) -> None:
+        stamp = self._index_stamp()
+        if stamp == self._stamp:
+            return
+        index = load_index(self.path, nprobe=self.nprobe)
+        embed = get_embedder(load_index_meta(self.path)["embedding_model"])
+        if self._stamp is not None:
+            logger.info(f"Reloaded local index {self.path} ({len(index)} chunks)")
+        self.index, self.embed, self._stamp = index, embed, stamp
+
+    def cache_identity(self) -> tuple:
+        self._refresh()
+        return ("local", self.path, self._stamp)
+
+    def retrieve(
+        self, query: str, top_k: int, max_distance: float | None
+    ) -> list[dict[str, Any]]:
+        self._refresh()
+        index, embed = self.index, self.embed
+        return index.search(embed(query), top_k=top_k, max_distance=max_distance)
+
+
+class RetrievalTool(BaseRetrievalTool):
+    """Function tool that retrieves chunks from a `RetrievalBackend`.
+
+    Unlike the stock VertexAiRagRetrieval, which hands retrieval to Gemini 2+'s
+    built-in (server-side) Vertex RAG integration, this always runs retrieval
+    locally through `run_async`, so results can be cached and post-processed.
+
+    With `initial_top_k`, retrieval starts with that many chunks and doubles k
+    (up to `similarity_top_k`) while fewer than `min_strong` of them are within
+    `strong_distance`, so clear matches cost a small query and weak ones look
+    wider. Chunks within `dedup_max_bits` SimHash bits of a better one are
+    dropped (None keeps them all). With `context_token_budget`, the remaining
+    chunks are packed into that many (estimated) tokens, best first, titles
+    kept. Tokens saved by both are recorded in `rag.context.tokens_saved`.
+
+    Cached entries are keyed by the backend's identity (corpus and its
+    generation, see `cache.mark_corpus_changed`), the retrieval settings and
+    the normalized query.
+    """
+
+    def __init__(
+        self,
+        *,
+        name: str,
+        description: str,
+        backend: RetrievalBackend,
+        similarity_top_k: int = 10,
+        vector_distance_threshold: float | None = None,
+        cache: LRUTTLCache | None = None,
+        initial_top_k: int | None = None,
+        strong_distance: float = 0.4,
+        min_strong: int = 2,
+        context_token_budget: int | None = None,
+        dedup_max_bits: int | None = NEAR_DUPLICATE_MAX_BITS,
+    ):
+        super().__init__(name=name, description=description)
+        self.backend = backend
+        self.similarity_top_k = similarity_top_k
+        self.vector_distance_threshold = vector_distance_threshold
+        self.cache = cache
+        self.initial_top_k = min(initial_top_k or similarity_top_k, similarity_top_k)
+        self.strong_distance = strong_distance
+        self.min_strong = min_strong
+        self.context_token_budget = context_token_budget
+        self.dedup_max_bits = dedup_max_bits
+
+    def cache_key(self, query: str) -> tuple:
+        return (
+            self.backend.cache_identity(),
+            self.similarity_top_k,
+            self.vector_distance_threshold,
+            self.initial_top_k,
+            self.strong_distance,
+            self.min_strong,
+            normalize_query(query),
+        )
+
+    def _is_weak(self, chunks: list[dict[str, Any]]) -> bool:
+        strong = sum(
+            1
+            for chunk in chunks
+            if chunk.get("distance") is not None
+            and chunk["distance"] <= self.strong_distance
+        )
+        return strong < self.min_strong
+
+    async def _retrieve_adaptive(
+        self, query: str, attributes: dict[str, Any]
+    ) -> list[dict[str, Any]]:
+        top_k = self.initial_top_k
+        while True:
+            chunks = await asyncio.to_thread(
+                self.backend.retrieve, query, top_k, self.vector_distance_threshold
+            )
+            # Fewer than top_k means the distance threshold already cut the rest.
+            if (
+                top_k >= self.similarity_top_k
+                or len(chunks) < top_k
+                or not self._is_weak(chunks)
+            ):
+                attributes["top_k"] = top_k
+                return chunks
+            top_k = min(self.similarity_top_k, top_k * 2)
+
+    async def retrieve(self, query: str) -> list[dict[str, Any]]:
+        with stage("retrieval", backend=type(self.backend).__name__) as attributes:
+            key = self.cache_key(query) if self.cache is not None else None
+            if key is not None:
+                chunks = self.cache.get(key)
+                if chunks is not None:
+                    logger.info("Retrieval cache hit")
+                    attributes["cache_hit"] = True
+                    return chunks
+            attributes["cache_hit"] = False
+            chunks = await self._retrieve_adaptive(query, attributes)
+            if key is not None:
+                self.cache.put(key, chunks)
+            return chunks
+
+    async def run_async(
+        self, *, args: dict[str, Any], tool_context: ToolContext
+    ) -> Any:
+        chunks = await self.retrieve(args["query"])
+        if not chunks:
+            return "No matching result found in the corpus."
+        if self.dedup_max_bits is not None:
+            chunks, saved = drop_near_duplicates(chunks, self.dedup_max_bits)
+            context_tokens_saved.record(saved, {"reason": "near_duplicate"})
+            if saved:
+                logger.info(f"Dropped near-duplicate chunks, saving ~{saved} tokens")
+        if self.context_token_budget:
+            packed = pack_context(chunks, self.context_token_budget)
+            context_tokens_saved.record(
+                sum(map(chunk_tokens, chunks)) - sum(map(chunk_tokens, packed)),
+                {"reason": "budget"},
+            )
+            chunks = packed
+        # Keep the source title: the citation rules in prompts.py rely on it.
+        return [{"title": chunk["title"], "text": chunk["text"]} for chunk in chunks]
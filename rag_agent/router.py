@@ -0,0 +1,186 @@
+"""Cheap local routing ahead of the RAG agent.
+
+`classify_intent` is a lexical classifier: it recognizes greetings, thanks and
+questions about the assistant itself, and treats anything that looks like a
+request for information as a corpus question. It runs in microseconds, so the
+fast path for small talk costs nothing on other queries.
+
+`ask_rag_agent` sends small talk classified with at least ROUTER_MIN_CONFIDENCE
+to a small model with no tools, skipping the root model's retrieval decision
+and the tool round trip; everything else goes to the root agent. The small
+model answers `ESCALATE_TOKEN` when a message turns out to need the documents,
+and the query is then re-run on the root agent. With ROUTER_CASCADE, small talk
+the classifier is unsure about also tries the small model first, escalating
+only when it can't answer.
+"""
+
+import re
+from dataclasses import dataclass
+
+SMALL_TALK = "small_talk"
+CORPUS = "corpus"
+
+# Reply from the small-talk model meaning "this needs the full agent".
+ESCALATE_TOKEN = "ESCALATE"
+
+_SMALL_TALK_PHRASES = frozenset(
+    {
+        "hi",
+        "hello",
+        "hey",
+        "hiya",
+        "yo",
+        "howdy",
+        "greetings",
+        "good morning",
+        "good afternoon",
+        "good evening",
+        "good night",
+        "thanks",
+        "thank you",
+        "thanks a lot",
+        "thank you very much",
+        "many thanks",
+        "cheers",
+        "ok",
+        "okay",
+        "cool",
+        "great",
+        "nice",
+        "awesome",
+        "perfect",
+        "got it",
+        "bye",
+        "goodbye",
+        "see you",
+        "see you later",
+        "have a nice day",
+        "how are you",
+        "how are you doing",
+        "how is it going",
+        "how's it going",
+        "what's up",
+        "whats up",
+        "who are you",
+        "what are you",
+        "what is your name",
+        "what's your name",
+        "what can you do",
+        "nice to meet you",
+        "you are great",
+        "you're great",
+        "well done",
+        "good job",
+    }
+)
+_OPENERS = frozenset(
+    {
+        "hi",
+        "hello",
+        "hey",
+        "thanks",
+        "thank",
+        "ok",
+        "okay",
+        "cool",
+        "great",
+        "bye",
+        "goodbye",
+        "good",
+    }
+)
+_FILLER = frozenset(
+    {
+        "there",
+        "you",
+        "again",
+        "so",
+        "much",
+        "very",
+        "a",
+        "lot",
+        "all",
+        "guys",
+        "team",
+        "bot",
+        "morning",
+        "afternoon",
+        "evening",
+        "night",
+        "buddy",
+        "friend",
+        "and",
+        "for",
+        "the",
+        "help",
+    }
+)
+_QUESTION_WORDS = frozenset(
+    {
+        "what",
+        "how",
+        "why",
+        "when",
+        "where",
+        "which",
+        "who",
+        "whose",
+        "whom",
+        "explain",
+        "describe",
+        "list",
+        "summarize",
+        "summarise",
+        "compare",
+        "define",
+        "show",
+        "tell",
+        "find",
+        "give",
+        "does",
+        "do",
+        "is",
+        "are",
+        "can",
+        "could",
+        "should",
+        "would",
+    }
+)
+_WORD = re.compile(r"[a-z0-9']+")
+
+
+@dataclass
+class Route:
+    intent: str
+    confidence: float
+
+
+def classify_intent(query: str) -> Route:
+    """Route `query` to SMALL_TALK or CORPUS, with a confidence in [0, 1]."""
+    words = _WORD.findall(query.lower())
+    if not words:
+        return Route(SMALL_TALK, 0.9)
+    phrase = " ".join(words)
+    if phrase in _SMALL_TALK_PHRASES:
+        return Route(SMALL_TALK, 0.95)
+    if words[0] in _OPENERS:
+        rest = words[1:]
+        while rest and rest[0] in _FILLER:
+            rest = rest[1:]
+        if " ".join(rest) in _SMALL_TALK_PHRASES or all(
+            word in _FILLER for word in rest
+        ):
+            return Route(SMALL_TALK, 0.9)
+        # "hi, what does the report say about ..." is a question with a greeting.
+        if len(rest) > 2:
+            return Route(CORPUS, 0.8)
+        return Route(SMALL_TALK, 0.6)
+    if "?" in query or _QUESTION_WORDS.intersection(words) or len(words) > 6:
+        return Route(CORPUS, 0.9)
+    # Short and unrecognized: probably chat, but not sure enough for the fast path.
+    return Route(SMALL_TALK, 0.5)
+
+
+def is_escalation(answer: str) -> bool:
+    return answer.strip().strip(".").upper() == ESCALATE_TOKEN
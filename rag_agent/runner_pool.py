@@ -0,0 +1,128 @@
+"""Process-wide ADK Runner and session bookkeeping for the RAG agent.
+
+Building an `InMemorySessionService` and a `Runner` per request is pure
+overhead: both are stateless apart from the sessions they hold. `RunnerPool`
+keeps one of each per process and tracks when every session was last used so
+finished sessions are dropped straight away and abandoned ones are swept once
+they have been idle for `idle_ttl_seconds`. With a persistent session service
+(`delete_on_evict=False`), sweeping only forgets idle sessions; the service
+keeps them until its own retention runs out.
+"""
+
+import logging
+import time
+from collections import Counter
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+from google.adk.agents import BaseAgent
+from google.adk.runners import Runner
+from google.adk.sessions import BaseSessionService, InMemorySessionService
+
+logger = logging.getLogger(__name__)
+
+
+class RunnerPool:
+    """One shared Runner plus idle/finished session eviction."""
+
+    def __init__(
+        self,
+        agent: BaseAgent,
+        app_name: str = "rag_agent",
+        session_service: BaseSessionService | None = None,
+        idle_ttl_seconds: float = 900.0,
+        sweep_interval_seconds: float = 60.0,
+        delete_on_evict: bool = True,
+    ):
+        self.app_name = app_name
+        self.session_service = session_service or InMemorySessionService()
+        self.runner = Runner(
+            agent=agent, session_service=self.session_service, app_name=app_name
+        )
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self.delete_on_evict = delete_on_evict
+        self._last_used: dict[tuple[str, str], float] = {}
+        # Runs holding each session; a session is in use until its count drops to zero.
+        self._in_use: Counter[tuple[str, str]] = Counter()
+        self._last_sweep = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._last_used)
+
+    async def acquire(self, user_id: str, session_id: str | None = None) -> str:
+        """Return a session id for `user_id`, creating the session if it does not exist."""
+        await self._maybe_sweep()
+        session = None
+        if session_id is not None:
+            session = await self.session_service.get_session(
+                app_name=self.app_name, user_id=user_id, session_id=session_id
+            )
+        if session is None:
+            session = await self.session_service.create_session(
+                app_name=self.app_name, user_id=user_id, session_id=session_id
+            )
+        key = (user_id, session.id)
+        self._in_use[key] += 1
+        self._last_used[key] = time.monotonic()
+        return session.id
+
+    async def release(
+        self, user_id: str, session_id: str, finished: bool = True
+    ) -> None:
+        """Mark a session as no longer running; finished sessions are deleted immediately.
+
+        A session acquired by several concurrent runs is only released, and
+        deleted when finished, once the last of them releases it.
+        """
+        key = (user_id, session_id)
+        self._in_use[key] -= 1
+        if self._in_use[key] > 0:
+            self._last_used[key] = time.monotonic()
+            return
+        del self._in_use[key]
+        if finished:
+            await self._delete(key)
+        else:
+            self._last_used[key] = time.monotonic()
+
+    @asynccontextmanager
+    async def session(
+        self, user_id: str, session_id: str | None = None, keep: bool = False
+    ) -> AsyncIterator[str]:
+        """Acquire a session for one run; it is deleted afterwards unless `keep` is set."""
+        sid = await self.acquire(user_id, session_id)
+        try:
+            yield sid
+        finally:
+            await self.release(user_id, sid, finished=not keep)
+
+    async def evict_idle(self) -> int:
+        """Evict sessions idle for longer than `idle_ttl_seconds`; returns how many."""
+        cutoff = time.monotonic() - self.idle_ttl_seconds
+        stale = [
+            key
+            for key, last_used in self._last_used.items()
+            if last_used < cutoff and key not in self._in_use
+        ]
+        for key in stale:
+            if self.delete_on_evict:
+                await self._delete(key)
+            else:
+                self._last_used.pop(key, None)
+        if stale:
+            logger.info(f"Evicted {len(stale)} idle sessions ({len(self)} remaining)")
+        return len(stale)
+
+    async def _maybe_sweep(self) -> None:
+        now = time.monotonic()
+        if now - self._last_sweep >= self.sweep_interval_seconds:
+            self._last_sweep = now
+            await self.evict_idle()
+
+    async def _delete(self, key: tuple[str, str]) -> None:
+        self._last_used.pop(key, None)
+        user_id, session_id = key
+        await self.session_service.delete_session(
+            app_name=self.app_name, user_id=user_id, session_id=session_id
+        )
@@ -0,0 +1,407 @@
+"""Persistent, bounded conversation history for multi-turn RAG sessions.
+
+`SqliteSessionService` is an ADK session service backed by one SQLite file
+(shared by every worker process on the host, in WAL mode) that keeps sessions
+keyed by app, user and session ID across restarts. It stores conversations
+compactly: only the text of each user message and final model answer is
+written, one row per turn. Partial (streamed) events, function calls and
+tool responses, which carry the retrieved chunks, only live in memory for the
+duration of a run; the answer that quotes them is what the next turn needs.
+
+Once a session's stored history passes `history_token_budget` (estimated
+tokens), the oldest turns are dropped, or, with a `summarizer`, folded into
+a running summary that is replayed as the first message of the history. The
+most recent turn is always kept. Sessions not updated for `retention_seconds`
+are deleted, so the file stays bounded too.
+
+State is not shared between sessions: "app:" and "user:" keys are stored with
+the session like any other, and "temp:" keys are not stored.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from google.adk.events import Event
+from google.adk.sessions import BaseSessionService, Session, State
+from google.adk.sessions.base_session_service import (
+    GetSessionConfig,
+    ListSessionsResponse,
+)
+from google.genai import types
+
+try:
+    from .context import estimate_tokens
+except ImportError:
+    from context import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# (summary so far, evicted (role, text) turns, oldest first) -> new summary.
+Summarizer = Callable[[str, list[tuple[str, str]]], Awaitable[str]]
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+# Seconds between sweeps for sessions past their retention.
+PURGE_INTERVAL_SECONDS = 300
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    state TEXT NOT NULL,
+    summary TEXT NOT NULL DEFAULT '',
+    create_time REAL NOT NULL,
+    update_time REAL NOT NULL,
+    PRIMARY KEY (app_name, user_id, id)
+);
+CREATE INDEX IF NOT EXISTS sessions_update_time ON sessions (update_time);
+CREATE TABLE IF NOT EXISTS turns (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    author TEXT NOT NULL,
+    role TEXT NOT NULL,
+    text TEXT NOT NULL,
+    tokens INTEGER NOT NULL,
+    timestamp REAL NOT NULL,
+    PRIMARY KEY (app_name, user_id, session_id, seq)
+);
+"""
+
+
+def _turn_text(event: Event) -> str | None:
+    """The text worth keeping from `event`, or None for events that aren't conversation turns."""
+    if event.partial or not (event.content and event.content.parts):
+        return None
+    if event.get_function_calls() or event.get_function_responses():
+        return None
+    text = "".join(
+        part.text for part in event.content.parts if part.text and not part.thought
+    )
+    return text or None
+
+
+def _persistent_state(state: dict[str, Any]) -> dict[str, Any]:
+    return {
+        key: value
+        for key, value in state.items()
+        if not key.startswith(State.TEMP_PREFIX)
+    }
+
+
+class SqliteSessionService(BaseSessionService):
+    """ADK session service persisting compact, token-bounded history to SQLite."""
+
+    def __init__(
+        self,
+        path: str,
+        history_token_budget: int = 2000,
+        summarizer: Summarizer | None = None,
+        retention_seconds: float = 7 * 24 * 3600,
+    ):
+        self.path = path
+        self.history_token_budget = history_token_budget
+        self.summarizer = summarizer
+        self.retention_seconds = retention_seconds
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        # One connection shared by the to_thread workers; SQLite serializes writers anyway.
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+
+    def _run(self, fn: Callable[[sqlite3.Connection], Any]) -> Awaitable[Any]:
+        def locked() -> Any:
+            with self._lock:
+                return fn(self._db)
+
+        return asyncio.to_thread(locked)
+
+    async def create_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        state: dict[str, Any] | None = None,
+        session_id: str | None = None,
+    ) -> Session:
+        await self._maybe_purge()
+        session_id = (session_id or "").strip() or str(uuid.uuid4())
+        state = dict(state or {})
+        now = time.time()
+
+        def insert(db: sqlite3.Connection) -> None:
+            with db:
+                db.execute(
+                    "INSERT INTO sessions (app_name, user_id, id, state, create_time, update_time)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        app_name,
+                        user_id,
+                        session_id,
+                        json.dumps(state, default=str),
+                        now,
+                        now,
+                    ),
+                )
+
+        await self._run(insert)
+        return Session(
+            id=session_id,
+            app_name=app_name,
+            user_id=user_id,
+            state=state,
+            last_update_time=now,
+        )
+
+    async def get_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        config: GetSessionConfig | None = None,
+    ) -> Session | None:
+        def load(db: sqlite3.Connection) -> tuple | None:
+            row = db.execute(
+                "SELECT state, summary, update_time FROM sessions WHERE app_name = ? AND user_id = ? AND id = ?",
+                (app_name, user_id, session_id),
+            ).fetchone()
+            if row is None:
+                return None
+            turns = db.execute(
+                "SELECT author, role, text, timestamp FROM turns"
+                " WHERE app_name = ? AND user_id = ? AND session_id = ? ORDER BY seq",
+                (app_name, user_id, session_id),
+            ).fetchall()
+            return row, turns
+
+        loaded = await self._run(load)
+        if loaded is None:
+            return None
+        (state, summary, update_time), turns = loaded
+        events = []
+        if summary:
+            events.append(
+                self._event(
+                    "user",
+                    "user",
+                    SUMMARY_PREFIX + summary,
+                    turns[0][3] if turns else update_time,
+                )
+            )
+        events.extend(self._event(*turn) for turn in turns)
+        if config is not None:
+            if config.after_timestamp is not None:
+                events = [
+                    event
+                    for event in events
+                    if event.timestamp >= config.after_timestamp
+                ]
+            if config.num_recent_events is not None:
+                events = (
+                    events[-config.num_recent_events :]
+                    if config.num_recent_events
+                    else []
+                )
+        return Session(
+            id=session_id,
+            app_name=app_name,
+            user_id=user_id,
+            state=json.loads(state),
+            events=events,
+            last_update_time=update_time,
+        )
+
+    @staticmethod
+    def _event(author: str, role: str, text: str, timestamp: float) -> Event:
+        return Event(
+            author=author,
+            content=types.Content(role=role, parts=[types.Part.from_text(text=text)]),
+            timestamp=timestamp,
+        )
+
+    async def list_sessions(
+        self, *, app_name: str, user_id: str | None = None
+    ) -> ListSessionsResponse:
+        def select(db: sqlite3.Connection) -> list[tuple]:
+            if user_id is None:
+                return db.execute(
+                    "SELECT user_id, id, update_time FROM sessions WHERE app_name = ?",
+                    (app_name,),
+                ).fetchall()
+            return db.execute(
+                "SELECT user_id, id, update_time FROM sessions WHERE app_name = ? AND user_id = ?",
+                (app_name, user_id),
+            ).fetchall()
+
+        rows = await self._run(select)
+        return ListSessionsResponse(
+            sessions=[
+                Session(
+                    id=sid, app_name=app_name, user_id=uid, last_update_time=updated
+                )
+                for uid, sid, updated in rows
+            ]
+        )
+
+    async def delete_session(
+        self, *, app_name: str, user_id: str, session_id: str
+    ) -> None:
+        def delete(db: sqlite3.Connection) -> None:
+            with db:
+                db.execute(
+                    "DELETE FROM turns WHERE app_name = ? AND user_id = ? AND session_id = ?",
+                    (app_name, user_id, session_id),
+                )
+                db.execute(
+                    "DELETE FROM sessions WHERE app_name = ? AND user_id = ? AND id = ?",
+                    (app_name, user_id, session_id),
+                )
+
+        await self._run(delete)
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        event = await super().append_event(session, event)
+        if event.partial:
+            return event
+        text = _turn_text(event)
+        state_delta = event.actions.state_delta if event.actions else None
+        if text is None and not state_delta:
+            return event
+        key = (session.app_name, session.user_id, session.id)
+        role = event.content.role if event.content and event.content.role else "model"
+
+        def write(db: sqlite3.Connection) -> None:
+            with db:
+                if text is not None:
+                    db.execute(
+                        "INSERT INTO turns (app_name, user_id, session_id, seq, author, role, text, tokens, timestamp)"
+                        " SELECT ?, ?, ?, COALESCE(MAX(seq), 0) + 1, ?, ?, ?, ?, ? FROM turns"
+                        " WHERE app_name = ? AND user_id = ? AND session_id = ?",
+                        (
+                            *key,
+                            event.author,
+                            role,
+                            text,
+                            estimate_tokens(text),
+                            event.timestamp,
+                            *key,
+                        ),
+                    )
+                db.execute(
+                    "UPDATE sessions SET state = ?, update_time = ? WHERE app_name = ? AND user_id = ? AND id = ?",
+                    (
+                        json.dumps(_persistent_state(session.state), default=str),
+                        event.timestamp,
+                        *key,
+                    ),
+                )
+
+        await self._run(write)
+        session.last_update_time = event.timestamp
+        # Trim once the answer is in, so a turn's question and answer go together.
+        if text is not None and role == "model":
+            await self._enforce_budget(*key)
+        return event
+
+    async def _enforce_budget(
+        self, app_name: str, user_id: str, session_id: str
+    ) -> None:
+        key = (app_name, user_id, session_id)
+
+        def select(db: sqlite3.Connection) -> tuple[str, list[tuple]]:
+            (summary,) = db.execute(
+                "SELECT summary FROM sessions WHERE app_name = ? AND user_id = ? AND id = ?",
+                key,
+            ).fetchone()
+            turns = db.execute(
+                "SELECT seq, role, text, tokens FROM turns"
+                " WHERE app_name = ? AND user_id = ? AND session_id = ? ORDER BY seq",
+                key,
+            ).fetchall()
+            return summary, turns
+
+        summary, turns = await self._run(select)
+        total = estimate_tokens(summary) + sum(tokens for *_, tokens in turns)
+        if total <= self.history_token_budget:
+            return
+        # Drop the oldest turns, but never the latest user/model exchange.
+        evicted = []
+        for turn in turns[:-2]:
+            if total <= self.history_token_budget:
+                break
+            evicted.append(turn)
+            total -= turn[3]
+        if not evicted:
+            return
+        summarized = False
+        if self.summarizer is not None:
+            try:
+                summary = await self.summarizer(
+                    summary, [(role, text) for _, role, text, _ in evicted]
+                )
+                summarized = True
+            except Exception as e:
+                # The turns are dropped either way; history just loses their gist.
+                logger.warning(
+                    f"Failed to summarize session {session_id}, trimming instead: {e}"
+                )
+        else:
+            summary = ""
+        through = evicted[-1][0]
+
+        def trim(db: sqlite3.Connection) -> None:
+            with db:
+                db.execute(
+                    "DELETE FROM turns WHERE app_name = ? AND user_id = ? AND session_id = ? AND seq <= ?",
+                    (*key, through),
+                )
+                db.execute(
+                    "UPDATE sessions SET summary = ? WHERE app_name = ? AND user_id = ? AND id = ?",
+                    (summary, *key),
+                )
+
+        await self._run(trim)
+        logger.info(
+            f"{'Summarized' if summarized else 'Trimmed'} {len(evicted)} turns of session {session_id}"
+        )
+
+    async def purge_expired(self) -> int:
+        """Delete sessions not updated within `retention_seconds`; returns how many."""
+        cutoff = time.time() - self.retention_seconds
+
+        def purge(db: sqlite3.Connection) -> int:
+            with db:
+                db.execute(
+                    "DELETE FROM turns WHERE (app_name, user_id, session_id) IN"
+                    " (SELECT app_name, user_id, id FROM sessions WHERE update_time < ?)",
+                    (cutoff,),
+                )
+                return db.execute(
+                    "DELETE FROM sessions WHERE update_time < ?", (cutoff,)
+                ).rowcount
+
+        purged = await self._run(purge)
+        if purged:
+            logger.info(
+                f"Purged {purged} sessions idle for over {self.retention_seconds:g}s"
+            )
+        return purged
+
+    async def _maybe_purge(self) -> None:
+        now = time.monotonic()
+        if now - self._last_purge >= PURGE_INTERVAL_SECONDS:
+            self._last_purge = now
+            await self.purge_expired()
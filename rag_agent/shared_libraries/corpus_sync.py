@@ -0,0 +1,285 @@
+"""Incremental corpus sync backed by a local manifest of content hashes.
+
+The manifest maps each source (a local path or a URL) to the SHA-256 of its
+contents and the name of the RagFile created from it. Comparing the current
+sources against it splits them into new, changed, unchanged and removed, so a
+sync only uploads the delta: changed files are uploaded again and their old
+RagFile deleted, and RagFiles whose source disappeared are deleted. A replaced
+RagFile whose delete fails is kept in the manifest's `pending_delete` list and
+deleted by the next sync.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field
+from typing import Any
+
+try:
+    from .uploader import ConcurrentUploader, UploadJob, UploadReport, UploadResult
+except ImportError:
+    from uploader import ConcurrentUploader, UploadJob, UploadReport, UploadResult
+
+MANIFEST_DIR = os.getenv(
+    "RAG_SYNC_MANIFEST_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), ".rag_manifests"),
+)
+# Saving rewrites the whole file, so don't do it after every single upload.
+SAVE_INTERVAL_SECONDS = 5.0
+
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def manifest_path(corpus_name: str) -> str:
+    """One manifest per corpus, named after a hash of the corpus resource name."""
+    return os.path.join(
+        MANIFEST_DIR, hashlib.sha256(corpus_name.encode()).hexdigest()[:16] + ".json"
+    )
+
+
+class SyncManifest:
+    def __init__(self, path: str, corpus_name: str):
+        self.path = path
+        self.corpus_name = corpus_name
+        self.entries: dict[str, dict[str, Any]] = {}
+        # Replaced RagFiles that couldn't be deleted yet.
+        self.pending_delete: list[str] = []
+        self._saved_at = 0.0
+
+    @classmethod
+    def load(cls, corpus_name: str, path: str | None = None) -> "SyncManifest":
+        manifest = cls(path or manifest_path(corpus_name), corpus_name)
+        if os.path.exists(manifest.path):
+            with open(manifest.path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("corpus_name") != corpus_name:
+                raise ValueError(
+                    f"{manifest.path} belongs to corpus {data.get('corpus_name')}"
+                )
+            manifest.entries = data.get("files", {})
+            manifest.pending_delete = data.get("pending_delete", [])
+        return manifest
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "corpus_name": self.corpus_name,
+                    "files": self.entries,
+                    "pending_delete": self.pending_delete,
+                },
+                f,
+                indent=1,
+                sort_keys=True,
+            )
+        os.replace(tmp_path, self.path)
+        self._saved_at = time.monotonic()
+
+    def save_periodically(self) -> None:
+        if time.monotonic() - self._saved_at >= SAVE_INTERVAL_SECONDS:
+            self.save()
+
+
+@dataclass
+class SyncSource:
+    key: str  # local path or URL; identifies the source across runs
+    path: str  # local file holding the current contents
+    display_name: str
+    description: str = ""
+    sha256: str = ""
+
+
+@dataclass
+class SyncPlan:
+    new: list[SyncSource] = field(default_factory=list)
+    changed: list[SyncSource] = field(default_factory=list)
+    unchanged: list[SyncSource] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+
+    def summary(self) -> str:
+        return (
+            f"{len(self.new)} new, {len(self.changed)} changed, "
+            f"{len(self.unchanged)} unchanged, {len(self.removed)} removed"
+        )
+
+
+def plan_sync(
+    manifest: SyncManifest, sources: list[SyncSource], delete_missing: bool = True
+) -> SyncPlan:
+    """Hash every source and compare it with the manifest."""
+    plan = SyncPlan()
+    for source in sources:
+        source.sha256 = source.sha256 or file_sha256(source.path)
+        entry = manifest.entries.get(source.key)
+        if entry is None:
+            plan.new.append(source)
+        elif entry["sha256"] != source.sha256:
+            plan.changed.append(source)
+        else:
+            plan.unchanged.append(source)
+    if delete_missing:
+        current = {source.key for source in sources}
+        plan.removed = [key for key in manifest.entries if key not in current]
+    return plan
+
+
+def _default_delete(rag_file_name: str) -> None:
+    from vertexai.preview import rag
+
+    rag.delete_file(name=rag_file_name)
+
+
+@dataclass
+class SyncReport:
+    uploaded: list[UploadResult] = field(default_factory=list)
+    failed: list[UploadResult] = field(default_factory=list)
+    deleted: list[str] = field(default_factory=list)
+    delete_errors: list[str] = field(default_factory=list)
+    upload: UploadReport | None = None
+
+    @property
+    def changed_corpus(self) -> bool:
+        return bool(self.uploaded or self.deleted)
+
+    def print_summary(self) -> None:
+        if self.upload is not None:
+            self.upload.print_summary()
+        print(f"🗑️  Deleted {len(self.deleted)} stale RagFiles")
+        for error in self.delete_errors:
+            print(f"   ❌ {error}")
+
+
+class IncrementalSync:
+    """Per-source sync steps, for callers that discover sources as they go.
+
+    `plan_sync`/`apply_sync` need every source up front; a streaming ingest
+    instead calls `job_for` as each download lands, `record` as each upload
+    finishes and `retry_pending_deletes` and `remove_missing` once all sources
+    have been seen. The methods are safe to call from several threads.
+    """
+
+    def __init__(
+        self,
+        manifest: SyncManifest,
+        delete_fn: Callable[[str], None] = _default_delete,
+        catalog: Any = None,
+    ):
+        self.manifest = manifest
+        self.delete_fn = delete_fn
+        self.catalog = catalog
+        self.report = SyncReport()
+        self.unchanged: list[str] = []
+        self._lock = threading.Lock()
+
+    def job_for(self, source: SyncSource) -> UploadJob | None:
+        """The upload needed to bring `source` in sync, or None if it is unchanged."""
+        source.sha256 = source.sha256 or file_sha256(source.path)
+        with self._lock:
+            entry = self.manifest.entries.get(source.key)
+            if entry is not None and entry["sha256"] == source.sha256:
+                self.unchanged.append(source.key)
+                return None
+        return UploadJob(
+            source.path,
+            source.display_name,
+            source.description,
+            key=source.key,
+            sha256=source.sha256,
+        )
+
+    def _delete(self, rag_file_name: str) -> bool:
+        try:
+            self.delete_fn(rag_file_name)
+        except Exception as e:
+            with self._lock:
+                self.report.delete_errors.append(f"{rag_file_name}: {e}")
+            return False
+        if self.catalog is not None:
+            self.catalog.remove_file(rag_file_name)
+        with self._lock:
+            self.report.deleted.append(rag_file_name)
+        return True
+
+    def record(self, result: UploadResult) -> None:
+        if not result.ok:
+            with self._lock:
+                self.report.failed.append(result)
+            return
+        job = result.job
+        with self._lock:
+            self.report.uploaded.append(result)
+            previous = self.manifest.entries.get(job.key)
+            self.manifest.entries[job.key] = {
+                "sha256": job.sha256,
+                "rag_file": getattr(result.rag_file, "name", None),
+                "display_name": job.display_name,
+                "synced_at": time.time(),
+            }
+        # Only drop the old RagFile once its replacement is in place; if that
+        # fails, remember it so a later sync still deletes it.
+        if (
+            previous
+            and previous.get("rag_file")
+            and not self._delete(previous["rag_file"])
+        ):
+            with self._lock:
+                self.manifest.pending_delete.append(previous["rag_file"])
+        with self._lock:
+            self.manifest.save_periodically()
+
+    def retry_pending_deletes(self) -> None:
+        """Delete replaced RagFiles whose earlier deletes failed."""
+        with self._lock:
+            pending = list(self.manifest.pending_delete)
+        for rag_file in pending:
+            if self._delete(rag_file):
+                with self._lock:
+                    self.manifest.pending_delete.remove(rag_file)
+
+    def remove_missing(self, keys: Iterable[str]) -> None:
+        """Delete the RagFiles of manifest entries whose source is gone."""
+        for key in keys:
+            rag_file = self.manifest.entries[key].get("rag_file")
+            # Keep the entry if the delete failed so the next sync retries it.
+            if not rag_file or self._delete(rag_file):
+                with self._lock:
+                    del self.manifest.entries[key]
+
+
+def apply_sync(
+    plan: SyncPlan,
+    manifest: SyncManifest,
+    uploader: ConcurrentUploader,
+    on_result: Callable[[UploadResult], None] | None = None,
+    delete_fn: Callable[[str], None] = _default_delete,
+    catalog: Any = None,
+) -> SyncReport:
+    """Upload new and changed sources, delete replaced and removed RagFiles, update the manifest."""
+    sync = IncrementalSync(manifest, delete_fn, catalog=catalog)
+
+    def record(result: UploadResult) -> None:
+        if on_result is not None:
+            on_result(result)
+        sync.record(result)
+
+    jobs = [sync.job_for(source) for source in plan.new + plan.changed]
+    try:
+        sync.report.upload = uploader.run(
+            [job for job in jobs if job is not None], on_result=record
+        )
+        sync.retry_pending_deletes()
+        sync.remove_missing(plan.removed)
+    finally:
+        manifest.save()
+    return sync.report
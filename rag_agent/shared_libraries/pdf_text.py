@@ -0,0 +1,267 @@
+"""Local PDF text extraction and chunking, in parallel on a process pool.
+
+Uploading a raw PDF ships every font, image and layout object to Vertex AI,
+which then parses and chunks it server-side; large PDFs upload slowly and can
+hit the service's size limits. `PdfPreprocessor` extracts the text locally
+instead and writes it as a compact text file of chunks, each tagged with the
+pages it comes from ("[pages 3-4]"), so the tag travels with the text into
+the corpus. `ConcurrentUploader`, given a preprocessor, uploads that file in
+place of the PDF, under the PDF's display name.
+
+Text extraction is CPU-bound pure Python, so documents are processed in
+worker processes, one per core by default. Each worker reads its PDF lazily
+through pypdf, extracts one page at a time and writes chunks out as soon as
+they are complete; apart from pypdf's object cache, only a short lookahead
+window of pages is held in memory. The window is what header and footer
+detection needs: a line at the top or bottom of a page that recurs at the edge
+of at least BOILERPLATE_MIN_PAGES pages, digits ignored (so "Page 3 of 10"
+matches "Page 4 of 10"), is dropped, as are bare page numbers.
+"""
+
+import multiprocessing
+import os
+import re
+import shutil
+import tempfile
+import threading
+import unicodedata
+import uuid
+from collections import Counter, deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+
+# Lines at each end of a page that may be a header or footer.
+EDGE_LINES = 2
+BOILERPLATE_MIN_PAGES = 3
+LOOKAHEAD_PAGES = 8
+
+_DIGITS = re.compile(r"\d+")
+# "- 3 -" style page numbers, with a hyphen, en dash or em dash either side.
+_PAGE_NUMBER = re.compile(
+    r"^(page\s*)?#(\s*(of|/)\s*#)?$|^[-\u2013\u2014]\s*#\s*[-\u2013\u2014]$"
+)
+
+
+@dataclass
+class TextChunk:
+    text: str
+    first_page: int
+    last_page: int
+
+    @property
+    def pages(self) -> str:
+        if self.first_page == self.last_page:
+            return f"page {self.first_page}"
+        return f"pages {self.first_page}-{self.last_page}"
+
+
+@dataclass
+class PreparedDocument:
+    source: str  # the PDF
+    path: str  # the text file to upload in its place
+    pages: int
+    chunks: int
+    bytes_in: int
+    bytes_out: int
+
+
+def iter_pages(path: str) -> Iterator[tuple[int, list[str]]]:
+    """(page number, non-empty lines) for each page of the PDF at `path`, one page at a time."""
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    for number, page in enumerate(reader.pages, 1):
+        text = unicodedata.normalize("NFKC", page.extract_text() or "")
+        yield number, [line.strip() for line in text.splitlines() if line.strip()]
+
+
+def _signature(line: str) -> str:
+    return " ".join(_DIGITS.sub("#", line.lower()).split())
+
+
+def _join_lines(lines: list[str]) -> str:
+    """Join a page's lines into one line of text, undoing end-of-line hyphenation."""
+    text = ""
+    for line in lines:
+        if text.endswith("-") and text[-2:-1].isalpha() and line[:1].islower():
+            text = text[:-1] + line
+        else:
+            text = f"{text} {line}" if text else line
+    return " ".join(text.split())
+
+
+def clean_pages(pages: Iterable[tuple[int, list[str]]]) -> Iterator[tuple[int, str]]:
+    """(page number, text) with headers, footers and page numbers removed and whitespace normalized."""
+    edge_counts: Counter[str] = Counter()
+    window: deque[tuple[int, list[str]]] = deque()
+
+    def boilerplate(line: str) -> bool:
+        signature = _signature(line)
+        return (
+            bool(_PAGE_NUMBER.match(signature))
+            or edge_counts[signature] >= BOILERPLATE_MIN_PAGES
+        )
+
+    def release(number: int, lines: list[str]) -> tuple[int, str]:
+        start, end = 0, len(lines)
+        while start < min(EDGE_LINES, end) and boilerplate(lines[start]):
+            start += 1
+        while end > max(start, len(lines) - EDGE_LINES) and boilerplate(lines[end - 1]):
+            end -= 1
+        return number, _join_lines(lines[start:end])
+
+    for number, lines in pages:
+        # Count each signature once per page, over every page read so far.
+        edge_counts.update(
+            {_signature(line) for line in lines[:EDGE_LINES] + lines[-EDGE_LINES:]}
+        )
+        window.append((number, lines))
+        if len(window) > LOOKAHEAD_PAGES:
+            yield release(*window.popleft())
+    while window:
+        yield release(*window.popleft())
+
+
+def chunk_pages(
+    pages: Iterable[tuple[int, str]], chunk_chars: int = 1000, overlap_chars: int = 0
+) -> Iterator[TextChunk]:
+    """Split page texts into windows of about `chunk_chars`, breaking at whitespace.
+
+    Chunks run across page boundaries and record the first and last page they
+    cover. Like build_local_index.chunk_text, but streaming.
+    """
+    if not 0 <= overlap_chars < chunk_chars:
+        raise ValueError("overlap_chars must be smaller than chunk_chars")
+    buffer = ""
+    # (offset in buffer, page number) for each page starting in the buffer, ascending.
+    starts: list[tuple[int, int]] = []
+
+    def page_at(offset: int) -> int:
+        return next(number for start, number in reversed(starts) if start <= offset)
+
+    def cut(end: int) -> TextChunk:
+        nonlocal buffer, starts
+        chunk = TextChunk(buffer[:end].strip(), page_at(0), page_at(max(0, end - 1)))
+        shift = end - overlap_chars if end - overlap_chars > 0 else end
+        # Skip the space at the cut, so the next chunk starts on its own page.
+        while shift < len(buffer) and buffer[shift] == " ":
+            shift += 1
+        buffer = buffer[shift:]
+        kept = [(start - shift, number) for start, number in starts if start >= shift]
+        starts = [(0, page_at(shift))] + [entry for entry in kept if entry[0] > 0]
+        return chunk
+
+    for number, text in pages:
+        if not text:
+            continue
+        if buffer:
+            buffer += " "
+        starts.append((len(buffer), number))
+        buffer += text
+        while len(buffer) > chunk_chars:
+            space = buffer.rfind(" ", chunk_chars // 2, chunk_chars)
+            chunk = cut(space if space > 0 else chunk_chars)
+            if chunk.text:
+                yield chunk
+    if buffer.strip():
+        yield TextChunk(buffer.strip(), page_at(0), page_at(len(buffer) - 1))
+
+
+def pdf_chunks(
+    path: str, chunk_chars: int = 1000, overlap_chars: int = 0
+) -> list[TextChunk]:
+    return list(chunk_pages(clean_pages(iter_pages(path)), chunk_chars, overlap_chars))
+
+
+def extract_pdf(
+    path: str, out_path: str, chunk_chars: int = 1000, overlap_chars: int = 0
+) -> PreparedDocument:
+    """Write the chunks of the PDF at `path` to the text file `out_path`."""
+    pages = 0
+    chunks = 0
+
+    def counted(
+        source: Iterable[tuple[int, list[str]]],
+    ) -> Iterator[tuple[int, list[str]]]:
+        nonlocal pages
+        for page in source:
+            pages += 1
+            yield page
+
+    try:
+        with open(out_path, "w", encoding="utf-8") as f:
+            for chunk in chunk_pages(
+                clean_pages(counted(iter_pages(path))), chunk_chars, overlap_chars
+            ):
+                f.write(f"[{chunk.pages}]\n{chunk.text}\n\n")
+                chunks += 1
+    except BaseException:
+        os.remove(out_path)
+        raise
+    return PreparedDocument(
+        path, out_path, pages, chunks, os.path.getsize(path), os.path.getsize(out_path)
+    )
+
+
+class PdfPreprocessor:
+    """Extracts PDFs to compact chunked text files on a pool of worker processes.
+
+    Workers are spawned rather than forked, since callers (upload threads, the
+    Temporal worker) are multi-threaded. If a worker dies (a PDF that crashes
+    or exhausts memory), that document fails and the pool is replaced for the
+    next ones. Text files are written to a private temp directory, removed by
+    `close()`.
+    """
+
+    def __init__(
+        self,
+        workers: int | None = None,
+        chunk_chars: int = 1000,
+        overlap_chars: int = 0,
+        temp_dir: str | None = None,
+    ):
+        self.chunk_chars = chunk_chars
+        self.overlap_chars = overlap_chars
+        self._own_temp_dir = temp_dir is None
+        self.temp_dir = temp_dir or tempfile.mkdtemp(prefix="rag-pdf-")
+        self.workers = workers or os.cpu_count() or 1
+        self._lock = threading.Lock()
+        self._pool = self._new_pool()
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            self.workers, mp_context=multiprocessing.get_context("spawn")
+        )
+
+    def submit(self, path: str) -> "Future[PreparedDocument]":
+        name = f"{uuid.uuid4().hex[:8]}-{os.path.basename(path)}.txt"
+        args = (
+            extract_pdf,
+            path,
+            os.path.join(self.temp_dir, name),
+            self.chunk_chars,
+            self.overlap_chars,
+        )
+        with self._lock:
+            try:
+                return self._pool.submit(*args)
+            except BrokenProcessPool:
+                self._pool = self._new_pool()
+                return self._pool.submit(*args)
+
+    def prepare(self, path: str) -> PreparedDocument:
+        """Extract one PDF (blocking the calling thread, not the others)."""
+        return self.submit(path).result()
+
+    def close(self) -> None:
+        self._pool.shutdown(cancel_futures=True)
+        if self._own_temp_dir:
+            shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def __enter__(self) -> "PdfPreprocessor":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -17,10 +17,18 @@ from google.api_core.exceptions import ResourceExhausted
 import vertexai
 from vertexai.preview import rag
 import os
+import sys
 from dotenv import load_dotenv, set_key
 import requests
 import tempfile
 
+try:
+  from ..catalog import get_catalog
+except ImportError:
+  # Run as script (e.g. python shared_libraries/prepare_corpus_and_data.py)
+  sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+  from catalog import get_catalog
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -54,23 +62,28 @@ def initialize_vertex_ai():
 
 
 def create_or_get_corpus():
-  """Creates a new corpus or retrieves an existing one."""
+  """Creates a new corpus or retrieves an existing one.
+
+  Looks the display name up in the local catalog, and only lists the
+  project's corpora when the catalog doesn't know it.
+  """
   embedding_model_config = rag.EmbeddingModelConfig(
       publisher_model="publishers/google/models/text-embedding-004"
   )
-  existing_corpora = rag.list_corpora()
-  corpus = None
-  for existing_corpus in existing_corpora:
-    if existing_corpus.display_name == CORPUS_DISPLAY_NAME:
-      corpus = existing_corpus
-      print(f"Found existing corpus with display name '{CORPUS_DISPLAY_NAME}'")
-      break
+  catalog = get_catalog()
+  corpus = catalog.find_corpus(CORPUS_DISPLAY_NAME)
   if corpus is None:
+    catalog.refresh_corpora()
+    corpus = catalog.find_corpus(CORPUS_DISPLAY_NAME)
+  if corpus is not None:
+    print(f"Found existing corpus with display name '{CORPUS_DISPLAY_NAME}'")
+  else:
     corpus = rag.create_corpus(
         display_name=CORPUS_DISPLAY_NAME,
         description=CORPUS_DESCRIPTION,
         embedding_model_config=embedding_model_config,
     )
+    catalog.record_corpus(corpus)
     print(f"Created new corpus with display name '{CORPUS_DISPLAY_NAME}'")
   return corpus
 
@@ -155,6 +168,7 @@ def upload_pdf_to_corpus(corpus_name, pdf_path, display_name, description):
         description=description,
     )
     print(f"Successfully uploaded {display_name} to corpus")
+    get_catalog().record_file(corpus_name, rag_file, display_name, description)
     return rag_file
   except ResourceExhausted as e:
     print(f"Error uploading file {display_name}: {e}")
@@ -175,8 +189,10 @@ def update_env_file(corpus_name, env_file_path):
         print(f"Error updating .env file: {e}")
 
 def list_corpus_files(corpus_name):
-  """Lists files in the specified corpus."""
-  files = list(rag.list_files(corpus_name=corpus_name))
+  """Lists files in the specified corpus, from the catalog unless it is stale."""
+  catalog = get_catalog()
+  catalog.refresh_files(corpus_name)
+  files = catalog.list_files(corpus_name)
   print(f"Total files in corpus: {len(files)}")
   for file in files:
     print(f"File: {file.display_name} - {file.name}")
@@ -0,0 +1,89 @@
+"""Thread-safe token bucket with additive-increase / multiplicative-decrease tuning."""
+
+import threading
+import time
+
+
+class TokenBucket:
+    """Hands out `rate` tokens per second with bursts of up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Block until `tokens` are available; returns the time spent waiting."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                delay = (tokens - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def set_rate(self, rate: float) -> None:
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = rate
+
+
+class AdaptiveRateLimiter(TokenBucket):
+    """Token bucket that backs off when the server throttles and probes upwards otherwise.
+
+    Every success adds `increase` to the rate (up to `max_rate`); a throttling
+    error multiplies it by `decrease` (down to `min_rate`), so the rate settles
+    just under the quota the server is enforcing. Requests in flight together
+    are usually throttled together, so after a decrease further throttling
+    errors within `cooldown` seconds don't cut the rate again.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        min_rate: float = 0.05,
+        max_rate: float | None = None,
+        increase: float | None = None,
+        decrease: float = 0.5,
+        cooldown: float = 2.0,
+    ):
+        super().__init__(rate, capacity=1.0)
+        self.min_rate = min_rate
+        self.max_rate = max_rate if max_rate is not None else rate * 4
+        self.increase = increase if increase is not None else rate * 0.05
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self._decreased_at: float | None = None
+
+    def on_success(self) -> None:
+        self.set_rate(min(self.max_rate, self.rate + self.increase))
+
+    def on_throttled(self) -> bool:
+        """Slow down after a throttling error; returns whether the rate was cut."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            # Drop any saved-up burst so everyone slows down immediately.
+            self._tokens = min(self._tokens, 0.0)
+            if (
+                self._decreased_at is not None
+                and now - self._decreased_at < self.cooldown
+            ):
+                return False
+            self._decreased_at = now
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            return True
@@ -0,0 +1,256 @@
+"""Concurrent, rate-limited uploads to a Vertex AI RAG corpus.
+
+`rag.upload_file` blocks for as long as the service takes to parse and embed a
+file, so uploading one file at a time leaves most of the embedding quota idle.
+`ConcurrentUploader` keeps a bounded number of uploads in flight, paces them
+with a shared `AdaptiveRateLimiter`, and when the service reports its quota
+exhausted (`ResourceExhausted`, or an HTTP 429 that `rag.upload_file` wraps in
+a plain `RuntimeError`/`ValueError`) it halves the rate for every worker, at
+most once per limiter cooldown, and retries that file with jittered
+exponential backoff. Given a `catalog` (see catalog.py), each
+uploaded RagFile is recorded there as it completes. Given a `pdf_preprocessor`
+(see pdf_text.py), PDFs are uploaded as their extracted, chunked text.
+"""
+
+import logging
+import os
+import random
+import re
+import threading
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field, replace
+from typing import Any
+
+from google.api_core.exceptions import ResourceExhausted
+
+try:
+    from .pdf_text import PdfPreprocessor, PreparedDocument
+    from .rate_limit import AdaptiveRateLimiter
+except ImportError:
+    from pdf_text import PdfPreprocessor, PreparedDocument
+    from rate_limit import AdaptiveRateLimiter
+
+logger = logging.getLogger(__name__)
+
+# How an exhausted quota reads in an error message, for errors that don't
+# carry a structured status: a 429 only counts as an HTTP status, never as
+# part of some other text such as a file name.
+_THROTTLED = re.compile(
+    r"<Response \[429\]>|['\"]code['\"]: 429\b|\b(?:HTTP|status|status code) 429\b"
+    r"|RESOURCE_EXHAUSTED|Too Many Requests"
+)
+
+
+@dataclass
+class UploadJob:
+    path: str
+    display_name: str
+    description: str = ""
+    key: str | None = None  # caller's identifier for the source, e.g. a path or URL
+    sha256: str = ""  # content hash, when the caller tracks one
+
+
+@dataclass
+class UploadResult:
+    job: UploadJob
+    rag_file: Any = None
+    error: str | None = None
+    attempts: int = 0
+    seconds: float = 0.0
+    prepared: PreparedDocument | None = (
+        None  # set when a PDF was uploaded as extracted text
+    )
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass
+class UploadReport:
+    results: list[UploadResult] = field(default_factory=list)
+    elapsed: float = 0.0
+    throttled: int = 0
+
+    @property
+    def succeeded(self) -> list[UploadResult]:
+        return [r for r in self.results if r.ok]
+
+    @property
+    def failed(self) -> list[UploadResult]:
+        return [r for r in self.results if not r.ok]
+
+    @property
+    def files_per_second(self) -> float:
+        return len(self.succeeded) / self.elapsed if self.elapsed else 0.0
+
+    def print_summary(self) -> None:
+        print("\n" + "=" * 60)
+        print(f"✅ Successful uploads: {len(self.succeeded)}")
+        print(f"❌ Failed uploads: {len(self.failed)}")
+        for result in self.failed:
+            print(f"   {result.job.display_name}: {result.error}")
+        print(
+            f"⏱️  {self.elapsed:.1f}s, {self.files_per_second:.2f} files/s, throttled {self.throttled} times"
+        )
+        print("=" * 60)
+
+
+def _is_throttled_status(value: Any) -> bool:
+    """Whether `value`, an error argument, is a 429 response or JSON error."""
+    if isinstance(value, dict):
+        return value.get("code") == 429 or value.get("status") == "RESOURCE_EXHAUSTED"
+    response = getattr(value, "response", value)
+    return getattr(response, "status_code", None) == 429
+
+
+def is_throttled(error: BaseException) -> bool:
+    """Whether `error` means the service's quota is exhausted and the upload may be retried.
+
+    `rag.upload_file` wraps failures in a plain `RuntimeError`/`ValueError`
+    whose arguments hold the service's JSON error or the transport error, so
+    those are checked before falling back to the message.
+    """
+    if isinstance(error, ResourceExhausted):
+        return True
+    if any(_is_throttled_status(value) for value in (error, *error.args)):
+        return True
+    if isinstance(error.__cause__, Exception) and is_throttled(error.__cause__):
+        return True
+    return bool(_THROTTLED.search(str(error)))
+
+
+def _default_upload(corpus_name: str, job: UploadJob) -> Any:
+    from vertexai.preview import rag
+
+    return rag.upload_file(
+        corpus_name=corpus_name,
+        path=job.path,
+        display_name=job.display_name,
+        description=job.description,
+    )
+
+
+class ConcurrentUploader:
+    def __init__(
+        self,
+        corpus_name: str,
+        workers: int = 4,
+        rate: float = 2.0,
+        max_retries: int = 6,
+        max_backoff: float = 60.0,
+        upload_fn: Callable[[str, UploadJob], Any] | None = None,
+        catalog: Any = None,
+        pdf_preprocessor: PdfPreprocessor | None = None,
+    ):
+        self.corpus_name = corpus_name
+        self.workers = max(1, workers)
+        self.limiter = AdaptiveRateLimiter(rate, max_rate=rate * 4)
+        self.max_retries = max_retries
+        self.max_backoff = max_backoff
+        self.upload_fn = upload_fn or _default_upload
+        self.catalog = catalog
+        self.pdf_preprocessor = pdf_preprocessor
+        self._throttled = 0
+        self._lock = threading.Lock()
+
+    def _prepare(self, job: UploadJob) -> PreparedDocument | None:
+        """Extract a PDF job's text for upload; None to upload the file as is."""
+        if self.pdf_preprocessor is None or not job.path.lower().endswith(".pdf"):
+            return None
+        try:
+            prepared = self.pdf_preprocessor.prepare(job.path)
+        except Exception as e:
+            logger.warning(
+                f"Could not extract {job.display_name}, uploading the PDF: {e}"
+            )
+            return None
+        if not prepared.chunks:
+            # Scanned or image-only: leave it to the service's own parser.
+            os.remove(prepared.path)
+            return None
+        return prepared
+
+    def upload(self, job: UploadJob) -> UploadResult:
+        """Upload one file, retrying with backoff while the service reports its quota exhausted."""
+        result = UploadResult(job)
+        start = time.monotonic()
+        result.prepared = self._prepare(job)
+        upload_job = replace(job, path=result.prepared.path) if result.prepared else job
+        while True:
+            result.attempts += 1
+            self.limiter.acquire()
+            try:
+                result.rag_file = self.upload_fn(self.corpus_name, upload_job)
+                self.limiter.on_success()
+                break
+            except Exception as e:
+                if not is_throttled(e):
+                    result.error = str(e)
+                    break
+                self.limiter.on_throttled()
+                with self._lock:
+                    self._throttled += 1
+                if result.attempts > self.max_retries:
+                    result.error = (
+                        f"quota exhausted after {result.attempts} attempts: {e}"
+                    )
+                    break
+                backoff = min(self.max_backoff, 2.0**result.attempts)
+                time.sleep(backoff * random.uniform(0.5, 1.0))
+        if result.prepared is not None:
+            os.remove(result.prepared.path)
+        result.seconds = time.monotonic() - start
+        if (
+            result.ok
+            and self.catalog is not None
+            and getattr(result.rag_file, "name", None)
+        ):
+            self.catalog.record_file(
+                self.corpus_name,
+                result.rag_file,
+                job.display_name,
+                job.description,
+                sha256=job.sha256,
+                source=job.key or "",
+            )
+        return result
+
+    def run(
+        self,
+        jobs: Iterable[UploadJob],
+        on_result: Callable[[UploadResult], None] | None = None,
+    ) -> UploadReport:
+        """Upload all jobs with up to `workers` in flight; `on_result` sees each as it finishes."""
+        report = UploadReport()
+        start = time.monotonic()
+        with ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="rag-upload"
+        ) as pool:
+            futures = [pool.submit(self.upload, job) for job in jobs]
+            for future in as_completed(futures):
+                result = future.result()
+                report.results.append(result)
+                if on_result is not None:
+                    on_result(result)
+        report.elapsed = time.monotonic() - start
+        report.throttled = self._throttled
+        return report
+
+
+def print_result(result: UploadResult) -> None:
+    if result.ok:
+        extracted = ""
+        if result.prepared is not None:
+            prepared = result.prepared
+            extracted = (
+                f", {prepared.pages} pages as {prepared.chunks} chunks,"
+                f" {prepared.bytes_out / 1024:.0f} of {prepared.bytes_in / 1024:.0f} KiB"
+            )
+        print(
+            f"✅ Uploaded {result.job.display_name} ({result.seconds:.1f}s, {result.attempts} attempt(s){extracted})"
+        )
+    else:
+        print(f"❌ Failed {result.job.display_name}: {result.error}")
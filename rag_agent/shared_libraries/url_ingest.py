@@ -0,0 +1,428 @@
+"""Pipelined download-to-upload ingestion of documents from URLs.
+
+Downloading a document and embedding it are both slow, and neither needs the
+other to be idle. `UrlIngestPipeline` runs them as two overlapping stages:
+a pool of download threads shares one pooled, retrying `requests.Session`,
+and each file is handed to the upload pool the moment it lands on disk, so
+the corpus is embedding one document while the next ones are still being
+fetched. A `DiskBudget` caps the bytes of downloaded-but-not-yet-uploaded
+files, which keeps temp space bounded however long the URL list is.
+"""
+
+import json
+import os
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any
+from urllib.parse import unquote, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    from .corpus_sync import IncrementalSync, SyncManifest, SyncSource
+    from .pdf_text import PdfPreprocessor
+    from .uploader import ConcurrentUploader, UploadJob, UploadResult, print_result
+except ImportError:
+    from corpus_sync import IncrementalSync, SyncManifest, SyncSource
+    from pdf_text import PdfPreprocessor
+    from uploader import ConcurrentUploader, UploadJob, UploadResult, print_result
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    "Accept": "application/pdf,application/octet-stream,*/*",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+# Reserved for a download whose server sends no Content-Length.
+UNKNOWN_SIZE_RESERVATION = 32 * 1024 * 1024
+
+
+@dataclass
+class UrlDocument:
+    url: str
+    display_name: str
+    description: str = ""
+
+
+def display_name_for(url: str) -> str:
+    name = os.path.basename(unquote(urlparse(url).path))
+    return name or urlparse(url).netloc
+
+
+def load_url_list(path: str) -> Iterator[UrlDocument]:
+    """Read documents from a file, lazily so the list can be arbitrarily long.
+
+    Each non-blank line is either a bare URL or a JSON object with a "url" and
+    optional "display_name" and "description". Lines starting with # are
+    skipped.
+    """
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("{"):
+                record = json.loads(line)
+                url = record["url"]
+                yield UrlDocument(
+                    url,
+                    record.get("display_name") or display_name_for(url),
+                    record.get("description", ""),
+                )
+            else:
+                yield UrlDocument(line, display_name_for(line))
+
+
+def make_session(pool_size: int = 16, max_retries: int = 3) -> requests.Session:
+    """A session with keep-alive connection pools sized for `pool_size` concurrent downloads."""
+    session = requests.Session()
+    retry = Retry(
+        total=max_retries,
+        backoff_factor=1.0,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET",),
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update(DEFAULT_HEADERS)
+    return session
+
+
+class DiskBudget:
+    """Counts bytes of temp space in use and blocks reservations that would exceed `max_bytes`.
+
+    A reservation larger than the whole budget is still granted once nothing
+    else is reserved, so one oversized file cannot stall the pipeline.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.used = 0
+        self.peak = 0
+        self._cond = threading.Condition()
+
+    def reserve(self, nbytes: int) -> None:
+        with self._cond:
+            while self.used and self.used + nbytes > self.max_bytes:
+                self._cond.wait()
+            self.used += nbytes
+            self.peak = max(self.peak, self.used)
+
+    def adjust(self, reserved: int, actual: int) -> None:
+        """Correct a reservation to the real file size without blocking."""
+        with self._cond:
+            self.used += actual - reserved
+            self.peak = max(self.peak, self.used)
+            self._cond.notify_all()
+
+    def release(self, nbytes: int) -> None:
+        with self._cond:
+            self.used -= nbytes
+            self._cond.notify_all()
+
+
+@dataclass
+class DownloadFailure:
+    document: UrlDocument
+    error: str
+
+
+@dataclass
+class IngestReport:
+    uploads: list[UploadResult] = field(default_factory=list)
+    download_failures: list[DownloadFailure] = field(default_factory=list)
+    skipped: int = 0
+    deleted: int = 0
+    bytes_downloaded: int = 0
+    peak_temp_bytes: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def succeeded(self) -> list[UploadResult]:
+        return [r for r in self.uploads if r.ok]
+
+    @property
+    def failed(self) -> list[UploadResult]:
+        return [r for r in self.uploads if not r.ok]
+
+    @property
+    def changed_corpus(self) -> bool:
+        return bool(self.succeeded or self.deleted)
+
+    def print_summary(self) -> None:
+        print("\n" + "=" * 60)
+        print(f"✅ Successful uploads: {len(self.succeeded)}")
+        print(f"❌ Failed uploads: {len(self.failed) + len(self.download_failures)}")
+        for failure in self.download_failures:
+            print(f"   {failure.document.url}: download failed: {failure.error}")
+        for result in self.failed:
+            print(f"   {result.job.display_name}: {result.error}")
+        if self.skipped:
+            print(f"⏭️  Skipped (unchanged): {self.skipped}")
+        mb = self.bytes_downloaded / 1e6
+        print(
+            f"⏱️  {self.elapsed:.1f}s, {mb:.1f} MB downloaded "
+            f"({mb / self.elapsed if self.elapsed else 0.0:.1f} MB/s), "
+            f"peak temp space {self.peak_temp_bytes / 1e6:.1f} MB"
+        )
+        print("=" * 60)
+
+
+class UrlIngestPipeline:
+    def __init__(
+        self,
+        uploader: ConcurrentUploader,
+        temp_dir: str,
+        download_workers: int = 8,
+        max_temp_bytes: int = 512 * 1024 * 1024,
+        session: requests.Session | None = None,
+        timeout: float = 60.0,
+    ):
+        self.uploader = uploader
+        self.temp_dir = temp_dir
+        self.download_workers = max(1, download_workers)
+        self.budget = DiskBudget(max_temp_bytes)
+        self.session = session or make_session(self.download_workers)
+        self.timeout = timeout
+
+    def download(self, document: UrlDocument, path: str) -> int:
+        """Stream `document` to `path` within the disk budget; returns the bytes held in the budget."""
+        with self.session.get(
+            document.url, stream=True, timeout=self.timeout
+        ) as response:
+            response.raise_for_status()
+            length = response.headers.get("Content-Length")
+            reserved = (
+                int(length) if length and length.isdigit() else UNKNOWN_SIZE_RESERVATION
+            )
+            self.budget.reserve(reserved)
+            size = 0
+            try:
+                with open(path, "wb") as f:
+                    for chunk in response.iter_content(chunk_size=1 << 16):
+                        f.write(chunk)
+                        size += len(chunk)
+            except BaseException:
+                self.budget.release(reserved)
+                raise
+        self.budget.adjust(reserved, size)
+        return size
+
+    def run(
+        self,
+        documents: Iterable[UrlDocument],
+        prepare: Callable[[UrlDocument, str], UploadJob | None] | None = None,
+        on_result: Callable[[UploadResult], None] | None = None,
+    ) -> IngestReport:
+        """Download and upload every document, overlapping the two stages.
+
+        `prepare` turns a downloaded file into the job to upload, or None to
+        skip it; by default every file is uploaded under its display name,
+        keyed by URL. `on_result` sees each upload as it finishes; calls to
+        it are serialized.
+        """
+        report = IngestReport()
+        lock = threading.Lock()
+        # Enough queued downloads to keep every worker busy without reading
+        # the whole URL list into memory.
+        slots = threading.BoundedSemaphore(self.download_workers * 2)
+
+        def finish(path: str, size: int) -> None:
+            if os.path.exists(path):
+                os.remove(path)
+            self.budget.release(size)
+
+        def fail(document: UrlDocument, error: Exception) -> None:
+            with lock:
+                report.download_failures.append(DownloadFailure(document, str(error)))
+
+        def upload(job: UploadJob, size: int) -> None:
+            try:
+                result = self.uploader.upload(job)
+            finally:
+                finish(job.path, size)
+            with lock:
+                report.uploads.append(result)
+                if on_result is not None:
+                    on_result(result)
+
+        def fetch(index: int, document: UrlDocument) -> None:
+            path = os.path.join(
+                self.temp_dir, f"{index:06d}_{os.path.basename(document.display_name)}"
+            )
+            try:
+                size = self.download(document, path)
+            except Exception as e:
+                if os.path.exists(path):
+                    os.remove(path)
+                fail(document, e)
+                return
+            finally:
+                slots.release()
+            with lock:
+                report.bytes_downloaded += size
+            try:
+                job = (
+                    prepare(document, path)
+                    if prepare is not None
+                    else UploadJob(
+                        path,
+                        document.display_name,
+                        document.description,
+                        key=document.url,
+                    )
+                )
+            except Exception as e:
+                finish(path, size)
+                fail(document, e)
+                return
+            if job is None:
+                finish(path, size)
+                with lock:
+                    report.skipped += 1
+                return
+            uploads.submit(upload, job, size)
+
+        start = time.monotonic()
+        # Leaving the download pool waits for every fetch, and so for every
+        # upload to be submitted; leaving the upload pool waits for those.
+        with ThreadPoolExecutor(
+            self.uploader.workers, thread_name_prefix="rag-upload"
+        ) as uploads:
+            with ThreadPoolExecutor(
+                self.download_workers, thread_name_prefix="rag-download"
+            ) as downloads:
+                for index, document in enumerate(documents):
+                    slots.acquire()
+                    downloads.submit(fetch, index, document)
+        report.elapsed = time.monotonic() - start
+        report.peak_temp_bytes = self.budget.peak
+        return report
+
+
+def add_ingest_arguments(parser) -> None:
+    parser.add_argument(
+        "--urls-file",
+        help="File with one URL (or JSON object) per line; defaults to DOCUMENT_URLS",
+    )
+    parser.add_argument(
+        "--download-workers", type=int, default=8, help="Downloads in flight at once"
+    )
+    parser.add_argument(
+        "--upload-workers", type=int, default=4, help="Uploads in flight at once"
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=2.0,
+        help="Initial uploads per second (adapts to quota)",
+    )
+    parser.add_argument(
+        "--max-temp-mb",
+        type=int,
+        default=512,
+        help="Temp space for downloaded files awaiting upload",
+    )
+    parser.add_argument(
+        "--sync",
+        action="store_true",
+        help="Only upload new/changed documents and delete removed ones",
+    )
+    parser.add_argument(
+        "--raw-pdf",
+        action="store_true",
+        help="Upload PDFs as is instead of their extracted text",
+    )
+    parser.add_argument(
+        "--extract-workers",
+        type=int,
+        help="Processes extracting PDF text (default: one per core)",
+    )
+
+
+def documents_from_args(args, default_documents: list[dict]) -> Iterable[UrlDocument]:
+    if args.urls_file:
+        return load_url_list(args.urls_file)
+    return [
+        UrlDocument(doc["url"], doc["display_name"], doc.get("description", ""))
+        for doc in default_documents
+    ]
+
+
+def ingest_urls(
+    corpus_name: str,
+    documents: Iterable[UrlDocument],
+    temp_dir: str,
+    download_workers: int = 8,
+    upload_workers: int = 4,
+    rate: float = 2.0,
+    max_temp_bytes: int = 512 * 1024 * 1024,
+    sync: bool = False,
+    catalog: Any = None,
+    pdf_preprocessor: PdfPreprocessor | None = None,
+) -> IngestReport:
+    """Run the pipeline against `corpus_name`, printing progress.
+
+    With a `pdf_preprocessor`, downloaded PDFs are uploaded as their extracted
+    text (see pdf_text.py).
+
+    With `sync`, documents are keyed by URL in the corpus's sync manifest:
+    unchanged ones are skipped after download, changed ones replace their old
+    RagFile, and RagFiles of URLs no longer listed are deleted.
+    """
+    uploader = ConcurrentUploader(
+        corpus_name,
+        workers=upload_workers,
+        rate=rate,
+        catalog=catalog,
+        pdf_preprocessor=pdf_preprocessor,
+    )
+    pipeline = UrlIngestPipeline(
+        uploader,
+        temp_dir,
+        download_workers=download_workers,
+        max_temp_bytes=max_temp_bytes,
+    )
+    if not sync:
+        report = pipeline.run(documents, on_result=print_result)
+        report.print_summary()
+        return report
+
+    incremental = IncrementalSync(SyncManifest.load(corpus_name), catalog=catalog)
+    seen: set[str] = set()
+
+    def listed(documents: Iterable[UrlDocument]) -> Iterator[UrlDocument]:
+        for document in documents:
+            seen.add(document.url)
+            yield document
+
+    def prepare(document: UrlDocument, path: str) -> UploadJob | None:
+        return incremental.job_for(
+            SyncSource(document.url, path, document.display_name, document.description)
+        )
+
+    def on_result(result: UploadResult) -> None:
+        print_result(result)
+        incremental.record(result)
+
+    try:
+        report = pipeline.run(listed(documents), prepare=prepare, on_result=on_result)
+        incremental.retry_pending_deletes()
+        # A failed download is not a removal: only drop URLs that are no longer listed.
+        incremental.remove_missing(
+            [key for key in list(incremental.manifest.entries) if key not in seen]
+        )
+    finally:
+        incremental.manifest.save()
+    report.deleted = len(incremental.report.deleted)
+    report.print_summary()
+    incremental.report.print_summary()
+    return report
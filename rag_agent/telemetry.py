@@ -0,0 +1,202 @@
+"""Per-stage latency and token metrics, as OpenTelemetry spans and histograms.
+
+Every stage is recorded as a span named `rag.<stage>` and in the
+`rag.stage.duration` histogram (seconds, attribute `stage`):
+
+- `retrieval`: one RetrievalTool lookup (attribute `cache_hit`)
+- `model_turn`: one model call, up to its final (aggregated) response
+- `tool_call`: a tool round trip, from the model's function call to the response
+- `first_token`: from the start of an agent run to its first streamed text
+- `activity.queue_wait` / `activity.run`: Temporal activity time spent waiting
+  for a worker versus running (see temporal/interceptors.py)
+
+Model token usage per turn goes to the `rag.model.tokens` histogram (attribute
+`token_type`: prompt / completion). Prompt tokens kept out of the context by
+RetrievalTool go to `rag.context.tokens_saved` (attribute `reason`:
+near_duplicate / budget).
+
+Instruments are created against the OpenTelemetry API, so recording is a cheap
+no-op until `setup_telemetry` installs SDK providers exporting to a Prometheus
+scrape endpoint and/or an OTLP collector. This is independent of tracing.py,
+which only sends ADK traces to Arize.
+"""
+
+import logging
+import os
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any
+
+from opentelemetry import metrics, trace
+
+logger = logging.getLogger(__name__)
+
+tracer = trace.get_tracer("rag_agent")
+meter = metrics.get_meter("rag_agent")
+
+stage_duration = meter.create_histogram(
+    "rag.stage.duration",
+    unit="s",
+    description="Time spent in each stage of answering a query",
+    explicit_bucket_boundaries_advisory=[
+        0.005,
+        0.01,
+        0.025,
+        0.05,
+        0.1,
+        0.25,
+        0.5,
+        1,
+        2.5,
+        5,
+        10,
+        30,
+        60,
+        120,
+    ],
+)
+model_tokens = meter.create_histogram(
+    "rag.model.tokens",
+    unit="{token}",
+    description="Tokens per model turn",
+    explicit_bucket_boundaries_advisory=[16, 64, 256, 1024, 4096, 16384, 65536, 262144],
+)
+context_tokens_saved = meter.create_histogram(
+    "rag.context.tokens_saved",
+    unit="{token}",
+    description="Estimated retrieved-context tokens dropped per retrieval tool call",
+    explicit_bucket_boundaries_advisory=[0, 16, 64, 256, 1024, 4096, 16384],
+)
+
+
+@contextmanager
+def stage(name: str, **attributes: Any) -> Iterator[dict[str, Any]]:
+    """Time the block as stage `name`.
+
+    Attributes added to the yielded dict before the block ends are recorded on
+    both the span and the histogram (keep them low-cardinality).
+    """
+    attributes["stage"] = name
+    start = time.perf_counter()
+    with tracer.start_as_current_span(f"rag.{name}") as span:
+        try:
+            yield attributes
+        except BaseException:
+            attributes["error"] = True
+            raise
+        finally:
+            span.set_attributes(attributes)
+            stage_duration.record(time.perf_counter() - start, attributes)
+
+
+def record_stage(name: str, start_ns: int, end_ns: int, **attributes: Any) -> None:
+    """Record a stage that has already happened, from wall-clock timestamps in ns."""
+    attributes["stage"] = name
+    span = tracer.start_span(f"rag.{name}", start_time=start_ns, attributes=attributes)
+    span.end(end_time=end_ns)
+    stage_duration.record(max(0, end_ns - start_ns) / 1e9, attributes)
+
+
+def record_tokens(usage: Any, **attributes: Any) -> None:
+    """Record a model turn's `usage_metadata` (a GenerateContentResponseUsageMetadata)."""
+    if usage is None:
+        return
+    for token_type, count in (
+        ("prompt", usage.prompt_token_count),
+        ("completion", usage.candidates_token_count),
+    ):
+        if count:
+            model_tokens.record(count, {**attributes, "token_type": token_type})
+
+
+class AgentRunTelemetry:
+    """Derives model-turn, tool-call and first-token stages from an ADK event stream.
+
+    Feed it every event `Runner.run_async` yields. A model turn ends with the
+    model's final event for that turn (text or function calls); a tool call
+    ends when the function response event arrives.
+    """
+
+    def __init__(self, model: Any):
+        # An agent's model is either a model name or a BaseLlm.
+        self.model = model if isinstance(model, str) else model.model
+        self.started_ns = time.time_ns()
+        self._turn_started_ns = self.started_ns
+        self._first_token = False
+
+    def observe(self, event: Any) -> None:
+        now = time.time_ns()
+        if event.partial:
+            if not self._first_token and any(part.text for part in event.content.parts):
+                self._first_token = True
+                record_stage("first_token", self.started_ns, now, model=self.model)
+            return
+        if responses := event.get_function_responses():
+            for response in responses:
+                record_stage(
+                    "tool_call", self._turn_started_ns, now, tool=response.name
+                )
+        elif event.author != "user":
+            record_stage(
+                "model_turn",
+                self._turn_started_ns,
+                now,
+                model=self.model,
+                function_call=bool(event.get_function_calls()),
+            )
+            record_tokens(event.usage_metadata, model=self.model)
+        self._turn_started_ns = now
+
+
+def setup_telemetry(
+    service_name: str = "rag-agent-worker",
+    prometheus_port: int | None = None,
+    otlp_endpoint: str | None = None,
+) -> bool:
+    """Install OpenTelemetry SDK providers for this process.
+
+    With `prometheus_port`, metrics are served for scraping on that port. With
+    `otlp_endpoint` (e.g. http://localhost:4317), metrics and spans are pushed to
+    an OTLP/gRPC collector. Returns False (and installs nothing) if neither is set.
+    Needs the `telemetry` extra (opentelemetry-sdk and the exporters).
+    """
+    if not prometheus_port and not otlp_endpoint:
+        return False
+
+    from opentelemetry.sdk.metrics import MeterProvider
+    from opentelemetry.sdk.resources import SERVICE_NAME, Resource
+
+    resource = Resource.create(
+        {SERVICE_NAME: os.getenv("OTEL_SERVICE_NAME", service_name)}
+    )
+    readers = []
+    if prometheus_port:
+        from opentelemetry.exporter.prometheus import PrometheusMetricReader
+        from prometheus_client import start_http_server
+
+        start_http_server(prometheus_port)
+        readers.append(PrometheusMetricReader())
+        logger.info(f"Serving stage metrics on :{prometheus_port}/metrics")
+    if otlp_endpoint:
+        from opentelemetry.exporter.otlp.proto.grpc.metric_exporter import (
+            OTLPMetricExporter,
+        )
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import (
+            OTLPSpanExporter,
+        )
+        from opentelemetry.sdk.metrics.export import PeriodicExportingMetricReader
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+        readers.append(
+            PeriodicExportingMetricReader(OTLPMetricExporter(endpoint=otlp_endpoint))
+        )
+        tracer_provider = TracerProvider(resource=resource)
+        tracer_provider.add_span_processor(
+            BatchSpanProcessor(OTLPSpanExporter(endpoint=otlp_endpoint))
+        )
+        trace.set_tracer_provider(tracer_provider)
+        logger.info(f"Exporting stage metrics and spans to {otlp_endpoint}")
+    metrics.set_meter_provider(MeterProvider(resource=resource, metric_readers=readers))
+    return True
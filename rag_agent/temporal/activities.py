@@ -1,29 +1,395 @@
+import asyncio
+import itertools
+import json
+import os
 import sys
+import tempfile
+import threading
+import time
 from pathlib import Path
+from typing import TYPE_CHECKING, Optional
 
 from temporalio import activity
+from temporalio.exceptions import ApplicationError
 
-try:
-    from ..agent import ask_rag_agent
-except ImportError:
-    # Run as script (e.g. python temporal/worker.py from apps/rag_agent)
-    _root = Path(__file__).resolve().parent.parent
-    if str(_root) not in sys.path:
-        sys.path.insert(0, str(_root))
-    from agent import ask_rag_agent
+from hedging import HedgeBudget, LatencyTracker
+from shared import (
+    BatchAnswers,
+    Conversation,
+    HedgePolicy,
+    IngestedFile,
+    IngestFileInput,
+    IngestSource,
+    PartialAnswer,
+    QueryWindow,
+    SourceWindow,
+)
+from vertex_limiter import vertex_permit
+
+# Run as script (e.g. python temporal/worker.py from apps/rag_agent). The agent
+# and ingestion modules are imported by the activities that use them: the
+# workflow sandbox imports this module as well, and should only pay for
+# temporalio and shared.
+_root = Path(__file__).resolve().parent.parent
+if str(_root) not in sys.path:
+    sys.path.insert(0, str(_root))
+
+if TYPE_CHECKING:
+    import requests
+
+    from shared_libraries.pdf_text import PdfPreprocessor
+    from shared_libraries.uploader import ConcurrentUploader
+
+# Demo of Temporal retries: fail every first attempt of `retrieve_and_generate`.
+# Off by default; a forced failure also defeats hedging and batch answering.
+DEMO_FAIL_FIRST_ATTEMPT = os.getenv("DEMO_FAIL_FIRST_ATTEMPT", "0") == "1"
+
+# Minimum gap between partial-answer signals; each signal is a history event.
+STREAM_FLUSH_INTERVAL_SECONDS = 0.2
+
+
+class _PartialAnswerPublisher:
+    """Batches streamed text and signals it to the workflow running this activity."""
+
+    def __init__(self, flush_interval: float = STREAM_FLUSH_INTERVAL_SECONDS):
+        info = activity.info()
+        self._handle = activity.client().get_workflow_handle(
+            info.workflow_id, run_id=info.workflow_run_id
+        )
+        self._attempt = info.attempt
+        self._flush_interval = flush_interval
+        self._buffer: list[str] = []
+        self._sent_chars = 0
+        self._last_flush = 0.0
+        self._enabled = True
+
+    async def __call__(self, text: str) -> None:
+        self._buffer.append(text)
+        # Flush the first token immediately: time-to-first-token is what callers see.
+        if self._sent_chars == 0 or time.monotonic() - self._last_flush >= self._flush_interval:
+            await self.flush()
+
+    async def flush(self) -> None:
+        if not (self._enabled and self._buffer):
+            return
+        text = "".join(self._buffer)
+        self._buffer.clear()
+        self._last_flush = time.monotonic()
+        try:
+            await self._handle.signal("publish_partial", PartialAnswer(self._attempt, text))
+        except Exception as e:
+            # Streaming is best effort; the full answer is still returned as the result.
+            activity.logger.warning(f"Disabling partial answer streaming: {e}")
+            self._enabled = False
+            return
+        self._sent_chars += len(text)
+        activity.heartbeat(self._sent_chars)
 
 
 @activity.defn
-async def retrieve_and_generate(query: str) -> str:
+async def retrieve_and_generate(
+    query: str, stream: bool = False, conversation: Conversation | None = None
+) -> str:
     """
     Async activity that calls the async RAG agent.
-    Fails deterministically on first attempt.
+    Fails on the first attempt when DEMO_FAIL_FIRST_ATTEMPT=1 is set.
+
+    With `stream` set, answer text is signalled to the calling workflow as it
+    is generated so clients can query it before the activity completes. With
+    `conversation`, the query is answered as the next turn of that session.
     """
 
     # Demo failure (first attempt only)
-    if activity.info().attempt == 1:
+    if DEMO_FAIL_FIRST_ATTEMPT and activity.info().attempt == 1:
         raise RuntimeError("Simulated transient Vertex AI failure")
 
+    from agent import ask_rag_agent
+
     # Properly await async agent
-    response = await ask_rag_agent(query)
+    publisher = _PartialAnswerPublisher() if stream else None
+    user_id = session_id = None
+    if conversation is not None:
+        user_id, session_id = conversation.user_id, conversation.session_id
+    # Waits for the shared Vertex quota when VERTEX_RATE_PER_SECOND is set; one
+    # permit covers the whole agent run (see vertex_limiter.py).
+    async with vertex_permit():
+        answer = asyncio.ensure_future(
+            ask_rag_agent(query, on_partial=publisher, user_id=user_id, session_id=session_id)
+        )
+        try:
+            # Heartbeats are how a cancellation (e.g. of a losing hedge) reaches us.
+            await _heartbeat_while(answer, lambda: None, ANSWER_HEARTBEAT_SECONDS)
+            response = await answer
+        finally:
+            answer.cancel()
+    if publisher is not None:
+        await publisher.flush()
     return response
+
+
+# Seconds between heartbeats while an answer is generated.
+ANSWER_HEARTBEAT_SECONDS = 5.0
+
+_answer_latencies = LatencyTracker()
+_hedge_budget = HedgeBudget()
+
+
+@activity.defn
+async def plan_hedge(policy: HedgePolicy) -> float:
+    """Local activity: seconds the first attempt may run before a hedge is started."""
+    if policy.percentile is not None and len(_answer_latencies) >= policy.min_samples:
+        return max(policy.min_delay_seconds, _answer_latencies.percentile(policy.percentile))
+    return policy.delay_seconds
+
+
+@activity.defn
+async def acquire_hedge(policy: HedgePolicy) -> bool:
+    """Local activity: whether this worker's per-minute hedge budget allows another hedge."""
+    return _hedge_budget.try_acquire(policy.max_per_minute)
+
+
+@activity.defn
+async def record_answer_latency(seconds: float) -> None:
+    """Local activity: feed an end-to-end answer latency into `plan_hedge`."""
+    _answer_latencies.record(seconds)
+
+
+def _read_query_window(window: QueryWindow) -> list[str]:
+    window_queries = []
+    with open(window.queries_file, encoding="utf-8") as f:
+        lines = (line.strip() for line in f)
+        queries = (line for line in lines if line)
+        for line in itertools.islice(queries, window.offset, window.offset + window.limit):
+            if line.startswith("{"):
+                line = json.loads(line)["query"]
+            window_queries.append(line)
+    return window_queries
+
+
+@activity.defn
+async def load_queries(window: QueryWindow) -> list[str]:
+    """Read `window.limit` queries starting at `window.offset` from a query file."""
+    return await asyncio.to_thread(_read_query_window, window)
+
+
+def _append_answers(batch: BatchAnswers) -> None:
+    with open(batch.output_file, "a", encoding="utf-8") as f:
+        for index, answer in sorted(batch.answers.items()):
+            f.write(json.dumps({"index": index, "answer": answer}) + "\n")
+        for failure in batch.failures:
+            f.write(json.dumps({"index": failure.index, "query": failure.query, "error": failure.error}) + "\n")
+
+
+@activity.defn
+async def write_batch_answers(batch: BatchAnswers) -> None:
+    """Append a checkpoint's answers and failures to the batch output file as JSON lines.
+
+    A retried write can repeat lines; consumers should de-duplicate on "index".
+    """
+    await asyncio.to_thread(_append_answers, batch)
+
+
+# Seconds between heartbeats while a file downloads or uploads.
+INGEST_HEARTBEAT_SECONDS = 10.0
+# Starting uploads per second for each corpus in this worker process.
+INGEST_UPLOAD_RATE = float(os.getenv("INGEST_UPLOAD_RATE", "2.0"))
+# Upload PDFs as locally extracted text, on this many processes (0: one per core).
+INGEST_EXTRACT_PDFS = os.getenv("INGEST_EXTRACT_PDFS", "true").lower() in ("1", "true", "yes")
+INGEST_EXTRACT_WORKERS = int(os.getenv("INGEST_EXTRACT_WORKERS", "0"))
+
+_ingest_lock = threading.Lock()
+_ingest_session: Optional["requests.Session"] = None
+_uploaders: dict[str, "ConcurrentUploader"] = {}
+_pdf_preprocessor: Optional["PdfPreprocessor"] = None
+
+
+def _session() -> "requests.Session":
+    global _ingest_session
+    with _ingest_lock:
+        if _ingest_session is None:
+            from shared_libraries.url_ingest import make_session
+
+            _ingest_session = make_session()
+        return _ingest_session
+
+
+def _uploader(corpus_name: str) -> "ConcurrentUploader":
+    """One adaptive rate limiter per corpus, shared by every ingest activity in this process."""
+    global _pdf_preprocessor
+    with _ingest_lock:
+        uploader = _uploaders.get(corpus_name)
+        if uploader is None:
+            import vertexai
+
+            from catalog import get_catalog
+            from shared_libraries.uploader import ConcurrentUploader
+
+            if INGEST_EXTRACT_PDFS and _pdf_preprocessor is None:
+                from shared_libraries.pdf_text import PdfPreprocessor
+
+                _pdf_preprocessor = PdfPreprocessor(INGEST_EXTRACT_WORKERS or None)
+
+            vertexai.init(project=os.getenv("GOOGLE_CLOUD_PROJECT"), location=os.getenv("GOOGLE_CLOUD_LOCATION"))
+            uploader = _uploaders[corpus_name] = ConcurrentUploader(
+                corpus_name,
+                workers=1,
+                rate=INGEST_UPLOAD_RATE,
+                catalog=get_catalog(),
+                pdf_preprocessor=_pdf_preprocessor,
+            )
+        return uploader
+
+
+async def _heartbeat_while(task: asyncio.Future, details, interval: float = INGEST_HEARTBEAT_SECONDS) -> None:
+    """Heartbeat every `interval` seconds until `task` finishes; `details()` describes progress."""
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=interval)
+        if done:
+            return
+        activity.heartbeat(details())
+
+
+def _read_source_window(window: SourceWindow) -> list[IngestSource]:
+    from shared_libraries.url_ingest import display_name_for
+
+    sources = []
+    with open(window.sources_file, encoding="utf-8") as f:
+        lines = (line.strip() for line in f)
+        entries = (line for line in lines if line and not line.startswith("#"))
+        for line in itertools.islice(entries, window.offset, window.offset + window.limit):
+            if line.startswith("{"):
+                record = json.loads(line)
+                uri = record.get("url") or record["path"]
+                sources.append(IngestSource(uri, record.get("display_name") or display_name_for(uri), record.get("description", "")))
+            else:
+                sources.append(IngestSource(line, display_name_for(line)))
+    return sources
+
+
+@activity.defn
+async def load_ingest_sources(window: SourceWindow) -> list[IngestSource]:
+    """Read `window.limit` sources starting at `window.offset` from a sources file."""
+    return await asyncio.to_thread(_read_source_window, window)
+
+
+def _download(url: str, path: str, progress: list[int]) -> None:
+    import requests
+
+    try:
+        with _session().get(url, stream=True, timeout=60) as response:
+            response.raise_for_status()
+            with open(path, "wb") as f:
+                for chunk in response.iter_content(chunk_size=1 << 16):
+                    f.write(chunk)
+                    progress[0] += len(chunk)
+    except requests.HTTPError as e:
+        status = e.response.status_code if e.response is not None else None
+        # Missing or forbidden documents won't appear on retry; throttling and 5xx might.
+        if status is not None and 400 <= status < 500 and status not in (408, 429):
+            raise ApplicationError(str(e), type="DownloadFailed", non_retryable=True) from e
+        raise
+
+
+def _content_marker(sha256: str) -> str:
+    return f"[sha256:{sha256}]"
+
+
+def _find_ingested(corpus_name: str, display_name: str, sha256: str) -> str | None:
+    """Name of a RagFile already in the corpus for this document and content, if any.
+
+    The local catalog, where this host's uploads are recorded, is checked
+    first; the corpus is only listed when it has no such file.
+    """
+    from vertexai.preview import rag
+
+    from catalog import get_catalog
+
+    recorded = get_catalog().find_files(corpus_name, display_name=display_name, sha256=sha256)
+    if recorded:
+        return recorded[0].name
+    marker = _content_marker(sha256)
+    for rag_file in rag.list_files(corpus_name=corpus_name):
+        if rag_file.display_name == display_name and marker in (rag_file.description or ""):
+            return rag_file.name
+    return None
+
+
+@activity.defn
+async def ingest_document(request: IngestFileInput) -> IngestedFile:
+    """Download one document (if it is a URL) and upload it to the corpus.
+
+    Heartbeats with the bytes downloaded so far, and keeps heartbeating while
+    the upload is parsed and embedded, so a hung attempt is detected by its
+    heartbeat timeout rather than only by its start-to-close timeout. Quota
+    errors are retried in-process with the corpus's shared rate limiter.
+
+    Retries don't upload a document twice: the upload heartbeats carry the
+    document's SHA-256, which also goes into the RagFile's description, and
+    the RagFile's name is heartbeated as soon as the upload returns. A retry
+    returns the RagFile its previous attempt reported, or, if that attempt
+    died mid-upload, looks for one with the same display name and SHA-256
+    in the catalog, then in the corpus, before uploading again.
+    """
+    from shared_libraries.corpus_sync import file_sha256
+    from shared_libraries.uploader import UploadJob
+
+    source = request.source
+    uploader = _uploader(request.corpus_name)
+    details = activity.info().heartbeat_details
+    previous = details[0] if details and isinstance(details[0], dict) else {}
+    if previous.get("stage") == "uploaded":
+        activity.logger.info("%s was uploaded by a previous attempt as %s", source.uri, previous["rag_file"])
+        return IngestedFile(source.uri, previous["rag_file"], previous["bytes"])
+    if previous.get("stage") == "upload" and previous.get("sha256"):
+        rag_file = await asyncio.to_thread(
+            _find_ingested, request.corpus_name, source.display_name, previous["sha256"]
+        )
+        if rag_file is not None:
+            activity.logger.info("%s is already in the corpus as %s", source.uri, rag_file)
+            return IngestedFile(source.uri, rag_file, previous["bytes"])
+
+    progress = [0]
+    with tempfile.TemporaryDirectory(prefix="rag-ingest-") as temp_dir:
+        path = source.uri
+        if source.uri.startswith(("http://", "https://")):
+            path = os.path.join(temp_dir, os.path.basename(source.display_name) or "document")
+            download = asyncio.ensure_future(asyncio.to_thread(_download, source.uri, path, progress))
+            await _heartbeat_while(download, lambda: {"stage": "download", "bytes": progress[0]})
+            await download
+        else:
+            progress[0] = os.path.getsize(path)
+
+        sha256 = await asyncio.to_thread(file_sha256, path)
+        description = " ".join(filter(None, [source.description, _content_marker(sha256)]))
+        job = UploadJob(path, source.display_name, description, key=source.uri, sha256=sha256)
+        upload = asyncio.ensure_future(asyncio.to_thread(uploader.upload, job))
+        upload_details = {"stage": "upload", "bytes": progress[0], "sha256": sha256}
+        activity.heartbeat(upload_details)
+        await _heartbeat_while(upload, lambda: upload_details)
+        result = await upload
+    if not result.ok:
+        raise ApplicationError(f"Upload of {source.display_name} failed: {result.error}", type="UploadFailed")
+    rag_file = getattr(result.rag_file, "name", None)
+    activity.heartbeat({"stage": "uploaded", "rag_file": rag_file, "bytes": progress[0]})
+    return IngestedFile(source.uri, rag_file, progress[0])
+
+
+@activity.defn
+async def finish_corpus_ingestion(corpus_name: str) -> None:
+    """Invalidate answers and retrieval results cached against the corpus.
+
+    The generation stamp lives in RAG_CORPUS_STAMP_DIR, which only this
+    worker's host sees unless it is on storage every agent and worker process
+    mounts (an NFS or Filestore volume, say). With per-host stamp
+    directories, other hosts keep serving cached answers until they expire.
+    """
+    from cache import mark_corpus_changed
+
+    mark_corpus_changed(corpus_name)
+
+
+def warm_up() -> None:
+    """Build the agent ahead of the first activity; safe to run in a background thread."""
+    from agent import warm_up as warm_up_agent
+
+    warm_up_agent()
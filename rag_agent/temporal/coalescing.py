@@ -0,0 +1,111 @@
+"""Start RAGAgentWorkflow so identical concurrent questions share one execution.
+
+The workflow ID is derived from the tenant and the normalized query
+(`shared.query_workflow_id`) and started with
+`WorkflowIDConflictPolicy.USE_EXISTING`: while an execution for the same
+tenant's question is running anywhere in the cluster, every other client gets
+a handle to it instead of starting its own, so they all wait on one LLM call.
+Tenants never share an execution, and so never see each other's answers or
+spend each other's quota.
+
+A query that is a turn of a conversation (`session_id`) depends on the
+session's history, so it always starts its own execution under a unique ID.
+
+Once that execution has closed, `ALLOW_DUPLICATE` lets the next request start a
+fresh one, unless `freshness_seconds` is set and the last execution completed
+within that window, in which case its result is reused. Checking costs one
+DescribeWorkflowExecution call, so it is off by default.
+"""
+
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from temporalio.client import Client, WorkflowExecutionStatus, WorkflowHandle
+from temporalio.common import Priority, WorkflowIDConflictPolicy, WorkflowIDReusePolicy
+from temporalio.service import RPCError, RPCStatusCode
+
+from shared import TASK_QUEUE, Conversation, HedgePolicy, query_workflow_id
+
+logger = logging.getLogger(__name__)
+
+QUERY_FRESHNESS_SECONDS = float(os.getenv("RAG_QUERY_FRESHNESS_SECONDS", 0))
+
+
+async def _recent_result(
+    client: Client, workflow_id: str, freshness_seconds: float
+) -> WorkflowHandle | None:
+    """Handle to the latest run of `workflow_id` if it completed within the window."""
+    handle = client.get_workflow_handle(workflow_id)
+    try:
+        description = await handle.describe()
+    except RPCError as e:
+        if e.status == RPCStatusCode.NOT_FOUND:
+            return None
+        raise
+    if (
+        description.status != WorkflowExecutionStatus.COMPLETED
+        or description.close_time is None
+    ):
+        return None
+    if datetime.now(timezone.utc) - description.close_time > timedelta(
+        seconds=freshness_seconds
+    ):
+        return None
+    return client.get_workflow_handle(workflow_id, run_id=description.run_id)
+
+
+async def start_query_workflow(
+    client: Client,
+    query: str,
+    *,
+    freshness_seconds: float = QUERY_FRESHNESS_SECONDS,
+    scope: str = "",
+    task_queue: str = TASK_QUEUE,
+    hedge: HedgePolicy | None = None,
+    tenant: str = "",
+    priority: int | None = None,
+    user_id: str = "",
+    session_id: str | None = None,
+) -> WorkflowHandle:
+    """Start RAGAgentWorkflow for `query`, or attach to / reuse an identical one.
+
+    The returned handle may belong to an execution another client of the same
+    `tenant` (and `scope`) started; its `result()` and `partial_answer` query
+    work the same either way, but `hedge` and `priority` only apply to an
+    execution this call starts. The tenant and priority (1 highest to 5) are
+    passed on to its activities as a Temporal `Priority`, which the shared
+    Vertex rate limiter uses for quotas.
+
+    With `session_id`, the query is the next turn of `user_id`'s conversation
+    and gets an execution of its own; hedging and freshness don't apply.
+    """
+    if session_id is not None:
+        conversation = Conversation(session_id, user_id or Conversation.user_id)
+        return await client.start_workflow(
+            "RAGAgentWorkflow",
+            args=[query, None, conversation],
+            id=f"rag-turn-{uuid.uuid4().hex}",
+            task_queue=task_queue,
+            result_type=str,
+            priority=Priority(priority_key=priority, fairness_key=tenant or None),
+        )
+    workflow_id = query_workflow_id(query, scope, tenant)
+    if freshness_seconds > 0:
+        recent = await _recent_result(client, workflow_id, freshness_seconds)
+        if recent is not None:
+            logger.info(
+                f"Reusing answer from {workflow_id} completed within {freshness_seconds:g}s"
+            )
+            return recent
+    return await client.start_workflow(
+        "RAGAgentWorkflow",
+        args=[query, hedge] if hedge is not None else [query],
+        id=workflow_id,
+        task_queue=task_queue,
+        result_type=str,
+        id_conflict_policy=WorkflowIDConflictPolicy.USE_EXISTING,
+        id_reuse_policy=WorkflowIDReusePolicy.ALLOW_DUPLICATE,
+        priority=Priority(priority_key=priority, fairness_key=tenant or None),
+    )
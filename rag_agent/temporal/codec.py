@@ -0,0 +1,285 @@
+"""Payload codec compressing workflow payloads and offloading large ones to a blob store.
+
+Queries, answers, partial-answer signals and batch results are all stored in
+workflow history as JSON payloads, and history is what the server keeps,
+workers replay and visibility reads. `CompressionCodec` compresses every
+payload of at least PAYLOAD_COMPRESSION_MIN_BYTES (zlib by default, zstd with
+PAYLOAD_COMPRESSION=zstd and the `zstandard` package installed), keeping the
+original only when compression doesn't pay. A payload still larger than
+PAYLOAD_OFFLOAD_BYTES after compression is written to PAYLOAD_BLOB_STORE (a
+local directory, shared by every worker and client, or gs://bucket/prefix)
+under the SHA-256 of its contents, and history keeps a small reference.
+
+Decoding accepts plain, compressed and offloaded payloads whatever the
+settings, so the codec can be switched on (or compression off) for a running
+cluster. Every client and worker must use the codec, though: `data_converter()`
+is passed to each `Client.connect` in this directory. Switching to zstd or
+enabling offload needs every process upgraded first, and the Temporal UI and
+CLI show these payloads as binary data.
+
+Blobs are immutable and content-addressed, so retries and duplicate answers
+share one blob. Nothing deletes a blob that a closed workflow still points
+to: keep them longer than the namespace's retention, with
+`python codec.py purge --older-than-days N` for a local store or a bucket
+lifecycle rule on `daysSinceCustomTime` for GCS. Both go by when a blob was
+last written, so a blob that a recent workflow wrote again is kept.
+"""
+
+import argparse
+import asyncio
+import dataclasses
+import hashlib
+import json
+import os
+import time
+import uuid
+import zlib
+from collections.abc import Sequence
+from datetime import datetime, timezone
+from functools import cache
+from typing import Protocol
+
+from temporalio.api.common.v1 import Payload
+from temporalio.converter import DataConverter, PayloadCodec, default
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+PAYLOAD_COMPRESSION = os.getenv("PAYLOAD_COMPRESSION", "zlib").lower()
+PAYLOAD_COMPRESSION_MIN_BYTES = int(os.getenv("PAYLOAD_COMPRESSION_MIN_BYTES", 512))
+PAYLOAD_OFFLOAD_BYTES = int(os.getenv("PAYLOAD_OFFLOAD_BYTES", 128 * 1024))
+PAYLOAD_BLOB_STORE = os.getenv("PAYLOAD_BLOB_STORE", "")
+
+ENCODING_ZLIB = b"binary/zlib"
+ENCODING_ZSTD = b"binary/zstd"
+ENCODING_BLOB_REF = b"json/blob-ref"
+COMPRESSIONS = ("zlib", "zstd", "none")
+
+
+class BlobStore(Protocol):
+    """Where offloaded payloads live. `put` must be idempotent: the same key always has the same data."""
+
+    async def put(self, key: str, data: bytes) -> None: ...
+
+    async def get(self, key: str) -> bytes: ...
+
+
+class LocalBlobStore:
+    """Blobs as files under `directory`, fanned out by the first two hex digits of the key."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def _put(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        if os.path.exists(path):
+            # Refresh the age `purge` goes by; the contents are the same.
+            os.utime(path)
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partial = f"{path}.{uuid.uuid4().hex}.partial"
+        with open(partial, "wb") as f:
+            f.write(data)
+        os.replace(partial, path)
+
+    def _get(self, key: str) -> bytes:
+        with open(self._path(key), "rb") as f:
+            return f.read()
+
+    async def put(self, key: str, data: bytes) -> None:
+        await asyncio.to_thread(self._put, key, data)
+
+    async def get(self, key: str) -> bytes:
+        return await asyncio.to_thread(self._get, key)
+
+    def purge(self, max_age_seconds: float) -> int:
+        """Delete blobs last written over `max_age_seconds` ago; returns how many."""
+        cutoff = time.time() - max_age_seconds
+        purged = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                        purged += 1
+                except FileNotFoundError:
+                    pass
+        return purged
+
+
+class GcsBlobStore:
+    """Blobs as objects under gs://`bucket`/`prefix`."""
+
+    def __init__(self, bucket: str, prefix: str = ""):
+        from google.cloud import storage
+
+        self._bucket = storage.Client().bucket(bucket)
+        self.prefix = prefix.strip("/")
+
+    def _blob(self, key: str):
+        return self._bucket.blob(f"{self.prefix}/{key}" if self.prefix else key)
+
+    def _put(self, key: str, data: bytes) -> None:
+        from google.api_core.exceptions import PreconditionFailed
+
+        blob = self._blob(key)
+        # The age lifecycle rules go by (daysSinceCustomTime), like a file's mtime.
+        blob.custom_time = datetime.now(timezone.utc)
+        try:
+            blob.upload_from_string(data, if_generation_match=0)
+        except PreconditionFailed:
+            # Already stored; refresh its age, as the contents are the same.
+            blob.patch()
+
+    async def put(self, key: str, data: bytes) -> None:
+        await asyncio.to_thread(self._put, key, data)
+
+    async def get(self, key: str) -> bytes:
+        return await asyncio.to_thread(self._blob(key).download_as_bytes)
+
+
+def blob_store_from_uri(uri: str) -> BlobStore | None:
+    """A directory path or gs://bucket/prefix as a blob store; None for ""."""
+    if not uri:
+        return None
+    if uri.startswith("gs://"):
+        bucket, _, prefix = uri[len("gs://") :].partition("/")
+        return GcsBlobStore(bucket, prefix)
+    return LocalBlobStore(uri)
+
+
+class CompressionCodec(PayloadCodec):
+    """Compresses payloads of at least `min_bytes`; offloads those still over `offload_bytes` to `blob_store`."""
+
+    def __init__(
+        self,
+        compression: str = "zlib",
+        min_bytes: int = 512,
+        blob_store: BlobStore | None = None,
+        offload_bytes: int = 128 * 1024,
+        level: int | None = None,
+    ):
+        if compression not in COMPRESSIONS:
+            raise ValueError(
+                f"compression must be one of {COMPRESSIONS}, got {compression!r}"
+            )
+        if compression == "zstd" and zstandard is None:
+            raise ValueError("zstd compression needs the zstandard package")
+        self.compression = compression
+        self.min_bytes = min_bytes
+        self.blob_store = blob_store
+        self.offload_bytes = offload_bytes
+        self.level = level
+
+    def _compress(self, payload: Payload) -> Payload:
+        if self.compression == "none" or payload.ByteSize() < self.min_bytes:
+            return payload
+        serialized = payload.SerializeToString()
+        if self.compression == "zstd":
+            data = zstandard.ZstdCompressor(level=self.level or 3).compress(serialized)
+            encoding = ENCODING_ZSTD
+        else:
+            data = zlib.compress(serialized, self.level or 6)
+            encoding = ENCODING_ZLIB
+        if len(data) >= len(serialized):
+            return payload
+        return Payload(metadata={"encoding": encoding}, data=data)
+
+    async def encode(self, payloads: Sequence[Payload]) -> list[Payload]:
+        encoded = []
+        for payload in payloads:
+            payload = self._compress(payload)
+            if self.blob_store is not None and payload.ByteSize() > self.offload_bytes:
+                payload = await self._offload(payload)
+            encoded.append(payload)
+        return encoded
+
+    async def _offload(self, payload: Payload) -> Payload:
+        data = payload.SerializeToString()
+        key = hashlib.sha256(data).hexdigest()
+        await self.blob_store.put(key, data)
+        reference = json.dumps({"key": key, "size": len(data)}).encode()
+        return Payload(metadata={"encoding": ENCODING_BLOB_REF}, data=reference)
+
+    async def decode(self, payloads: Sequence[Payload]) -> list[Payload]:
+        decoded = []
+        for payload in payloads:
+            encoding = payload.metadata.get("encoding")
+            if encoding == ENCODING_BLOB_REF:
+                payload = await self._fetch(payload)
+                encoding = payload.metadata.get("encoding")
+            if encoding == ENCODING_ZLIB:
+                payload = Payload.FromString(zlib.decompress(payload.data))
+            elif encoding == ENCODING_ZSTD:
+                if zstandard is None:
+                    raise RuntimeError(
+                        "Payload is zstd-compressed but the zstandard package isn't installed"
+                    )
+                payload = Payload.FromString(
+                    zstandard.ZstdDecompressor().decompress(payload.data)
+                )
+            decoded.append(payload)
+        return decoded
+
+    async def _fetch(self, payload: Payload) -> Payload:
+        key = json.loads(payload.data)["key"]
+        if self.blob_store is None:
+            raise RuntimeError(
+                f"Payload {key} was offloaded to a blob store, but PAYLOAD_BLOB_STORE isn't set"
+            )
+        data = await self.blob_store.get(key)
+        if hashlib.sha256(data).hexdigest() != key:
+            raise RuntimeError(f"Offloaded payload {key} is corrupt")
+        return Payload.FromString(data)
+
+
+@cache
+def default_codec() -> CompressionCodec:
+    """The codec configured by the PAYLOAD_* environment variables, shared by every client in the process."""
+    return CompressionCodec(
+        compression=PAYLOAD_COMPRESSION,
+        min_bytes=PAYLOAD_COMPRESSION_MIN_BYTES,
+        blob_store=blob_store_from_uri(PAYLOAD_BLOB_STORE),
+        offload_bytes=PAYLOAD_OFFLOAD_BYTES,
+    )
+
+
+def data_converter(codec: PayloadCodec | None = None) -> DataConverter:
+    """The default data converter with `codec` (by default `default_codec()`) applied to every payload."""
+    return dataclasses.replace(default(), payload_codec=codec or default_codec())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Manage offloaded workflow payloads.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    purge = subparsers.add_parser(
+        "purge", help="Delete blobs from a local blob store by age"
+    )
+    purge.add_argument(
+        "--store",
+        default=PAYLOAD_BLOB_STORE,
+        help="Blob directory (default: $PAYLOAD_BLOB_STORE)",
+    )
+    purge.add_argument(
+        "--older-than-days",
+        type=float,
+        required=True,
+        help="Keep blobs written within this many days; use more than the namespace's retention",
+    )
+    args = parser.parse_args()
+    if not args.store or args.store.startswith("gs://"):
+        parser.error(
+            "purge needs a local blob directory; expire gs:// blobs with a bucket lifecycle rule on daysSinceCustomTime"
+        )
+    purged = LocalBlobStore(args.store).purge(args.older_than_days * 86400)
+    print(f"Purged {purged} blobs")
+
+
+if __name__ == "__main__":
+    main()
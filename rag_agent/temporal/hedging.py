@@ -0,0 +1,43 @@
+"""Per-process state behind RAGAgentWorkflow's hedging local activities.
+
+Local activities run in the workflow worker that schedules them, so each
+workflow worker learns answer latencies and spends its hedge budget on its own.
+"""
+
+import time
+from collections import deque
+
+
+class LatencyTracker:
+    """The last `window` answer latencies, for percentile lookups."""
+
+    def __init__(self, window: int = 500):
+        self._samples: deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, q: float) -> float | None:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+
+class HedgeBudget:
+    """Allows at most `max_per_minute` hedges in any sliding 60 second window."""
+
+    def __init__(self):
+        self._started: deque[float] = deque()
+
+    def try_acquire(self, max_per_minute: int) -> bool:
+        now = time.monotonic()
+        while self._started and now - self._started[0] >= 60:
+            self._started.popleft()
+        if len(self._started) >= max_per_minute:
+            return False
+        self._started.append(now)
+        return True
@@ -0,0 +1,49 @@
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from temporalio import activity
+from temporalio.worker import (
+    ActivityInboundInterceptor,
+    ExecuteActivityInput,
+    Interceptor,
+)
+
+_root = Path(__file__).resolve().parent.parent
+if str(_root) not in sys.path:
+    sys.path.insert(0, str(_root))
+
+# telemetry.py lives in rag_agent/, which is only importable after the line above.
+from telemetry import record_stage, stage  # noqa: E402
+
+
+def _ns(timestamp: datetime) -> int:
+    return int(timestamp.timestamp() * 1e9)
+
+
+class ActivityTelemetryInterceptor(Interceptor):
+    """Records `activity.queue_wait` and `activity.run` stages for every activity.
+
+    Queue wait runs from when the server scheduled the current attempt until this
+    worker picked it up, so it is measured across the server's and worker's clocks.
+    """
+
+    def intercept_activity(
+        self, next: ActivityInboundInterceptor
+    ) -> ActivityInboundInterceptor:
+        return _ActivityTelemetryInbound(next)
+
+
+class _ActivityTelemetryInbound(ActivityInboundInterceptor):
+    async def execute_activity(self, input: ExecuteActivityInput) -> Any:
+        info = activity.info()
+        if info.current_attempt_scheduled_time and info.started_time:
+            record_stage(
+                "activity.queue_wait",
+                _ns(info.current_attempt_scheduled_time),
+                _ns(info.started_time),
+                activity=info.activity_type,
+            )
+        with stage("activity.run", activity=info.activity_type, retry=info.attempt > 1):
+            return await super().execute_activity(input)
@@ -0,0 +1,375 @@
+"""HTTP gateway that answers questions through RAGAgentWorkflow, streaming over SSE.
+
+    uvicorn server:app --app-dir rag_agent/temporal --port 8000
+    curl -N localhost:8000/ask -H 'Content-Type: application/json' \
+        -d '{"query": "Explain how fraud detection works in banking"}'
+
+The process holds TEMPORAL_CLIENT_POOL_SIZE long-lived Temporal clients, each
+its own gRPC connection, created at startup and handed out round-robin, so
+requests never pay for a connection and a single HTTP/2 connection's stream
+limit doesn't cap concurrency. Workflows are started with
+`start_query_workflow`, so identical questions attach to one execution across
+the cluster; inside this process, all requests for the same execution share
+one `AnswerStream`, which polls the `partial_answer` query and waits for the
+result once, however many clients are listening. Polling starts every
+GATEWAY_POLL_INTERVAL_SECONDS and doubles up to GATEWAY_POLL_MAX_INTERVAL_SECONDS
+while the answer isn't changing, so slow or stalled workflows cost few queries;
+the result itself arrives as soon as the workflow completes, whatever the interval.
+
+Each SSE response sends a `workflow` event with the workflow ID, `delta`
+events with new answer text (a `reset` event if a retry restarts the answer),
+and finally either an `answer` event with the full answer or an `error` event.
+`"stream": false` returns the answer as JSON instead. With `"session_id"` (and
+optionally `"user_id"`), the query is the next turn of that conversation and
+runs in a workflow of its own.
+
+Backpressure: at most GATEWAY_MAX_REQUESTS requests are in flight; a request
+waits up to GATEWAY_ADMISSION_TIMEOUT_SECONDS for a slot, then gets a 503 with
+Retry-After. Subscribers only ever see the latest answer text, so a slow
+client skips intermediate updates rather than buffering them. A request that
+takes longer than GATEWAY_REQUEST_TIMEOUT_SECONDS gets a timeout error (504
+without streaming); the workflow itself keeps running for other clients.
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+import os
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
+from typing import Any
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from temporalio.client import Client, WorkflowHandle
+from temporalio.service import RPCError
+
+from coalescing import QUERY_FRESHNESS_SECONDS, start_query_workflow
+from codec import data_converter
+from shared import StreamState
+
+logger = logging.getLogger(__name__)
+
+TEMPORAL_ADDRESS = os.getenv("TEMPORAL_ADDRESS", "localhost:7233")
+TEMPORAL_NAMESPACE = os.getenv("TEMPORAL_NAMESPACE", "default")
+TEMPORAL_CLIENT_POOL_SIZE = int(os.getenv("TEMPORAL_CLIENT_POOL_SIZE", 4))
+MAX_REQUESTS = int(os.getenv("GATEWAY_MAX_REQUESTS", 4096))
+ADMISSION_TIMEOUT_SECONDS = float(os.getenv("GATEWAY_ADMISSION_TIMEOUT_SECONDS", 2))
+REQUEST_TIMEOUT_SECONDS = float(os.getenv("GATEWAY_REQUEST_TIMEOUT_SECONDS", 180))
+POLL_INTERVAL_SECONDS = float(os.getenv("GATEWAY_POLL_INTERVAL_SECONDS", 0.25))
+POLL_MAX_INTERVAL_SECONDS = float(os.getenv("GATEWAY_POLL_MAX_INTERVAL_SECONDS", 2))
+# Comment lines sent while no text arrives, so proxies keep idle streams open.
+KEEPALIVE_SECONDS = 15
+
+
+class TemporalClientPool:
+    """Long-lived Temporal clients, each with its own connection, used round-robin."""
+
+    def __init__(self, clients: list[Client]):
+        self.clients = clients
+        self._next = itertools.cycle(clients)
+
+    @classmethod
+    async def connect(
+        cls, size: int = TEMPORAL_CLIENT_POOL_SIZE, **kwargs: Any
+    ) -> "TemporalClientPool":
+        kwargs.setdefault("data_converter", data_converter())
+        clients = await asyncio.gather(
+            *(
+                Client.connect(TEMPORAL_ADDRESS, namespace=TEMPORAL_NAMESPACE, **kwargs)
+                for _ in range(max(1, size))
+            )
+        )
+        return cls(list(clients))
+
+    def get(self) -> Client:
+        return next(self._next)
+
+
+class AnswerStream:
+    """Follows one workflow execution's answer on behalf of every local subscriber."""
+
+    def __init__(
+        self, handle: WorkflowHandle, on_finished: Callable[["AnswerStream"], None]
+    ):
+        self.handle = handle
+        self.text = ""
+        self.attempt = 0
+        self.answer: str | None = None
+        self.error: str | None = None
+        self.done = False
+        # Set once every local subscriber has left; the stream must not be reused.
+        self.cancelled = False
+        # Bumped on every change, when `_changed` is set and replaced by a fresh event.
+        self.version = 0
+        self._changed = asyncio.Event()
+        self._subscribers = 0
+        self._on_finished = on_finished
+        self._task = asyncio.create_task(self._follow())
+
+    def _publish(self) -> None:
+        self.version += 1
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def _follow(self) -> None:
+        result = asyncio.ensure_future(self.handle.result())
+        interval = POLL_INTERVAL_SECONDS
+        try:
+            while True:
+                # Wait before the first query too: a reused, completed run resolves right away.
+                await asyncio.wait({result}, timeout=interval)
+                if result.done():
+                    break
+                # Back off until the answer moves; reset below when it does.
+                interval = min(interval * 2, POLL_MAX_INTERVAL_SECONDS)
+                try:
+                    state = await self.handle.query(
+                        "partial_answer", result_type=StreamState
+                    )
+                except RPCError as e:
+                    logger.debug(
+                        f"partial_answer query on {self.handle.id} failed: {e}"
+                    )
+                    continue
+                if state.done or (
+                    state.attempt == self.attempt and state.text == self.text
+                ):
+                    continue
+                self.attempt, self.text = state.attempt, state.text
+                interval = POLL_INTERVAL_SECONDS
+                self._publish()
+            self.answer = result.result()
+        except Exception as e:
+            self.error = str(e.cause) if getattr(e, "cause", None) else str(e)
+        finally:
+            result.cancel()
+            self.done = True
+            self._publish()
+            self._on_finished(self)
+
+    async def wait_changed(self, seen_version: int, timeout: float) -> None:
+        """Return once `version` differs from `seen_version`; TimeoutError after `timeout`."""
+        if self.version == seen_version:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+
+    async def wait_done(self) -> None:
+        while not self.done:
+            await self._changed.wait()
+
+    def subscribe(self) -> None:
+        self._subscribers += 1
+
+    def unsubscribe(self) -> None:
+        self._subscribers -= 1
+        if self._subscribers == 0 and not self.done:
+            # Nobody here is listening any more; the workflow itself keeps running.
+            self.cancel()
+
+    def cancel(self) -> None:
+        # Forget the stream now rather than when `_follow` unwinds, so a request
+        # arriving in between starts a fresh stream instead of joining this one.
+        self.cancelled = True
+        self._task.cancel()
+        if not self.done:
+            # `_follow` may never get to run its cleanup if it hadn't started.
+            self.error = "Stopped following the workflow"
+            self.done = True
+            self._publish()
+        self._on_finished(self)
+
+
+class Gateway:
+    def __init__(self, pool: TemporalClientPool):
+        self.pool = pool
+        self.streams: dict[tuple[str, str | None], AnswerStream] = {}
+
+    def _key(self, handle: WorkflowHandle) -> tuple[str, str | None]:
+        return handle.id, handle.run_id or handle.result_run_id
+
+    def _forget(self, stream: AnswerStream) -> None:
+        key = self._key(stream.handle)
+        if self.streams.get(key) is stream:
+            del self.streams[key]
+
+    async def open(self, request: "AskRequest") -> AnswerStream:
+        handle = await start_query_workflow(
+            self.pool.get(),
+            request.query,
+            freshness_seconds=request.freshness_seconds,
+            scope=request.scope,
+            tenant=request.tenant,
+            priority=request.priority,
+            user_id=request.user_id,
+            session_id=request.session_id,
+        )
+        key = self._key(handle)
+        stream = self.streams.get(key)
+        if stream is None or stream.done or stream.cancelled:
+            stream = self.streams[key] = AnswerStream(handle, self._forget)
+        stream.subscribe()
+        return stream
+
+    def close(self) -> None:
+        for stream in list(self.streams.values()):
+            stream.cancel()
+        self.streams.clear()
+
+
+class AskRequest(BaseModel):
+    query: str = Field(min_length=1)
+    stream: bool = True
+    tenant: str = ""
+    priority: int | None = Field(default=None, ge=1, le=5)
+    scope: str = ""
+    freshness_seconds: float = QUERY_FRESHNESS_SECONDS
+    # Set to answer the query as the next turn of that conversation (never shared).
+    user_id: str = ""
+    session_id: str | None = Field(default=None, min_length=1)
+
+
+def _sse(event: str, data: dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _events(stream: AnswerStream, deadline: float) -> AsyncIterator[str]:
+    loop = asyncio.get_running_loop()
+    yield _sse("workflow", {"workflow_id": stream.handle.id})
+    sent, attempt, seen = "", 0, -1
+    while True:
+        if stream.version != seen:
+            seen = stream.version
+            if stream.attempt != attempt:
+                attempt, sent = stream.attempt, ""
+                yield _sse("reset", {"attempt": attempt})
+            if stream.text.startswith(sent) and len(stream.text) > len(sent):
+                yield _sse("delta", {"text": stream.text[len(sent) :]})
+                sent = stream.text
+            if stream.done:
+                if stream.error is not None:
+                    yield _sse("error", {"error": stream.error})
+                else:
+                    yield _sse("answer", {"answer": stream.answer})
+                return
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            yield _sse("error", {"error": "timeout"})
+            return
+        wait = min(remaining, KEEPALIVE_SECONDS)
+        try:
+            await stream.wait_changed(seen, wait)
+        except asyncio.TimeoutError:
+            if wait == KEEPALIVE_SECONDS:
+                yield ": keep-alive\n\n"
+
+
+class AnswerStreamResponse(StreamingResponse):
+    """SSE response that holds one subscription to `stream` for as long as it runs.
+
+    The subscription is released when the response ends, however it ends: the
+    generator's own cleanup never runs if the client disconnects before the
+    first chunk is pulled, and Starlette skips background tasks on disconnect.
+    """
+
+    def __init__(self, stream: AnswerStream, deadline: float):
+        super().__init__(
+            _events(stream, deadline),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+        self.stream = stream
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.body_iterator.aclose()
+            self.stream.unsubscribe()
+
+
+class AdmissionControl:
+    """ASGI middleware capping in-flight /ask requests, including their streamed bodies."""
+
+    def __init__(
+        self,
+        app,
+        max_requests: int = MAX_REQUESTS,
+        timeout: float = ADMISSION_TIMEOUT_SECONDS,
+    ):
+        self.app = app
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(max_requests)
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith("/ask"):
+            await self.app(scope, receive, send)
+            return
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 503,
+                    "headers": [
+                        (b"content-type", b"application/json"),
+                        (b"retry-after", b"1"),
+                    ],
+                }
+            )
+            await send(
+                {
+                    "type": "http.response.body",
+                    "body": b'{"detail": "Too many requests in flight"}',
+                }
+            )
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self._slots.release()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    app.state.gateway = Gateway(await TemporalClientPool.connect())
+    yield
+    app.state.gateway.close()
+
+
+app = FastAPI(title="RAG agent gateway", lifespan=lifespan)
+app.add_middleware(AdmissionControl)
+
+
+@app.post("/ask")
+async def ask(request: AskRequest):
+    gateway: Gateway = app.state.gateway
+    deadline = asyncio.get_running_loop().time() + REQUEST_TIMEOUT_SECONDS
+    try:
+        stream = await asyncio.wait_for(gateway.open(request), REQUEST_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        raise HTTPException(504, "Timed out starting the workflow") from None
+    except RPCError as e:
+        raise HTTPException(502, f"Temporal: {e.message}") from e
+    if request.stream:
+        return AnswerStreamResponse(stream, deadline)
+    try:
+        remaining = deadline - asyncio.get_running_loop().time()
+        await asyncio.wait_for(stream.wait_done(), max(0.0, remaining))
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            504, f"Timed out waiting for workflow {stream.handle.id}"
+        ) from None
+    finally:
+        stream.unsubscribe()
+    if stream.error is not None:
+        raise HTTPException(502, stream.error)
+    return {"workflow_id": stream.handle.id, "answer": stream.answer}
+
+
+@app.get("/healthz")
+async def healthz() -> dict[str, Any]:
+    gateway: Gateway = app.state.gateway
+    return {"clients": len(gateway.pool.clients), "streams": len(gateway.streams)}
@@ -0,0 +1,274 @@
+"""Types and constants shared by the RAG workflows, activities and clients."""
+
+import hashlib
+from dataclasses import dataclass, field
+
+TASK_QUEUE = "rag-agent-task-queue"
+
+
+@dataclass
+class PartialAnswer:
+    """A batch of answer text streamed from an activity attempt to its workflow."""
+
+    attempt: int
+    text: str
+
+
+@dataclass
+class StreamState:
+    """Answer text received so far, as returned by `RAGAgentWorkflow.partial_answer`."""
+
+    text: str
+    done: bool
+    attempt: int
+
+
+@dataclass
+class HedgePolicy:
+    """Opt-in hedging for `RAGAgentWorkflow`: race a second attempt against a slow first one.
+
+    The hedge starts once the first attempt has run longer than the `percentile`
+    of recent answer latencies (learned by each workflow worker, never below
+    `min_delay_seconds`), or than `delay_seconds` until `min_samples` latencies
+    have been seen or when `percentile` is None. Each workflow worker starts at
+    most `max_per_minute` hedges.
+    """
+
+    delay_seconds: float = 10.0
+    percentile: float | None = 95.0
+    min_samples: int = 20
+    min_delay_seconds: float = 1.0
+    max_per_minute: int = 10
+
+
+@dataclass
+class Conversation:
+    """Makes a `RAGAgentWorkflow` query one turn of a persistent conversation.
+
+    The agent sees the session's earlier turns (see sessions.py), so turns are
+    never coalesced with, or answered from the cache for, other queries.
+    """
+
+    session_id: str
+    user_id: str = "anonymous"
+
+
+RATE_LIMITER_WORKFLOW_ID = "vertex-rate-limiter"
+# Temporal priority keys run from 1 (highest) to 5; unset means 3.
+DEFAULT_PRIORITY = 3
+
+
+@dataclass
+class RateLimitConfig:
+    """Shared quota enforced by `VertexRateLimiterWorkflow` for every worker.
+
+    Permits, one per agent run (see vertex_limiter.py), start at
+    `rate_per_second` with bursts of up to `burst`, and at most
+    `max_concurrent` are held at once. `tenant_max_concurrent` caps individual
+    tenants; others get `default_tenant_max_concurrent` (0 for no cap). A permit
+    not released within `lease_seconds` (e.g. its worker died) is reclaimed.
+    """
+
+    rate_per_second: float
+    burst: int = 1
+    max_concurrent: int = 64
+    tenant_max_concurrent: dict[str, int] = field(default_factory=dict)
+    default_tenant_max_concurrent: int = 0
+    lease_seconds: float = 300.0
+
+
+@dataclass
+class PermitRequest:
+    lease_id: str
+    tenant: str = ""
+    priority: int = DEFAULT_PRIORITY
+
+
+@dataclass
+class Lease:
+    lease_id: str
+    tenant: str
+    expires_at: float
+
+
+@dataclass
+class RateLimiterStatus:
+    config: RateLimitConfig
+    tokens: float
+    in_flight: int
+    waiting: int
+    in_flight_by_tenant: dict[str, int]
+
+
+def query_workflow_id(query: str, scope: str = "", tenant: str = "") -> str:
+    """Workflow ID for answering `query`: identical questions map to the same ID.
+
+    Queries are normalized like `cache.normalize_query` (case and whitespace).
+    Identical queries from different tenants never share an ID; `scope`
+    further separates queries that must not share an answer, e.g. ones asked
+    against different corpora.
+    """
+    normalized = " ".join(query.lower().split())
+    key = f"{tenant}\0{scope}\0{normalized}"
+    digest = hashlib.sha256(key.encode()).hexdigest()[:32]
+    return f"rag-query-{digest}"
+
+
+@dataclass
+class BatchFailure:
+    index: int
+    query: str
+    error: str
+
+
+# Without an output_file, a batch's answers are carried in workflow state and
+# returned in its result, so both have to fit in a history event.
+MAX_INLINE_ANSWERS = 1000
+
+
+@dataclass
+class BatchInput:
+    """Input to `RAGAgentBatchWorkflow`; also carries its checkpoint across continue-as-new.
+
+    Either pass `queries` inline or point `queries_file` at a file readable by
+    the workers (one query per line, or JSON lines with a "query" field).
+    Batches read from `queries_file`, or of more than MAX_INLINE_ANSWERS
+    queries, must set `output_file`, so answers and failures are appended
+    there at each checkpoint instead of being carried in workflow state;
+    without it the workflow fails before answering anything.
+    """
+
+    queries: list[str] = field(default_factory=list)
+    queries_file: str | None = None
+    output_file: str | None = None
+    concurrency: int = 8
+    checkpoint_every: int = 100
+    max_per_run: int = 1000
+    # Checkpoint state, filled in by the workflow.
+    offset: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    answers: dict[int, str] = field(default_factory=dict)
+    failures: list[BatchFailure] = field(default_factory=list)
+
+
+@dataclass
+class BatchProgress:
+    offset: int
+    succeeded: int
+    failed: int
+    in_flight: int
+
+
+@dataclass
+class BatchResult:
+    total: int
+    succeeded: int
+    failed: int
+    failures: list[BatchFailure]
+    answers: dict[int, str]
+    output_file: str | None = None
+
+
+@dataclass
+class QueryWindow:
+    queries_file: str
+    offset: int
+    limit: int
+
+
+@dataclass
+class BatchAnswers:
+    output_file: str
+    answers: dict[int, str]
+    failures: list[BatchFailure]
+
+
+def corpus_ingestion_workflow_id(corpus_name: str) -> str:
+    """One ingestion per corpus at a time: starting a second one fails while the first runs."""
+    return "corpus-ingestion-" + corpus_name.rsplit("/", 1)[-1]
+
+
+@dataclass
+class IngestSource:
+    """A document to ingest: an http(s) URL, or a path readable by the workers."""
+
+    uri: str
+    display_name: str
+    description: str = ""
+
+
+@dataclass
+class IngestFailure:
+    index: int
+    uri: str
+    error: str
+
+
+# Failures kept in an ingestion's state and result; later ones are only counted.
+MAX_REPORTED_INGEST_FAILURES = 100
+
+
+@dataclass
+class IngestInput:
+    """Input to `CorpusIngestionWorkflow`; also carries its checkpoint across continue-as-new.
+
+    Pass `sources` inline or point `sources_file` at a file readable by the
+    workers, with one URL or path per line, or JSON lines with a "url" (or
+    "path") and optional "display_name" and "description". Inline sources
+    are dropped from the input as they are processed, and only the first
+    MAX_REPORTED_INGEST_FAILURES failures are kept, so the checkpoint carried
+    across continue-as-new stays bounded.
+    """
+
+    corpus_name: str
+    sources: list[IngestSource] = field(default_factory=list)
+    sources_file: str | None = None
+    concurrency: int = 8
+    checkpoint_every: int = 200
+    max_per_run: int = 2000
+    # Checkpoint state, filled in by the workflow.
+    offset: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    bytes_ingested: int = 0
+    failures: list[IngestFailure] = field(default_factory=list)
+
+
+@dataclass
+class IngestProgress:
+    offset: int
+    succeeded: int
+    failed: int
+    in_flight: int
+    bytes_ingested: int
+
+
+@dataclass
+class IngestResult:
+    corpus_name: str
+    total: int
+    succeeded: int
+    failed: int
+    bytes_ingested: int
+    failures: list[IngestFailure]
+
+
+@dataclass
+class SourceWindow:
+    sources_file: str
+    offset: int
+    limit: int
+
+
+@dataclass
+class IngestFileInput:
+    corpus_name: str
+    source: IngestSource
+
+
+@dataclass
+class IngestedFile:
+    uri: str
+    rag_file: str | None
+    size: int
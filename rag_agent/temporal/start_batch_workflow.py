@@ -0,0 +1,81 @@
+"""
+Run a list of questions through RAGAgentBatchWorkflow.
+
+    python start_batch_workflow.py --queries-file questions.txt --output-file answers.jsonl
+
+The queries and output files are read and written by the workers, so use
+paths they can reach. Without --queries-file, questions are passed inline.
+Without --output-file, answers come back in the workflow result, which is
+limited to MAX_INLINE_ANSWERS (1000) inline questions; --queries-file always
+needs --output-file.
+"""
+
+import argparse
+import asyncio
+import os
+
+from temporalio.client import Client, WorkflowFailureError
+
+from codec import data_converter
+from shared import MAX_INLINE_ANSWERS, TASK_QUEUE, BatchInput, BatchResult
+
+
+async def main(args):
+    client = await Client.connect("localhost:7233", data_converter=data_converter())
+
+    batch = BatchInput(
+        queries=args.query,
+        queries_file=os.path.abspath(args.queries_file) if args.queries_file else None,
+        output_file=os.path.abspath(args.output_file) if args.output_file else None,
+        concurrency=args.concurrency,
+        checkpoint_every=args.checkpoint_every,
+    )
+    try:
+        result: BatchResult = await client.execute_workflow(
+            "RAGAgentBatchWorkflow",
+            batch,
+            id=args.workflow_id,
+            task_queue=TASK_QUEUE,
+            result_type=BatchResult,
+        )
+    except WorkflowFailureError as e:
+        print("Workflow failed:", e)
+        if e.cause:
+            print("Cause:", e.cause)
+        return
+
+    print(f"\n✅ Succeeded: {result.succeeded}")
+    print(f"❌ Failed: {result.failed}")
+    for failure in result.failures:
+        print(f"   [{failure.index}] {failure.query}: {failure.error}")
+    if result.output_file:
+        print(f"Answers written to {result.output_file}")
+    else:
+        for index, answer in sorted(result.answers.items()):
+            print(f"\n[{index}] {batch.queries[index]}\n{answer}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run a batch of RAG queries on Temporal."
+    )
+    parser.add_argument(
+        "query", nargs="*", help="Questions to ask (ignored with --queries-file)"
+    )
+    parser.add_argument(
+        "--queries-file",
+        help="One question per line, or JSON lines with a 'query' field",
+    )
+    parser.add_argument(
+        "--output-file",
+        help="Append answers as JSON lines here instead of returning them",
+    )
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--checkpoint-every", type=int, default=100)
+    parser.add_argument("--workflow-id", default="rag-agent-batch-workflow-1")
+    args = parser.parse_args()
+    if args.queries_file and not args.output_file:
+        parser.error("--queries-file needs --output-file")
+    if not args.output_file and len(args.query) > MAX_INLINE_ANSWERS:
+        parser.error(f"more than {MAX_INLINE_ANSWERS} questions need --output-file")
+    asyncio.run(main(args))
@@ -0,0 +1,125 @@
+"""
+Ingest documents into a RAG corpus with CorpusIngestionWorkflow.
+
+    python start_ingestion_workflow.py --sources-file urls.txt
+
+Each line of the sources file is a URL or a path readable by the workers, or a
+JSON object with a "url" (or "path") and optional "display_name" and
+"description". Without --sources-file, sources are passed inline. There is one
+ingestion per corpus at a time; if one is already running this attaches to it
+and reports its progress instead of starting another.
+"""
+
+import argparse
+import asyncio
+import os
+
+from dotenv import load_dotenv
+from temporalio.client import Client, WorkflowFailureError
+from temporalio.exceptions import WorkflowAlreadyStartedError
+
+from codec import data_converter
+from shared import (
+    TASK_QUEUE,
+    IngestInput,
+    IngestProgress,
+    IngestResult,
+    IngestSource,
+    corpus_ingestion_workflow_id,
+)
+
+PROGRESS_INTERVAL_SECONDS = 10
+
+
+async def report_progress(handle) -> None:
+    while True:
+        await asyncio.sleep(PROGRESS_INTERVAL_SECONDS)
+        try:
+            progress: IngestProgress = await handle.query(
+                "progress", result_type=IngestProgress
+            )
+        except Exception:
+            continue
+        print(
+            f"... {progress.offset} done, {progress.succeeded} uploaded, {progress.failed} failed, "
+            f"{progress.in_flight} in flight, {progress.bytes_ingested / 1e6:.1f} MB"
+        )
+
+
+async def main(args):
+    client = await Client.connect("localhost:7233", data_converter=data_converter())
+
+    sources = [
+        IngestSource(uri, os.path.basename(uri.rstrip("/")))
+        for uri in (
+            source if "://" in source else os.path.abspath(source)
+            for source in args.source
+        )
+    ]
+    ingest = IngestInput(
+        corpus_name=args.corpus,
+        sources=sources,
+        sources_file=os.path.abspath(args.sources_file) if args.sources_file else None,
+        concurrency=args.concurrency,
+        checkpoint_every=args.checkpoint_every,
+    )
+    workflow_id = corpus_ingestion_workflow_id(args.corpus)
+    try:
+        handle = await client.start_workflow(
+            "CorpusIngestionWorkflow",
+            ingest,
+            id=workflow_id,
+            task_queue=TASK_QUEUE,
+            result_type=IngestResult,
+        )
+        print(f"Started {workflow_id}")
+    except WorkflowAlreadyStartedError:
+        handle = client.get_workflow_handle(workflow_id, result_type=IngestResult)
+        print(f"{workflow_id} is already running; waiting for it instead")
+
+    reporter = asyncio.create_task(report_progress(handle))
+    try:
+        result: IngestResult = await handle.result()
+    except WorkflowFailureError as e:
+        print("Workflow failed:", e)
+        if e.cause:
+            print("Cause:", e.cause)
+        return
+    finally:
+        reporter.cancel()
+
+    print(f"\n✅ Uploaded: {result.succeeded} ({result.bytes_ingested / 1e6:.1f} MB)")
+    print(f"❌ Failed: {result.failed}")
+    for failure in result.failures:
+        print(f"   [{failure.index}] {failure.uri}: {failure.error}")
+    if result.failed > len(result.failures):
+        print(f"   ... and {result.failed - len(result.failures)} more")
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(
+        description="Ingest documents into a RAG corpus on Temporal."
+    )
+    parser.add_argument(
+        "source",
+        nargs="*",
+        help="URLs or worker-readable paths (ignored with --sources-file)",
+    )
+    parser.add_argument(
+        "--sources-file",
+        help="One URL or path per line, or JSON lines with a 'url' or 'path' field",
+    )
+    parser.add_argument(
+        "--corpus",
+        default=os.getenv("RAG_CORPUS"),
+        help="Corpus resource name (default: $RAG_CORPUS)",
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=8, help="Files in flight for this corpus"
+    )
+    parser.add_argument("--checkpoint-every", type=int, default=200)
+    args = parser.parse_args()
+    if not args.corpus:
+        parser.error("--corpus or RAG_CORPUS is required")
+    asyncio.run(main(args))
@@ -1,19 +1,64 @@
+import argparse
 import asyncio
-from temporalio.client import Client
-from temporalio.client import WorkflowFailureError
+import sys
 
+from temporalio.client import Client, WorkflowFailureError
 
-async def main():
-    client = await Client.connect("localhost:7233")
+from coalescing import QUERY_FRESHNESS_SECONDS, start_query_workflow
+from codec import data_converter
+from shared import HedgePolicy, StreamState
+
+POLL_INTERVAL_SECONDS = 0.1
+
+
+async def print_partial_answer(handle) -> None:
+    """Poll the workflow's partial answer and print new text as it arrives."""
+    printed = ""
+    attempt = 0
+    while True:
+        state: StreamState = await handle.query("partial_answer", result_type=StreamState)
+        if state.done:
+            return
+        if state.attempt != attempt:
+            attempt, printed = state.attempt, ""
+            print(f"\n[attempt {attempt}]", flush=True)
+        if state.text.startswith(printed) and len(state.text) > len(printed):
+            sys.stdout.write(state.text[len(printed):])
+            sys.stdout.flush()
+            printed = state.text
+        await asyncio.sleep(POLL_INTERVAL_SECONDS)
+
+
+async def main(args):
+    client = await Client.connect("localhost:7233", data_converter=data_converter())
 
     try:
-        result = await client.execute_workflow(
-            "RAGAgentWorkflow",
-            "Explain how fraud detection works in banking",
-            id="rag-agent-workflow-1",
-            task_queue="rag-agent-task-queue",
+        # Clients asking the same question share one workflow (and one LLM call).
+        hedge = None
+        if args.hedge:
+            hedge = HedgePolicy(
+                delay_seconds=args.hedge_delay,
+                percentile=args.hedge_percentile or None,
+                max_per_minute=args.max_hedges_per_minute,
+            )
+        handle = await start_query_workflow(
+            client,
+            args.query,
+            freshness_seconds=args.freshness_seconds,
+            scope=args.scope,
+            hedge=hedge,
+            tenant=args.tenant,
+            priority=args.priority,
+            user_id=args.user_id,
+            session_id=args.session_id,
         )
-        print("\nFinal Answer:\n", result)
+        print(f"Workflow {handle.id}")
+        streamer = asyncio.create_task(print_partial_answer(handle))
+        try:
+            result = await handle.result()
+        finally:
+            streamer.cancel()
+        print("\n\nFinal Answer:\n", result)
     except WorkflowFailureError as e:
         print("Workflow failed:", e)
         if e.cause:
@@ -21,4 +66,27 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Ask the RAG agent a question through Temporal.")
+    parser.add_argument("query", nargs="?", default="Explain how fraud detection works in banking")
+    parser.add_argument(
+        "--freshness-seconds",
+        type=float,
+        default=QUERY_FRESHNESS_SECONDS,
+        help="Reuse the answer to an identical question completed this recently (default: $RAG_QUERY_FRESHNESS_SECONDS or 0)",
+    )
+    parser.add_argument("--scope", default="", help="Only coalesce with queries sharing this scope (e.g. a corpus); tenants never share")
+    parser.add_argument("--tenant", default="", help="Tenant whose Vertex quota this request uses")
+    parser.add_argument("--session-id", help="Ask as the next turn of this conversation (not coalesced or cached)")
+    parser.add_argument("--user-id", default="", help="Owner of --session-id")
+    parser.add_argument("--priority", type=int, choices=range(1, 6), help="1 (highest) to 5; default 3")
+    parser.add_argument("--hedge", action="store_true", help="Race a second attempt against a slow first one")
+    parser.add_argument(
+        "--hedge-delay", type=float, default=HedgePolicy.delay_seconds,
+        help="Seconds before hedging until enough latencies have been learned",
+    )
+    parser.add_argument(
+        "--hedge-percentile", type=float, default=HedgePolicy.percentile,
+        help="Hedge once the first attempt exceeds this latency percentile (0: always use --hedge-delay)",
+    )
+    parser.add_argument("--max-hedges-per-minute", type=int, default=HedgePolicy.max_per_minute)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,264 @@
+"""
+Run several RAG agent worker processes on rag-agent-task-queue and keep them alive.
+
+One Python process saturates a single core long before the machine is busy,
+so this starts N independent workers (each with its own event loop and SDK
+core), restarts any that exit, and periodically reports the task-queue
+backlog so the process count can be scaled to the load.
+
+    python supervisor.py --workflow-processes 1 --activity-processes 4 \\
+        --max-concurrent-activities 20 --metrics-port 9000
+
+With --metrics-port P the supervisor serves task-queue gauges on P and worker i
+serves the SDK's own metrics (including task slot usage) on P + 1 + i.
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import signal
+import time
+from dataclasses import dataclass
+
+from temporalio.api.enums.v1 import TaskQueueType
+from temporalio.api.taskqueue.v1 import TaskQueue
+from temporalio.api.workflowservice.v1 import DescribeTaskQueueRequest
+from temporalio.client import Client
+from temporalio.runtime import Runtime
+
+from shared import TASK_QUEUE
+from worker import ROLES, add_worker_arguments, connect, metrics_runtime, run_worker
+
+MAX_RESTART_DELAY_SECONDS = 60.0
+# A worker that stayed up this long is considered healthy again.
+STABLE_AFTER_SECONDS = 300.0
+
+
+def _worker_main(
+    role: str,
+    max_concurrent_activities: int | None,
+    max_concurrent_workflow_tasks: int | None,
+    metrics_port: int | None,
+    warm_up: bool = True,
+    otel_metrics_port: int | None = None,
+    otlp_endpoint: str | None = None,
+) -> None:
+    # The supervisor handles Ctrl+C and terminates children itself.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(
+        run_worker(
+            role,
+            max_concurrent_activities,
+            max_concurrent_workflow_tasks,
+            metrics_port,
+            warm_up,
+            otel_metrics_port,
+            otlp_endpoint,
+        )
+    )
+
+
+@dataclass
+class WorkerSlot:
+    index: int
+    role: str
+    metrics_port: int | None
+    otel_metrics_port: int | None = None
+    process: multiprocessing.Process | None = None
+    started_at: float = 0.0
+    restarts: int = 0
+    restart_at: float = 0.0
+
+
+class Supervisor:
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.context = multiprocessing.get_context("spawn")
+        roles = []
+        if args.processes:
+            roles += ["all"] * args.processes
+        roles += ["workflow"] * args.workflow_processes
+        roles += ["activity"] * args.activity_processes
+        if not roles:
+            raise SystemExit(
+                "Nothing to run: set --processes or --workflow/--activity-processes"
+            )
+        self.slots = [
+            WorkerSlot(
+                index=i,
+                role=role,
+                metrics_port=args.metrics_port + 1 + i if args.metrics_port else None,
+                otel_metrics_port=args.otel_metrics_port + i
+                if args.otel_metrics_port
+                else None,
+            )
+            for i, role in enumerate(roles)
+        ]
+        self._stopping = False
+
+    def start(self, slot: WorkerSlot) -> None:
+        slot.process = self.context.Process(
+            target=_worker_main,
+            args=(
+                slot.role,
+                self.args.max_concurrent_activities,
+                self.args.max_concurrent_workflow_tasks,
+                slot.metrics_port,
+                self.args.warm_up,
+                slot.otel_metrics_port,
+                self.args.otlp_endpoint,
+            ),
+            name=f"rag-worker-{slot.index}-{slot.role}",
+            daemon=True,
+        )
+        slot.process.start()
+        slot.started_at = time.monotonic()
+        print(f"Started {slot.process.name} (pid={slot.process.pid})")
+
+    def check(self) -> None:
+        """Restart exited workers with exponential backoff."""
+        now = time.monotonic()
+        for slot in self.slots:
+            if slot.process is not None and slot.process.is_alive():
+                if slot.restarts and now - slot.started_at > STABLE_AFTER_SECONDS:
+                    slot.restarts = 0
+                continue
+            if slot.process is not None:
+                print(
+                    f"⚠️  {slot.process.name} exited with code {slot.process.exitcode}"
+                )
+                delay = min(MAX_RESTART_DELAY_SECONDS, 2.0**slot.restarts)
+                slot.restarts += 1
+                slot.restart_at = now + delay
+                slot.process = None
+            if now >= slot.restart_at:
+                self.start(slot)
+
+    def stop(self) -> None:
+        self._stopping = True
+        for slot in self.slots:
+            if slot.process is not None and slot.process.is_alive():
+                slot.process.terminate()
+        for slot in self.slots:
+            if slot.process is not None:
+                slot.process.join(timeout=10)
+
+    def alive(self) -> int:
+        return sum(
+            1
+            for slot in self.slots
+            if slot.process is not None and slot.process.is_alive()
+        )
+
+    async def supervise(self) -> None:
+        for slot in self.slots:
+            self.start(slot)
+        while not self._stopping:
+            await asyncio.sleep(1.0)
+            self.check()
+
+
+async def report_backlog(
+    client: Client, runtime: Runtime | None, supervisor: Supervisor, interval: float
+) -> None:
+    """Poll the task queue's backlog and export it alongside the live process count."""
+    meter = (runtime or Runtime.default()).metric_meter
+    backlog_gauge = meter.create_gauge(
+        "rag_task_queue_backlog",
+        "Approximate number of tasks waiting on the task queue",
+    )
+    backlog_age_gauge = meter.create_gauge(
+        "rag_task_queue_backlog_age", "Age of the oldest waiting task", "s"
+    )
+    pollers_gauge = meter.create_gauge(
+        "rag_task_queue_pollers", "Pollers seen by the server"
+    )
+    processes_gauge = meter.create_gauge(
+        "rag_worker_processes", "Live worker processes"
+    )
+    queue_types = {
+        "workflow": TaskQueueType.TASK_QUEUE_TYPE_WORKFLOW,
+        "activity": TaskQueueType.TASK_QUEUE_TYPE_ACTIVITY,
+    }
+    while True:
+        summary = []
+        for name, queue_type in queue_types.items():
+            try:
+                resp = await client.workflow_service.describe_task_queue(
+                    DescribeTaskQueueRequest(
+                        namespace=client.namespace,
+                        task_queue=TaskQueue(name=TASK_QUEUE),
+                        task_queue_type=queue_type,
+                        report_stats=True,
+                    )
+                )
+            except Exception as e:
+                print(f"Could not describe {name} task queue: {e}")
+                continue
+            attributes = {"task_queue": TASK_QUEUE, "task_queue_type": name}
+            backlog = resp.stats.approximate_backlog_count
+            age = int(resp.stats.approximate_backlog_age.ToTimedelta().total_seconds())
+            backlog_gauge.set(backlog, attributes)
+            backlog_age_gauge.set(age, attributes)
+            pollers_gauge.set(len(resp.pollers), attributes)
+            summary.append(
+                f"{name}: backlog={backlog} age={age}s pollers={len(resp.pollers)}"
+            )
+        alive = supervisor.alive()
+        processes_gauge.set(alive, {"task_queue": TASK_QUEUE})
+        print(f"[{TASK_QUEUE}] processes={alive} " + " | ".join(summary))
+        await asyncio.sleep(interval)
+
+
+async def main(args: argparse.Namespace) -> None:
+    supervisor = Supervisor(args)
+    runtime = metrics_runtime(args.metrics_port)
+    client = await connect(runtime)
+    tasks = [
+        asyncio.create_task(supervisor.supervise()),
+        asyncio.create_task(
+            report_backlog(client, runtime, supervisor, args.report_interval)
+        ),
+    ]
+
+    def shutdown() -> None:
+        for task in tasks:
+            task.cancel()
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, shutdown)
+    try:
+        await asyncio.gather(*tasks)
+    except asyncio.CancelledError:
+        pass
+    finally:
+        print("Stopping workers...")
+        supervisor.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Supervise multiple RAG agent worker processes."
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=0,
+        help=f"Workers polling both task types (role '{ROLES[0]}')",
+    )
+    parser.add_argument(
+        "--workflow-processes", type=int, default=0, help="Workflow-only workers"
+    )
+    parser.add_argument(
+        "--activity-processes", type=int, default=0, help="Activity-only workers"
+    )
+    parser.add_argument("--metrics-port", type=int, default=None)
+    parser.add_argument(
+        "--report-interval",
+        type=float,
+        default=15.0,
+        help="Seconds between backlog reports",
+    )
+    add_worker_arguments(parser)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,191 @@
+"""Cluster-wide Vertex quota, enforced by `VertexRateLimiterWorkflow`.
+
+`retrieve_and_generate` holds a `vertex_permit()` for each agent run, so the
+limiter admits and caps whole answers, not individual Vertex requests: a
+permit costs one update round trip to the limiter workflow, which is cheap
+next to an answer but not next to each of its model and retrieval calls.
+Size the settings in answers accordingly. An answer usually makes three
+Vertex requests (a model turn that calls the retrieval tool, the retrieval,
+and the model turn that answers), so for a quota of 15 requests per second
+set VERTEX_RATE_PER_SECOND=5. VERTEX_MAX_CONCURRENT and the tenant caps
+count answers in flight.
+
+The tenant and priority come from the Temporal `Priority` the activity
+inherited from its workflow (`fairness_key` and `priority_key`, see
+coalescing.start_query_workflow). The limiter workflow is started on first
+use from the settings below, so every worker on the task queue shares one
+quota:
+
+    VERTEX_RATE_PER_SECOND=5 VERTEX_MAX_CONCURRENT=20 \
+    VERTEX_TENANT_MAX_CONCURRENT="acme=8,globex=4" python temporal/worker.py
+
+Leave VERTEX_RATE_PER_SECOND unset (or 0) to call Vertex without a permit. To
+inspect or change a running limiter:
+
+    python temporal/vertex_limiter.py status
+    python temporal/vertex_limiter.py configure --rate 8 --tenant-limit acme=12
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import asdict
+from pathlib import Path
+
+from temporalio import activity
+from temporalio.client import (
+    Client,
+    WithStartWorkflowOperation,
+    WorkflowUpdateFailedError,
+)
+from temporalio.common import WorkflowIDConflictPolicy
+from temporalio.exceptions import ApplicationError
+
+from codec import data_converter
+from shared import (
+    DEFAULT_PRIORITY,
+    RATE_LIMITER_WORKFLOW_ID,
+    TASK_QUEUE,
+    PermitRequest,
+    RateLimitConfig,
+    RateLimiterStatus,
+)
+
+_root = Path(__file__).resolve().parent.parent
+if str(_root) not in sys.path:
+    sys.path.insert(0, str(_root))
+
+VERTEX_RATE_PER_SECOND = float(os.getenv("VERTEX_RATE_PER_SECOND", 0))
+# Seconds between attempts while the limiter is continuing as new.
+DRAINING_RETRY_SECONDS = 0.2
+
+
+def parse_tenant_limits(value: str) -> dict[str, int]:
+    """ "acme=8,globex=4" -> {"acme": 8, "globex": 4}"""
+    limits = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        tenant, _, limit = item.partition("=")
+        limits[tenant.strip()] = int(limit)
+    return limits
+
+
+def config_from_env() -> RateLimitConfig:
+    return RateLimitConfig(
+        rate_per_second=VERTEX_RATE_PER_SECOND,
+        burst=int(os.getenv("VERTEX_BURST", max(1, int(VERTEX_RATE_PER_SECOND)))),
+        max_concurrent=int(os.getenv("VERTEX_MAX_CONCURRENT", 64)),
+        tenant_max_concurrent=parse_tenant_limits(
+            os.getenv("VERTEX_TENANT_MAX_CONCURRENT", "")
+        ),
+        default_tenant_max_concurrent=int(
+            os.getenv("VERTEX_DEFAULT_TENANT_MAX_CONCURRENT", 0)
+        ),
+    )
+
+
+async def acquire_permit(client: Client, request: PermitRequest) -> float:
+    """Wait for a permit, starting the limiter if needed; returns seconds waited."""
+    while True:
+        start = WithStartWorkflowOperation(
+            "VertexRateLimiterWorkflow",
+            config_from_env(),
+            id=RATE_LIMITER_WORKFLOW_ID,
+            task_queue=TASK_QUEUE,
+            id_conflict_policy=WorkflowIDConflictPolicy.USE_EXISTING,
+        )
+        try:
+            return await client.execute_update_with_start_workflow(
+                "acquire", request, start_workflow_operation=start, result_type=float
+            )
+        except WorkflowUpdateFailedError as e:
+            if not (
+                isinstance(e.cause, ApplicationError)
+                and e.cause.type == "RateLimiterDraining"
+            ):
+                raise
+        await asyncio.sleep(DRAINING_RETRY_SECONDS)
+
+
+@asynccontextmanager
+async def vertex_permit() -> AsyncIterator[None]:
+    """Hold a permit from the shared limiter for the duration of the block (inside an activity).
+
+    One permit covers everything the block sends to Vertex; see the module
+    docstring for sizing the quota in those units.
+    """
+    if VERTEX_RATE_PER_SECOND <= 0:
+        yield
+        return
+    from telemetry import record_stage
+
+    priority = activity.info().priority
+    request = PermitRequest(
+        lease_id=str(uuid.uuid4()),
+        tenant=priority.fairness_key or "",
+        priority=priority.priority_key or DEFAULT_PRIORITY,
+    )
+    client = activity.client()
+    started_ns = time.time_ns()
+    try:
+        await acquire_permit(client, request)
+        record_stage(
+            "rate_limit_wait", started_ns, time.time_ns(), tenant=request.tenant
+        )
+        yield
+    finally:
+        # Also withdraws the request if we were cancelled while waiting.
+        try:
+            await client.get_workflow_handle(RATE_LIMITER_WORKFLOW_ID).signal(
+                "release", request.lease_id
+            )
+        except Exception as e:
+            # The lease expires on its own after lease_seconds.
+            activity.logger.warning(
+                f"Failed to release rate limit lease {request.lease_id}: {e}"
+            )
+
+
+async def main(args) -> None:
+    client = await Client.connect(
+        os.getenv("TEMPORAL_ADDRESS", "localhost:7233"), data_converter=data_converter()
+    )
+    handle = client.get_workflow_handle(RATE_LIMITER_WORKFLOW_ID)
+    if args.command == "configure":
+        status = await handle.query("status", result_type=RateLimiterStatus)
+        config = status.config
+        if args.rate is not None:
+            config.rate_per_second = args.rate
+        if args.burst is not None:
+            config.burst = args.burst
+        if args.max_concurrent is not None:
+            config.max_concurrent = args.max_concurrent
+        config.tenant_max_concurrent.update(
+            parse_tenant_limits(",".join(args.tenant_limit))
+        )
+        await handle.signal("configure", config)
+        print(f"Configured: {asdict(config)}")
+    status = await handle.query("status", result_type=RateLimiterStatus)
+    print(f"Status: {asdict(status)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Inspect or reconfigure the shared Vertex rate limiter."
+    )
+    parser.add_argument("command", choices=["status", "configure"])
+    parser.add_argument("--rate", type=float, help="Requests per second")
+    parser.add_argument("--burst", type=int)
+    parser.add_argument("--max-concurrent", type=int)
+    parser.add_argument(
+        "--tenant-limit",
+        action="append",
+        default=[],
+        metavar="TENANT=N",
+        help="Per-tenant concurrency cap (repeatable); others use $VERTEX_DEFAULT_TENANT_MAX_CONCURRENT",
+    )
+    asyncio.run(main(parser.parse_args()))
@@ -1,24 +1,174 @@
+import argparse
 import asyncio
+import os
+
 from temporalio.client import Client
+from temporalio.runtime import PrometheusConfig, Runtime, TelemetryConfig
 from temporalio.worker import Worker
 
-from workflow import RAGAgentWorkflow
 import activities
+from codec import data_converter
+from interceptors import ActivityTelemetryInterceptor
+from shared import TASK_QUEUE
+from telemetry import setup_telemetry
+from workflow import (
+    CorpusIngestionWorkflow,
+    RAGAgentBatchWorkflow,
+    RAGAgentWorkflow,
+    VertexRateLimiterWorkflow,
+)
 
+TEMPORAL_ADDRESS = os.getenv("TEMPORAL_ADDRESS", "localhost:7233")
+TEMPORAL_NAMESPACE = os.getenv("TEMPORAL_NAMESPACE", "default")
+
+WORKFLOWS = [RAGAgentWorkflow, RAGAgentBatchWorkflow, CorpusIngestionWorkflow, VertexRateLimiterWorkflow]
+ACTIVITIES = [
+    activities.retrieve_and_generate,
+    activities.load_queries,
+    activities.write_batch_answers,
+    activities.load_ingest_sources,
+    activities.ingest_document,
+    activities.finish_corpus_ingestion,
+]
+# Run by RAGAgentWorkflow on the workflow worker itself.
+LOCAL_ACTIVITIES = [
+    activities.plan_hedge,
+    activities.acquire_hedge,
+    activities.record_answer_latency,
+]
+# "all" polls both; split roles let workflow and activity pollers scale independently.
+ROLES = ("all", "workflow", "activity")
+
+
+def metrics_runtime(metrics_port: int | None) -> Runtime | None:
+    """A Temporal runtime serving SDK metrics (slot usage, poll and task latencies) to Prometheus."""
+    if not metrics_port:
+        return None
+    return Runtime(
+        telemetry=TelemetryConfig(
+            metrics=PrometheusConfig(bind_address=f"0.0.0.0:{metrics_port}")
+        )
+    )
 
-async def main():
-    client = await Client.connect("localhost:7233")
 
-    worker = Worker(
+async def connect(runtime: Runtime | None = None) -> Client:
+    return await Client.connect(
+        TEMPORAL_ADDRESS, namespace=TEMPORAL_NAMESPACE, runtime=runtime, data_converter=data_converter()
+    )
+
+
+def build_worker(
+    client: Client,
+    role: str = "all",
+    max_concurrent_activities: int | None = None,
+    max_concurrent_workflow_tasks: int | None = None,
+    trace_temporal: bool = False,
+) -> Worker:
+    if role not in ROLES:
+        raise ValueError(f"role must be one of {ROLES}, got {role!r}")
+    # Only override the SDK's slot defaults when asked to.
+    limits = {}
+    if max_concurrent_activities:
+        limits["max_concurrent_activities"] = max_concurrent_activities
+    if max_concurrent_workflow_tasks:
+        limits["max_concurrent_workflow_tasks"] = max_concurrent_workflow_tasks
+    interceptors = [ActivityTelemetryInterceptor()]
+    if trace_temporal:
+        from temporalio.contrib.opentelemetry import TracingInterceptor
+
+        # Workflow and activity spans, parenting the stage spans inside activities.
+        interceptors.insert(0, TracingInterceptor())
+    worker_activities = []
+    if role in ("all", "activity"):
+        worker_activities += ACTIVITIES
+    if role in ("all", "workflow"):
+        worker_activities += LOCAL_ACTIVITIES
+    return Worker(
         client,
-        task_queue="rag-agent-task-queue",
-        workflows=[RAGAgentWorkflow],
-        activities=[activities.retrieve_and_generate],
+        task_queue=TASK_QUEUE,
+        workflows=WORKFLOWS if role in ("all", "workflow") else [],
+        activities=worker_activities,
+        interceptors=interceptors,
+        # Workflow-only workers run local activities but don't poll for activity tasks.
+        no_remote_activities=role == "workflow",
+        **limits,
     )
 
-    print("Worker started for RAG agent")
+
+async def run_worker(
+    role: str = "all",
+    max_concurrent_activities: int | None = None,
+    max_concurrent_workflow_tasks: int | None = None,
+    metrics_port: int | None = None,
+    warm_up: bool = True,
+    otel_metrics_port: int | None = None,
+    otlp_endpoint: str | None = None,
+) -> None:
+    # Stage metrics from this process (retrieval, model turns, activities);
+    # metrics_port above serves the Temporal SDK's own metrics.
+    setup_telemetry(f"rag-agent-worker-{role}", otel_metrics_port, otlp_endpoint)
+    client = await connect(metrics_runtime(metrics_port))
+    worker = build_worker(
+        client,
+        role,
+        max_concurrent_activities,
+        max_concurrent_workflow_tasks,
+        trace_temporal=bool(otlp_endpoint),
+    )
+    print(f"Worker started for RAG agent (role={role}, pid={os.getpid()})")
+    warming = None
+    if warm_up and role in ("all", "activity"):
+        # Poll straight away and build the agent alongside, instead of making
+        # the first activity (or worker startup) wait for it.
+        warming = asyncio.create_task(asyncio.to_thread(activities.warm_up))
+        warming.add_done_callback(_report_warm_up)
     await worker.run()
 
 
+def _report_warm_up(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        # The first activity will build the agent (and surface the error) instead.
+        print(f"Agent warm-up failed: {task.exception()!r}")
+
+
+def add_worker_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--max-concurrent-activities", type=int, default=None)
+    parser.add_argument("--max-concurrent-workflow-tasks", type=int, default=None)
+    parser.add_argument(
+        "--no-warm-up",
+        dest="warm_up",
+        action="store_false",
+        help="Build the agent on the first activity instead of in the background at startup",
+    )
+    parser.add_argument(
+        "--otel-metrics-port",
+        type=int,
+        default=None,
+        help="Serve per-stage latency and token metrics for Prometheus on this port",
+    )
+    parser.add_argument(
+        "--otlp-endpoint",
+        default=os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT"),
+        help="Push per-stage metrics and spans to this OTLP/gRPC collector (default: $OTEL_EXPORTER_OTLP_ENDPOINT)",
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Run a RAG agent worker.")
+    parser.add_argument("--role", choices=ROLES, default="all")
+    parser.add_argument("--metrics-port", type=int, default=None, help="Serve Prometheus metrics on this port")
+    add_worker_arguments(parser)
+    args = parser.parse_args()
+    await run_worker(
+        role=args.role,
+        max_concurrent_activities=args.max_concurrent_activities,
+        max_concurrent_workflow_tasks=args.max_concurrent_workflow_tasks,
+        metrics_port=args.metrics_port,
+        warm_up=args.warm_up,
+        otel_metrics_port=args.otel_metrics_port,
+        otlp_endpoint=args.otlp_endpoint,
+    )
+
+
 if __name__ == "__main__":
     asyncio.run(main())
@@ -1,25 +1,496 @@
+import asyncio
 from datetime import timedelta
+
 from temporalio import workflow
 from temporalio.common import RetryPolicy
+from temporalio.exceptions import ActivityError, ApplicationError
 
 with workflow.unsafe.imports_passed_through():
-    from activities import retrieve_and_generate
+    from activities import (
+        acquire_hedge,
+        finish_corpus_ingestion,
+        ingest_document,
+        load_ingest_sources,
+        load_queries,
+        plan_hedge,
+        record_answer_latency,
+        retrieve_and_generate,
+        write_batch_answers,
+    )
+    from shared import (
+        MAX_INLINE_ANSWERS,
+        MAX_REPORTED_INGEST_FAILURES,
+        BatchAnswers,
+        BatchFailure,
+        BatchInput,
+        BatchProgress,
+        BatchResult,
+        Conversation,
+        HedgePolicy,
+        IngestFailure,
+        IngestFileInput,
+        IngestInput,
+        IngestProgress,
+        IngestResult,
+        IngestSource,
+        Lease,
+        PartialAnswer,
+        PermitRequest,
+        QueryWindow,
+        RateLimitConfig,
+        RateLimiterStatus,
+        SourceWindow,
+        StreamState,
+    )
+
+RAG_ACTIVITY_TIMEOUT = timedelta(seconds=120)
+RAG_RETRY_POLICY = RetryPolicy(
+    maximum_attempts=3,
+    initial_interval=timedelta(seconds=2),
+    backoff_coefficient=2.0,
+)
+# Hedged attempts heartbeat so the losing one can be cancelled.
+RAG_HEARTBEAT_TIMEOUT = timedelta(seconds=30)
+LOCAL_ACTIVITY_TIMEOUT = timedelta(seconds=5)
+# Large documents can take many minutes to embed; heartbeats catch hung attempts sooner.
+INGEST_ACTIVITY_TIMEOUT = timedelta(minutes=30)
+INGEST_HEARTBEAT_TIMEOUT = timedelta(minutes=2)
+INGEST_RETRY_POLICY = RetryPolicy(
+    maximum_attempts=5,
+    initial_interval=timedelta(seconds=5),
+    backoff_coefficient=2.0,
+    maximum_interval=timedelta(minutes=5),
+)
 
 
 @workflow.defn
 class RAGAgentWorkflow:
 
+    def __init__(self) -> None:
+        self._chunks: list[str] = []
+        self._attempt = 0
+        self._done = False
+
     @workflow.run
-    async def run(self, query: str) -> str:
-        result = await workflow.execute_activity(
+    async def run(
+        self,
+        query: str,
+        hedge: HedgePolicy | None = None,
+        conversation: Conversation | None = None,
+    ) -> str:
+        # A hedge would run the same conversation turn twice, so turns aren't hedged.
+        if hedge is None or conversation is not None:
+            result = await workflow.execute_activity(
+                retrieve_and_generate,
+                args=[query, True, conversation],
+                start_to_close_timeout=RAG_ACTIVITY_TIMEOUT,
+                retry_policy=RAG_RETRY_POLICY,
+            )
+        else:
+            result = await self._run_hedged(query, hedge)
+
+        self._chunks = [result]
+        self._done = True
+        return result
+
+    async def _run_hedged(self, query: str, policy: HedgePolicy) -> str:
+        """Start a second attempt if the first is slow; return whichever answers first."""
+        started = workflow.time()
+        delay = await workflow.execute_local_activity(
+            plan_hedge, policy, start_to_close_timeout=LOCAL_ACTIVITY_TIMEOUT
+        )
+        attempts = [self._start_answer(query, stream=True)]
+        done, _ = await workflow.wait(attempts, timeout=delay)
+        if not done and await workflow.execute_local_activity(
+            acquire_hedge, policy, start_to_close_timeout=LOCAL_ACTIVITY_TIMEOUT
+        ):
+            # The hedge doesn't stream: its partial answers would interleave with the first's.
+            attempts.append(self._start_answer(query, stream=False))
+
+        pending = list(attempts)
+        while pending:
+            await workflow.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for attempt in [attempt for attempt in pending if attempt.done()]:
+                pending.remove(attempt)
+                if attempt.exception() is None:
+                    for loser in pending:
+                        loser.cancel()
+                    await workflow.execute_local_activity(
+                        record_answer_latency,
+                        workflow.time() - started,
+                        start_to_close_timeout=LOCAL_ACTIVITY_TIMEOUT,
+                    )
+                    return attempt.result()
+        # Every attempt failed; report the first one's error.
+        raise attempts[0].exception()
+
+    def _start_answer(self, query: str, stream: bool) -> workflow.ActivityHandle[str]:
+        return workflow.start_activity(
             retrieve_and_generate,
-            query,
-            start_to_close_timeout=timedelta(seconds=120),
-            retry_policy=RetryPolicy(
-                maximum_attempts=3,
-                initial_interval=timedelta(seconds=2),
-                backoff_coefficient=2.0,
-            ),
+            args=[query, stream],
+            start_to_close_timeout=RAG_ACTIVITY_TIMEOUT,
+            heartbeat_timeout=RAG_HEARTBEAT_TIMEOUT,
+            retry_policy=RAG_RETRY_POLICY,
         )
 
-        return result
+    @workflow.signal
+    def publish_partial(self, partial: PartialAnswer) -> None:
+        # A retried attempt regenerates the answer from scratch.
+        if partial.attempt > self._attempt:
+            self._attempt = partial.attempt
+            self._chunks = []
+        if partial.attempt == self._attempt and not self._done:
+            self._chunks.append(partial.text)
+
+    @workflow.query
+    def partial_answer(self) -> StreamState:
+        return StreamState(text="".join(self._chunks), done=self._done, attempt=self._attempt)
+
+
+@workflow.defn
+class RAGAgentBatchWorkflow:
+    """Answers a list of queries with at most `concurrency` activities in flight.
+
+    Queries are processed in windows of `checkpoint_every`; after each window the
+    offset and counters are updated (and answers flushed to `output_file` when
+    set). After `max_per_run` queries, or when the server suggests it, the
+    workflow continues as new from that checkpoint so history stays bounded.
+    """
+
+    def __init__(self) -> None:
+        self._batch: BatchInput | None = None
+        self._in_flight = 0
+
+    @workflow.run
+    async def run(self, batch: BatchInput) -> BatchResult:
+        self._batch = batch
+        processed = 0
+        self._check_output(batch)
+        while True:
+            window = await self._next_window(batch)
+            if not window:
+                break
+            answers, failures = await self._run_window(batch, window)
+            if batch.output_file:
+                await workflow.execute_activity(
+                    write_batch_answers,
+                    BatchAnswers(batch.output_file, answers, failures),
+                    start_to_close_timeout=timedelta(seconds=60),
+                )
+            else:
+                batch.answers.update(answers)
+                batch.failures.extend(failures)
+            batch.succeeded += len(answers)
+            batch.failed += len(failures)
+            batch.offset += len(window)
+            processed += len(window)
+            if len(window) < batch.checkpoint_every:
+                break
+            if processed >= batch.max_per_run or workflow.info().is_continue_as_new_suggested():
+                workflow.continue_as_new(batch)
+
+        return BatchResult(
+            total=batch.offset,
+            succeeded=batch.succeeded,
+            failed=batch.failed,
+            failures=batch.failures,
+            answers=batch.answers,
+            output_file=batch.output_file,
+        )
+
+    @workflow.query
+    def progress(self) -> BatchProgress:
+        batch = self._batch
+        if batch is None:
+            return BatchProgress(offset=0, succeeded=0, failed=0, in_flight=0)
+        return BatchProgress(
+            offset=batch.offset,
+            succeeded=batch.succeeded,
+            failed=batch.failed,
+            in_flight=self._in_flight,
+        )
+
+    @staticmethod
+    def _check_output(batch: BatchInput) -> None:
+        """Fail before answering queries whose answers the workflow's state and result can't carry."""
+        if batch.output_file:
+            return
+        if batch.queries_file:
+            # The file's length is unknown until it has been read (and answered).
+            raise ApplicationError(
+                "Batches read from a queries_file need an output_file for their answers",
+                type="BatchTooLarge",
+                non_retryable=True,
+            )
+        if len(batch.queries) > MAX_INLINE_ANSWERS:
+            raise ApplicationError(
+                f"Batches of more than {MAX_INLINE_ANSWERS} queries need an output_file for their answers",
+                type="BatchTooLarge",
+                non_retryable=True,
+            )
+
+    async def _next_window(self, batch: BatchInput) -> list[str]:
+        if batch.queries_file:
+            return await workflow.execute_activity(
+                load_queries,
+                QueryWindow(batch.queries_file, batch.offset, batch.checkpoint_every),
+                start_to_close_timeout=timedelta(seconds=60),
+            )
+        return batch.queries[batch.offset:batch.offset + batch.checkpoint_every]
+
+    async def _run_window(
+        self, batch: BatchInput, window: list[str]
+    ) -> tuple[dict[int, str], list[BatchFailure]]:
+        semaphore = asyncio.Semaphore(max(1, batch.concurrency))
+        answers: dict[int, str] = {}
+        failures: list[BatchFailure] = []
+
+        async def answer(index: int, query: str) -> None:
+            async with semaphore:
+                self._in_flight += 1
+                try:
+                    answers[index] = await workflow.execute_activity(
+                        retrieve_and_generate,
+                        query,
+                        start_to_close_timeout=RAG_ACTIVITY_TIMEOUT,
+                        retry_policy=RAG_RETRY_POLICY,
+                    )
+                except ActivityError as e:
+                    failures.append(BatchFailure(index, query, str(e.cause or e)))
+                finally:
+                    self._in_flight -= 1
+
+        await asyncio.gather(
+            *(answer(batch.offset + i, query) for i, query in enumerate(window))
+        )
+        failures.sort(key=lambda failure: failure.index)
+        return answers, failures
+
+
+@workflow.defn
+class CorpusIngestionWorkflow:
+    """Downloads and uploads documents into a RAG corpus with at most `concurrency` files in flight.
+
+    Each file is its own `ingest_document` activity, retried independently, so
+    a backfill spreads across every activity worker on the task queue. Sources
+    are processed in windows of `checkpoint_every` and the workflow continues
+    as new after `max_per_run` of them, so a 50k-document backfill keeps a
+    bounded history and resumes from its last checkpoint after a crash.
+    """
+
+    def __init__(self) -> None:
+        self._ingest: IngestInput | None = None
+        self._in_flight = 0
+
+    @workflow.run
+    async def run(self, ingest: IngestInput) -> IngestResult:
+        self._ingest = ingest
+        processed = 0
+        while True:
+            window = await self._next_window(ingest)
+            if not window:
+                break
+            await self._run_window(ingest, window)
+            if not ingest.sources_file:
+                del ingest.sources[:len(window)]
+            ingest.offset += len(window)
+            processed += len(window)
+            if len(window) < ingest.checkpoint_every:
+                break
+            if processed >= ingest.max_per_run or workflow.info().is_continue_as_new_suggested():
+                workflow.continue_as_new(ingest)
+
+        if ingest.succeeded:
+            await workflow.execute_activity(
+                finish_corpus_ingestion,
+                ingest.corpus_name,
+                start_to_close_timeout=timedelta(seconds=30),
+            )
+        return IngestResult(
+            corpus_name=ingest.corpus_name,
+            total=ingest.offset,
+            succeeded=ingest.succeeded,
+            failed=ingest.failed,
+            bytes_ingested=ingest.bytes_ingested,
+            failures=ingest.failures,
+        )
+
+    @workflow.query
+    def progress(self) -> IngestProgress:
+        ingest = self._ingest
+        if ingest is None:
+            return IngestProgress(offset=0, succeeded=0, failed=0, in_flight=0, bytes_ingested=0)
+        return IngestProgress(
+            offset=ingest.offset,
+            succeeded=ingest.succeeded,
+            failed=ingest.failed,
+            in_flight=self._in_flight,
+            bytes_ingested=ingest.bytes_ingested,
+        )
+
+    async def _next_window(self, ingest: IngestInput) -> list[IngestSource]:
+        if ingest.sources_file:
+            return await workflow.execute_activity(
+                load_ingest_sources,
+                SourceWindow(ingest.sources_file, ingest.offset, ingest.checkpoint_every),
+                start_to_close_timeout=timedelta(seconds=60),
+            )
+        # Processed inline sources have already been dropped (see `run`).
+        return ingest.sources[:ingest.checkpoint_every]
+
+    async def _run_window(self, ingest: IngestInput, window: list[IngestSource]) -> None:
+        semaphore = asyncio.Semaphore(max(1, ingest.concurrency))
+        failures: list[IngestFailure] = []
+
+        async def ingest_one(index: int, source: IngestSource) -> None:
+            async with semaphore:
+                self._in_flight += 1
+                try:
+                    ingested = await workflow.execute_activity(
+                        ingest_document,
+                        IngestFileInput(ingest.corpus_name, source),
+                        start_to_close_timeout=INGEST_ACTIVITY_TIMEOUT,
+                        heartbeat_timeout=INGEST_HEARTBEAT_TIMEOUT,
+                        retry_policy=INGEST_RETRY_POLICY,
+                    )
+                    ingest.succeeded += 1
+                    ingest.bytes_ingested += ingested.size
+                except ActivityError as e:
+                    failures.append(IngestFailure(index, source.uri, str(e.cause or e)))
+                    ingest.failed += 1
+                finally:
+                    self._in_flight -= 1
+
+        await asyncio.gather(
+            *(ingest_one(ingest.offset + i, source) for i, source in enumerate(window))
+        )
+        failures.sort(key=lambda failure: failure.index)
+        room = MAX_REPORTED_INGEST_FAILURES - len(ingest.failures)
+        ingest.failures.extend(failures[:max(0, room)])
+
+
+@workflow.defn
+class VertexRateLimiterWorkflow:
+    """Long-running token bucket and concurrency limiter shared by every worker.
+
+    Activities call the `acquire` update (with update-with-start, see
+    vertex_limiter.py) before calling Vertex and signal `release` afterwards.
+    Waiting requests are granted by priority, then in arrival order, skipping
+    tenants that are at their concurrency cap, so one busy tenant can't starve
+    the rest and throughput stays at the quota instead of bouncing off
+    ResourceExhausted and retry backoff.
+    """
+
+    def __init__(self) -> None:
+        self._config: RateLimitConfig | None = None
+        self._tokens = 0.0
+        self._refilled_at = 0.0
+        self._leases: dict[str, Lease] = {}
+        # lease_id -> (priority, arrival, request)
+        self._waiting: dict[str, tuple[int, int, PermitRequest]] = {}
+        self._arrivals = 0
+        self._changed = False
+        self._draining = False
+
+    @workflow.run
+    async def run(self, config: RateLimitConfig, leases: list[Lease] | None = None) -> None:
+        self._config = config
+        self._tokens = float(config.burst)
+        self._refilled_at = workflow.now().timestamp()
+        self._leases = {lease.lease_id: lease for lease in leases or []}
+        while True:
+            self._grant()
+            if workflow.info().is_continue_as_new_suggested():
+                self._draining = True
+            if self._draining and not self._waiting and workflow.all_handlers_finished():
+                workflow.continue_as_new(args=[self._config, list(self._leases.values())])
+            self._changed = False
+            try:
+                await workflow.wait_condition(lambda: self._changed, timeout=self._next_wakeup())
+            except asyncio.TimeoutError:
+                pass
+
+    @workflow.update
+    async def acquire(self, request: PermitRequest) -> float:
+        """Wait for a permit; returns the seconds spent waiting."""
+        requested_at = workflow.now().timestamp()
+        self._arrivals += 1
+        self._waiting[request.lease_id] = (request.priority, self._arrivals, request)
+        self._changed = True
+        await workflow.wait_condition(lambda: request.lease_id not in self._waiting)
+        return workflow.now().timestamp() - requested_at
+
+    @acquire.validator
+    def _validate_acquire(self, request: PermitRequest) -> None:
+        if self._draining:
+            # Nothing is admitted while the workflow drains to continue as new;
+            # the caller retries and lands on the next run.
+            raise ApplicationError("Rate limiter is continuing as new", type="RateLimiterDraining")
+
+    @workflow.signal
+    def release(self, lease_id: str) -> None:
+        """Return a permit, or give up on one still waiting."""
+        self._leases.pop(lease_id, None)
+        self._waiting.pop(lease_id, None)
+        self._changed = True
+
+    @workflow.signal
+    def configure(self, config: RateLimitConfig) -> None:
+        self._config = config
+        self._tokens = min(self._tokens, float(config.burst))
+        self._changed = True
+
+    @workflow.query
+    def status(self) -> RateLimiterStatus:
+        by_tenant: dict[str, int] = {}
+        for lease in self._leases.values():
+            by_tenant[lease.tenant] = by_tenant.get(lease.tenant, 0) + 1
+        return RateLimiterStatus(
+            config=self._config,
+            tokens=self._tokens,
+            in_flight=len(self._leases),
+            waiting=len(self._waiting),
+            in_flight_by_tenant=by_tenant,
+        )
+
+    def _tenant_limit(self, tenant: str) -> int:
+        config = self._config
+        return config.tenant_max_concurrent.get(tenant, config.default_tenant_max_concurrent)
+
+    def _grant(self) -> None:
+        config = self._config
+        now = workflow.now().timestamp()
+        self._tokens = min(
+            float(config.burst), self._tokens + (now - self._refilled_at) * config.rate_per_second
+        )
+        self._refilled_at = now
+        for lease_id in [lease_id for lease_id, lease in self._leases.items() if lease.expires_at <= now]:
+            workflow.logger.warning(f"Reclaiming expired rate limit lease {lease_id}")
+            del self._leases[lease_id]
+
+        in_flight: dict[str, int] = {}
+        for lease in self._leases.values():
+            in_flight[lease.tenant] = in_flight.get(lease.tenant, 0) + 1
+        for _priority, _arrival, request in sorted(self._waiting.values(), key=lambda w: w[:2]):
+            if self._tokens < 1 or len(self._leases) >= config.max_concurrent:
+                break
+            limit = self._tenant_limit(request.tenant)
+            if limit and in_flight.get(request.tenant, 0) >= limit:
+                continue
+            self._tokens -= 1
+            in_flight[request.tenant] = in_flight.get(request.tenant, 0) + 1
+            self._leases[request.lease_id] = Lease(request.lease_id, request.tenant, now + config.lease_seconds)
+            del self._waiting[request.lease_id]
+
+    def _next_wakeup(self) -> timedelta | None:
+        """When tokens refill for a waiting request or the next lease expires."""
+        config = self._config
+        delays = []
+        if self._waiting and self._tokens < 1 and config.rate_per_second > 0:
+            delays.append((1 - self._tokens) / config.rate_per_second)
+        if self._leases:
+            now = workflow.now().timestamp()
+            delays.append(min(lease.expires_at for lease in self._leases.values()) - now)
+        if not delays:
+            return None
+        return timedelta(seconds=max(0.01, min(delays)))
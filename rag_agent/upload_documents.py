@@ -3,12 +3,18 @@ Simple script to upload documents to your RAG corpus.
 Place your PDF/TXT files in the 'data/' folder and run this script.
 """
 
+import argparse
 import os
 from dotenv import load_dotenv
 import vertexai
-from vertexai.preview import rag
 from google.auth import default
 
+from cache import mark_corpus_changed
+from catalog import get_catalog
+from shared_libraries.corpus_sync import SyncManifest, SyncSource, apply_sync, plan_sync
+from shared_libraries.pdf_text import PdfPreprocessor
+from shared_libraries.uploader import ConcurrentUploader, UploadJob, print_result
+
 # Load environment variables
 load_dotenv()
 
@@ -23,8 +29,18 @@ vertexai.init(project=PROJECT_ID, location=LOCATION, credentials=credentials)
 # Directory containing documents to upload
 DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
 
-def upload_documents():
-    """Upload all PDF and TXT files from the data/ directory."""
+def upload_documents(workers=4, rate=2.0, sync=False, extract_pdfs=True, extract_workers=None):
+    """Upload all PDF and TXT files from the data/ directory.
+
+    Up to `workers` uploads run at once, starting at `rate` uploads per second;
+    the rate adapts when the embedding quota is hit (ResourceExhausted or HTTP 429).
+
+    With `extract_pdfs`, PDFs are extracted and chunked locally on
+    `extract_workers` processes (one per core by default) and uploaded as text.
+
+    With `sync`, only files that are new or changed since the last sync are
+    uploaded, and RagFiles for files removed from data/ are deleted.
+    """
     if not os.path.exists(DATA_DIR):
         os.makedirs(DATA_DIR)
         print(f"Created {DATA_DIR} directory. Please add your documents there.")
@@ -37,31 +53,80 @@ def upload_documents():
         print("Please add some documents and run this script again.")
         return
     
-    print(f"Found {len(files)} files to upload...")
-    
-    for filename in files:
-        file_path = os.path.join(DATA_DIR, filename)
-        print(f"\nUploading {filename}...")
-        
-        try:
-            rag_file = rag.upload_file(
-                corpus_name=CORPUS_NAME,
-                path=file_path,
-                display_name=filename,
-                description=f"Uploaded from {filename}"
-            )
-            print(f"✅ Successfully uploaded {filename}")
-        except Exception as e:
-            print(f"❌ Error uploading {filename}: {e}")
+    catalog = get_catalog()
+    preprocessor = PdfPreprocessor(extract_workers) if extract_pdfs else None
+    uploader = ConcurrentUploader(
+        CORPUS_NAME, workers=workers, rate=rate, catalog=catalog, pdf_preprocessor=preprocessor
+    )
+    try:
+        if sync:
+            sync_documents(files, uploader, catalog)
+            return
+        upload_all(files, uploader, workers, rate)
+    finally:
+        if preprocessor is not None:
+            preprocessor.close()
     
-    # List all files in corpus
+    # List all files in corpus (from the local catalog; re-listed remotely only when stale)
     print("\n" + "="*50)
     print("Files in corpus:")
     print("="*50)
-    files = list(rag.list_files(corpus_name=CORPUS_NAME))
+    catalog.refresh_files(CORPUS_NAME)
+    files = catalog.list_files(CORPUS_NAME)
     for i, file in enumerate(files, 1):
         print(f"{i}. {file.display_name}")
     print(f"\nTotal: {len(files)} files")
 
+def upload_all(files, uploader, workers, rate):
+    """Upload every file in data/."""
+    print(f"Found {len(files)} files to upload ({workers} workers, starting at {rate} files/s)...")
+    
+    jobs = [
+        UploadJob(
+            path=os.path.join(DATA_DIR, filename),
+            display_name=filename,
+            description=f"Uploaded from {filename}",
+        )
+        for filename in files
+    ]
+    report = uploader.run(jobs, on_result=print_result)
+    report.print_summary()
+    
+    if report.succeeded:
+        # Drop answers and retrieval results cached against the old corpus contents
+        mark_corpus_changed(CORPUS_NAME)
+
+def sync_documents(files, uploader, catalog=None):
+    """Bring the corpus in line with data/, uploading only the delta."""
+    manifest = SyncManifest.load(CORPUS_NAME)
+    sources = [
+        SyncSource(
+            key=filename,
+            path=os.path.join(DATA_DIR, filename),
+            display_name=filename,
+            description=f"Uploaded from {filename}",
+        )
+        for filename in files
+    ]
+    plan = plan_sync(manifest, sources)
+    print(f"Sync plan: {plan.summary()}")
+    report = apply_sync(plan, manifest, uploader, on_result=print_result, catalog=catalog)
+    report.print_summary()
+    if report.changed_corpus:
+        mark_corpus_changed(CORPUS_NAME)
+
 if __name__ == "__main__":
-    upload_documents()
+    parser = argparse.ArgumentParser(description="Upload the files in data/ to the RAG corpus.")
+    parser.add_argument("--workers", type=int, default=4, help="Uploads in flight at once")
+    parser.add_argument("--rate", type=float, default=2.0, help="Initial uploads per second (adapts to quota)")
+    parser.add_argument("--sync", action="store_true", help="Only upload new/changed files and delete removed ones")
+    parser.add_argument("--raw-pdf", action="store_true", help="Upload PDFs as is instead of their extracted text")
+    parser.add_argument("--extract-workers", type=int, help="Processes extracting PDF text (default: one per core)")
+    args = parser.parse_args()
+    upload_documents(
+        workers=args.workers,
+        rate=args.rate,
+        sync=args.sync,
+        extract_pdfs=not args.raw_pdf,
+        extract_workers=args.extract_workers,
+    )
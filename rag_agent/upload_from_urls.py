@@ -1,16 +1,23 @@
 """
 Upload documents to RAG corpus from URLs.
 This script downloads PDFs from public URLs and uploads them to the corpus.
+Downloads and uploads overlap: each file is uploaded as soon as it has been
+downloaded. Pass --urls-file to read the URLs from a file instead of
+DOCUMENT_URLS.
 """
 
+import argparse
 import os
 from dotenv import load_dotenv
 import vertexai
-from vertexai.preview import rag
 from google.auth import default
-import requests
 import tempfile
 
+from cache import mark_corpus_changed
+from catalog import get_catalog
+from shared_libraries.pdf_text import PdfPreprocessor
+from shared_libraries.url_ingest import add_ingest_arguments, documents_from_args, ingest_urls
+
 # Load environment variables
 load_dotenv()
 
@@ -22,7 +29,7 @@ CORPUS_NAME = os.getenv("RAG_CORPUS")
 credentials, _ = default()
 vertexai.init(project=PROJECT_ID, location=LOCATION, credentials=credentials)
 
-# List of URLs to download and upload
+# List of URLs to download and upload when no --urls-file is given
 # Add your document URLs here
 DOCUMENT_URLS = [
     {
@@ -38,103 +45,57 @@ DOCUMENT_URLS = [
     # },
 ]
 
-def download_from_url(url, output_path):
-    """Download a file from URL with proper headers to avoid 403 errors."""
-    print(f"Downloading from {url}...")
-    
-    # Add headers to mimic a browser request
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-        'Accept': 'application/pdf,application/octet-stream,*/*',
-        'Accept-Language': 'en-US,en;q=0.9',
-        'Referer': url,
-    }
-    
-    try:
-        response = requests.get(url, headers=headers, stream=True, timeout=30)
-        response.raise_for_status()
-        
-        with open(output_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
-        
-        print(f"✅ Downloaded successfully")
-        return True
-    except requests.exceptions.HTTPError as e:
-        print(f"❌ HTTP Error {e.response.status_code}: {e}")
-        return False
-    except Exception as e:
-        print(f"❌ Download failed: {e}")
-        return False
-
-def upload_to_corpus(file_path, display_name, description):
-    """Upload a file to the RAG corpus."""
-    print(f"Uploading {display_name} to corpus...")
-    
-    try:
-        rag_file = rag.upload_file(
-            corpus_name=CORPUS_NAME,
-            path=file_path,
-            display_name=display_name,
-            description=description
-        )
-        print(f"✅ Successfully uploaded {display_name}")
-        return True
-    except Exception as e:
-        print(f"❌ Upload failed: {e}")
-        return False
 
-def main():
+def main(args):
     """Download documents from URLs and upload to corpus."""
     print(f"Corpus: {CORPUS_NAME}")
     print(f"Project: {PROJECT_ID}")
     print(f"Location: {LOCATION}")
     print("="*60)
     
-    if not DOCUMENT_URLS:
+    if not DOCUMENT_URLS and not args.urls_file:
         print("⚠️  No URLs configured!")
-        print("Please edit this script and add your document URLs to the DOCUMENT_URLS list.")
+        print("Please add your document URLs to the DOCUMENT_URLS list or pass --urls-file.")
         return
     
-    success_count = 0
-    fail_count = 0
-    
+    catalog = get_catalog()
+    preprocessor = None if args.raw_pdf else PdfPreprocessor(args.extract_workers)
     with tempfile.TemporaryDirectory() as temp_dir:
-        for doc in DOCUMENT_URLS:
-            url = doc["url"]
-            display_name = doc["display_name"]
-            description = doc.get("description", "")
-            
-            print(f"\n📄 Processing: {display_name}")
-            print(f"   URL: {url}")
-            
-            # Download to temp file
-            temp_file = os.path.join(temp_dir, display_name)
-            
-            if download_from_url(url, temp_file):
-                if upload_to_corpus(temp_file, display_name, description):
-                    success_count += 1
-                else:
-                    fail_count += 1
-            else:
-                fail_count += 1
+        try:
+            report = ingest_urls(
+                CORPUS_NAME,
+                documents_from_args(args, DOCUMENT_URLS),
+                temp_dir,
+                download_workers=args.download_workers,
+                upload_workers=args.upload_workers,
+                rate=args.rate,
+                max_temp_bytes=args.max_temp_mb * 1024 * 1024,
+                sync=args.sync,
+                catalog=catalog,
+                pdf_preprocessor=preprocessor,
+            )
+        finally:
+            if preprocessor is not None:
+                preprocessor.close()
+    
+    if report.changed_corpus:
+        # Drop answers and retrieval results cached against the old corpus contents
+        mark_corpus_changed(CORPUS_NAME)
     
-    # List all files in corpus
+    # List all files in corpus (from the local catalog; re-listed remotely only when stale)
     print("\n" + "="*60)
     print("📚 Files currently in corpus:")
     print("="*60)
     try:
-        files = list(rag.list_files(corpus_name=CORPUS_NAME))
+        catalog.refresh_files(CORPUS_NAME)
+        files = catalog.list_files(CORPUS_NAME)
         for i, file in enumerate(files, 1):
             print(f"{i}. {file.display_name}")
         print(f"\nTotal: {len(files)} files")
     except Exception as e:
         print(f"Error listing files: {e}")
-    
-    print("\n" + "="*60)
-    print(f"✅ Successful uploads: {success_count}")
-    print(f"❌ Failed uploads: {fail_count}")
-    print("="*60)
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Download documents from URLs and upload them to the RAG corpus.")
+    add_ingest_arguments(parser)
+    main(parser.parse_args())
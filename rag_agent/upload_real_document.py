@@ -2,14 +2,18 @@
 Upload real documents to RAG corpus from URLs.
 """
 
+import argparse
 import os
 from dotenv import load_dotenv
 import vertexai
-from vertexai.preview import rag
 from google.auth import default
-import requests
 import tempfile
 
+from cache import mark_corpus_changed
+from catalog import get_catalog
+from shared_libraries.pdf_text import PdfPreprocessor
+from shared_libraries.url_ingest import add_ingest_arguments, documents_from_args, ingest_urls
+
 # Load environment variables
 load_dotenv()
 
@@ -30,87 +34,48 @@ DOCUMENT_URLS = [
     },
 ]
 
-def download_from_url(url, output_path):
-    """Download a file from URL."""
-    print(f"Downloading from {url}...")
-    
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-    }
-    
-    try:
-        response = requests.get(url, headers=headers, stream=True, timeout=60)
-        response.raise_for_status()
-        
-        with open(output_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
-        
-        print(f"✅ Downloaded successfully")
-        return True
-    except Exception as e:
-        print(f"❌ Download failed: {e}")
-        return False
-
-def upload_to_corpus(file_path, display_name, description):
-    """Upload a file to the RAG corpus."""
-    print(f"Uploading {display_name} to corpus...")
-    
-    try:
-        rag_file = rag.upload_file(
-            corpus_name=CORPUS_NAME,
-            path=file_path,
-            display_name=display_name,
-            description=description
-        )
-        print(f"✅ Successfully uploaded {display_name}")
-        return True
-    except Exception as e:
-        print(f"❌ Upload failed: {e}")
-        return False
-
-def main():
+def main(args):
     print(f"Corpus: {CORPUS_NAME}")
     print("="*60)
     
-    success_count = 0
-    fail_count = 0
-    
+    catalog = get_catalog()
+    preprocessor = None if args.raw_pdf else PdfPreprocessor(args.extract_workers)
     with tempfile.TemporaryDirectory() as temp_dir:
-        for doc in DOCUMENT_URLS:
-            url = doc["url"]
-            display_name = doc["display_name"]
-            description = doc.get("description", "")
-            
-            print(f"\n📄 Processing: {display_name}")
-            
-            temp_file = os.path.join(temp_dir, display_name)
-            
-            if download_from_url(url, temp_file):
-                if upload_to_corpus(temp_file, display_name, description):
-                    success_count += 1
-                else:
-                    fail_count += 1
-            else:
-                fail_count += 1
+        try:
+            report = ingest_urls(
+                CORPUS_NAME,
+                documents_from_args(args, DOCUMENT_URLS),
+                temp_dir,
+                download_workers=args.download_workers,
+                upload_workers=args.upload_workers,
+                rate=args.rate,
+                max_temp_bytes=args.max_temp_mb * 1024 * 1024,
+                sync=args.sync,
+                catalog=catalog,
+                pdf_preprocessor=preprocessor,
+            )
+        finally:
+            if preprocessor is not None:
+                preprocessor.close()
+    
+    if report.changed_corpus:
+        # Drop answers and retrieval results cached against the old corpus contents
+        mark_corpus_changed(CORPUS_NAME)
     
-    # List all files in corpus
+    # List all files in corpus (from the local catalog; re-listed remotely only when stale)
     print("\n" + "="*60)
     print("📚 Files currently in corpus:")
     print("="*60)
     try:
-        files = list(rag.list_files(corpus_name=CORPUS_NAME))
+        catalog.refresh_files(CORPUS_NAME)
+        files = catalog.list_files(CORPUS_NAME)
         for i, file in enumerate(files, 1):
             print(f"{i}. {file.display_name}")
         print(f"\nTotal: {len(files)} files")
     except Exception as e:
         print(f"Error listing files: {e}")
-    
-    print("\n" + "="*60)
-    print(f"✅ Successful uploads: {success_count}")
-    print(f"❌ Failed uploads: {fail_count}")
-    print("="*60)
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Download real documents and upload them to the RAG corpus.")
+    add_ingest_arguments(parser)
+    main(parser.parse_args())
@@ -0,0 +1,10 @@
+import sys
+from pathlib import Path
+
+# The agent's modules import each other by bare name, as the worker and the
+# benchmarks run them: put rag_agent/, rag_agent/temporal/ and
+# rag_agent/benchmarks/ on the path.
+_root = Path(__file__).resolve().parents[2] / "rag_agent"
+for _path in (_root, _root / "temporal", _root / "benchmarks"):
+    if str(_path) not in sys.path:
+        sys.path.insert(0, str(_path))
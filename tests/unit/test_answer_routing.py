@@ -0,0 +1,87 @@
+import pytest
+
+import agent
+from cache import AnswerCache, LRUTTLCache
+from router import CORPUS, SMALL_TALK
+
+
+@pytest.fixture
+def routed(monkeypatch):
+    """Fake small-talk and root agents that count their calls; `escalate` makes small talk escalate."""
+    calls = {SMALL_TALK: 0, CORPUS: 0, "escalate": False}
+
+    async def small_talk(query, on_partial):
+        calls[SMALL_TALK] += 1
+        return None if calls["escalate"] else ["Hello!"]
+
+    async def run_agent(pool, query, on_partial):
+        calls[CORPUS] += 1
+        return ["From the documents."]
+
+    monkeypatch.setattr(agent, "answer_cache", AnswerCache(LRUTTLCache()))
+    monkeypatch.setattr(agent, "ROUTER_ENABLED", True)
+    monkeypatch.setattr(agent, "_answer_small_talk", small_talk)
+    monkeypatch.setattr(agent, "_run_agent", run_agent)
+    monkeypatch.setattr(agent, "get_runner_pool", lambda: None)
+    monkeypatch.setattr(
+        agent,
+        "answer_cache_namespace",
+        lambda route=CORPUS: (
+            "small-talk-model" if route == SMALL_TALK else "root-model"
+        ),
+    )
+    return calls
+
+
+@pytest.mark.asyncio
+async def test_small_talk_answers_are_cached_under_the_small_talk_model(routed):
+    assert await agent.ask_rag_agent("hello") == "Hello!"
+    assert await agent.ask_rag_agent("hello") == "Hello!"
+
+    assert routed[SMALL_TALK] == 1
+    assert agent.answer_cache.exact.get("small-talk-model|hello") == "Hello!"
+    assert agent.answer_cache.exact.get("root-model|hello") is None
+
+
+@pytest.mark.asyncio
+async def test_escalated_small_talk_is_cached_under_the_root_model(routed):
+    routed["escalate"] = True
+    assert await agent.ask_rag_agent("hello") == "From the documents."
+    assert await agent.ask_rag_agent("hello") == "From the documents."
+
+    assert routed[CORPUS] == 1
+    assert agent.answer_cache.exact.get("root-model|hello") == "From the documents."
+    assert agent.answer_cache.exact.get("small-talk-model|hello") is None
+
+
+@pytest.mark.asyncio
+async def test_cache_hits_are_streamed(routed):
+    await agent.ask_rag_agent("what is in the report?")
+    deltas = []
+
+    async def on_partial(text):
+        deltas.append(text)
+
+    answer = await agent.ask_rag_agent("what is in the report?", on_partial)
+
+    assert routed[CORPUS] == 1
+    assert deltas == [answer] == ["From the documents."]
+
+
+@pytest.mark.asyncio
+async def test_conversation_turns_skip_the_router_and_cache(routed, monkeypatch):
+    turns = []
+
+    async def run_agent(pool, query, on_partial, **session):
+        turns.append(session)
+        return [f"Turn {len(turns)}."]
+
+    monkeypatch.setattr(agent, "_run_agent", run_agent)
+    monkeypatch.setattr(agent, "get_conversation_pool", lambda: None)
+
+    assert await agent.ask_rag_agent("hello", session_id="s1") == "Turn 1."
+    assert await agent.ask_rag_agent("hello", session_id="s1") == "Turn 2."
+
+    assert turns == [{"user_id": "anonymous", "session_id": "s1"}] * 2
+    assert routed[SMALL_TALK] == 0
+    assert agent.answer_cache.exact.get("small-talk-model|hello") is None
@@ -0,0 +1,31 @@
+import pytest
+from temporalio.exceptions import ApplicationError
+
+from shared import MAX_INLINE_ANSWERS, BatchInput
+from workflow import RAGAgentBatchWorkflow
+
+
+@pytest.mark.parametrize(
+    "batch",
+    [
+        BatchInput(queries=["q"] * (MAX_INLINE_ANSWERS + 1)),
+        BatchInput(queries_file="questions.txt"),
+    ],
+)
+def test_unbounded_inline_answers_are_rejected(batch):
+    with pytest.raises(ApplicationError) as raised:
+        RAGAgentBatchWorkflow._check_output(batch)
+    assert raised.value.type == "BatchTooLarge"
+    assert raised.value.non_retryable
+
+
+def test_output_file_lifts_the_cap():
+    RAGAgentBatchWorkflow._check_output(BatchInput(queries=["q"] * MAX_INLINE_ANSWERS))
+    RAGAgentBatchWorkflow._check_output(
+        BatchInput(
+            queries=["q"] * (MAX_INLINE_ANSWERS + 1), output_file="answers.jsonl"
+        )
+    )
+    RAGAgentBatchWorkflow._check_output(
+        BatchInput(queries_file="questions.txt", output_file="answers.jsonl")
+    )
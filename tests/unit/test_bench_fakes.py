@@ -0,0 +1,63 @@
+import pytest
+from bench_components import measure, percentile
+from fakes import FakeGemini, FakeRetrievalBackend, install_fake_agent
+
+import agent
+from context import drop_near_duplicates
+
+QUERY = "What does the annual report say about research spending?"
+
+
+@pytest.fixture
+def fake_agent(monkeypatch):
+    """Install the offline agent, restoring the real singletons afterwards."""
+    for name in (
+        "_ask_vertex_retrieval",
+        "_root_agent",
+        "_runner_pool",
+        "_conversation_pool",
+        "_small_talk_pool",
+        "answer_cache",
+    ):
+        monkeypatch.setattr(agent, name, getattr(agent, name))
+    return install_fake_agent(FakeGemini(answer_chunks=3))
+
+
+@pytest.mark.asyncio
+async def test_fake_agent_retrieves_then_streams_its_answer(fake_agent):
+    deltas = []
+
+    async def on_partial(text):
+        deltas.append(text)
+
+    answer = await fake_agent.ask_rag_agent(QUERY, on_partial)
+
+    assert "Citations:" in answer
+    assert "document_0.pdf" in answer
+    assert "".join(deltas) == answer
+
+
+def test_fake_chunks_survive_near_duplicate_removal():
+    chunks = FakeRetrievalBackend(chunks=10).retrieve(QUERY, 10, None)
+    kept, saved = drop_near_duplicates(chunks, 6)
+    assert len(kept) == 10
+    assert saved == 0
+
+
+def test_percentile_is_nearest_rank():
+    samples = [float(i) for i in range(1, 101)]
+    assert percentile(samples, 50) == 50
+    assert percentile(samples, 99) == 99
+    assert percentile([7.0], 95) == 7.0
+
+
+@pytest.mark.asyncio
+async def test_measure_reports_latency_and_allocations():
+    async def noop():
+        return None
+
+    result = await measure("noop", noop, iterations=10, warmup=1, alloc_iterations=2)
+
+    assert result["iterations"] == 10
+    assert result["p50_us"] <= result["p95_us"] <= result["p99_us"]
+    assert {"alloc_peak_kib", "retained_kib_per_call"} <= result.keys()
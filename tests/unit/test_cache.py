@@ -0,0 +1,102 @@
+import time
+
+import pytest
+
+from cache import AnswerCache, LRUTTLCache, SemanticCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(time, "monotonic", clock)
+    return clock
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUTTLCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats.evictions == 1
+
+
+def test_lru_entries_expire(clock):
+    cache = LRUTTLCache(ttl_seconds=10)
+    cache.put("a", 1)
+    clock.now += 9
+    assert cache.get("a") == 1
+    clock.now += 1
+
+    assert cache.get("a") is None
+    assert cache.stats.expirations == 1
+    assert len(cache) == 0
+
+
+def test_semantic_cache_matches_nearby_vectors_in_the_same_namespace():
+    cache = SemanticCache(max_distance=0.05)
+    cache.put("corpus@1", [1.0, 0.0, 0.0], "answer")
+
+    assert cache.get("corpus@1", [2.0, 0.1, 0.0]) == "answer"
+    assert cache.get("corpus@1", [0.0, 1.0, 0.0]) is None
+    assert cache.get("corpus@2", [1.0, 0.0, 0.0]) is None
+
+
+def test_semantic_cache_overwrites_least_recently_used_slot(clock):
+    cache = SemanticCache(max_entries=2)
+    cache.put("ns", [1.0, 0.0], "x")
+    clock.now += 1
+    cache.put("ns", [0.0, 1.0], "y")
+    clock.now += 1
+    assert cache.get("ns", [1.0, 0.0]) == "x"
+    clock.now += 1
+    cache.put("ns", [-1.0, 0.0], "z")
+
+    assert cache.get("ns", [0.0, 1.0]) is None
+    assert cache.get("ns", [1.0, 0.0]) == "x"
+    assert cache.stats.evictions == 1
+
+
+def test_semantic_cache_entries_expire(clock):
+    cache = SemanticCache(ttl_seconds=10)
+    cache.put("ns", [1.0, 0.0], "x")
+    clock.now += 10
+
+    assert cache.get("ns", [1.0, 0.0]) is None
+
+
+def test_semantic_cache_forgets_namespaces_without_live_entries():
+    cache = SemanticCache(max_entries=2)
+    for generation in range(10):
+        cache.put(f"corpus@{generation}", [1.0, 0.0], generation)
+
+    assert len(cache._namespaces) <= cache.max_entries + 1
+    assert cache.get("corpus@9", [1.0, 0.0]) == 9
+    assert cache.get("corpus@0", [1.0, 0.0]) is None
+
+
+def test_answer_cache_promotes_semantic_hits_to_the_exact_tier():
+    embeddings = {
+        "what is r&d spend?": [1.0, 0.0],
+        "what is the r&d spend?": [1.0, 0.01],
+    }
+    cache = AnswerCache(LRUTTLCache(), SemanticCache(), embeddings.__getitem__)
+    lookup = cache.get("What is R&D spend?", "ns")
+    assert lookup.answer is None
+    cache.put(lookup, "12%")
+
+    hit = cache.get("What is  the R&D spend?", "ns")
+    assert (hit.answer, hit.tier) == ("12%", "semantic")
+    assert cache.get("what is the r&d spend?", "ns").tier == "exact"
+    assert cache.get("What is R&D spend?", "other").answer is None
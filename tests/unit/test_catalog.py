@@ -0,0 +1,119 @@
+from types import SimpleNamespace
+
+import pytest
+
+from catalog import CorpusCatalog, resolve_corpus_name
+
+CORPUS = "projects/p/locations/l/ragCorpora/1"
+
+
+def _corpus(update_time="2026-01-01", count=2, name=CORPUS, display_name="docs"):
+    return SimpleNamespace(
+        name=name,
+        display_name=display_name,
+        description="",
+        update_time=update_time,
+        rag_files_count=count,
+    )
+
+
+def _file(n, display_name=None):
+    return SimpleNamespace(
+        name=f"{CORPUS}/ragFiles/{n}",
+        display_name=display_name or f"doc-{n}.txt",
+        description="",
+    )
+
+
+class Listing:
+    """Stands in for rag.list_files: returns `files` and counts the calls."""
+
+    def __init__(self, files):
+        self.files = files
+        self.calls = 0
+
+    def __call__(self, corpus_name):
+        self.calls += 1
+        return self.files
+
+
+@pytest.fixture
+def catalog():
+    catalog = CorpusCatalog(":memory:")
+    yield catalog
+    catalog.close()
+
+
+def test_files_are_listed_once_while_fresh(catalog):
+    listing = Listing([_file(1), _file(2)])
+
+    assert catalog.refresh_files(CORPUS, list_fn=listing)
+    assert not catalog.refresh_files(CORPUS, list_fn=listing)
+    assert listing.calls == 1
+    assert [f.display_name for f in catalog.list_files(CORPUS)] == [
+        "doc-1.txt",
+        "doc-2.txt",
+    ]
+
+    assert catalog.refresh_files(CORPUS, max_age_seconds=0, list_fn=listing)
+    assert catalog.refresh_files(CORPUS, force=True, list_fn=listing)
+    assert listing.calls == 3
+
+
+def test_remote_corpus_changes_make_files_stale(catalog):
+    listing = Listing([_file(1), _file(2)])
+    catalog.refresh_corpora(lambda: [_corpus()])
+    catalog.refresh_files(CORPUS, list_fn=listing)
+
+    catalog.refresh_corpora(lambda: [_corpus()])
+    assert not catalog.get_corpus(CORPUS).files_stale
+    assert not catalog.refresh_files(CORPUS, list_fn=listing)
+
+    catalog.refresh_corpora(lambda: [_corpus(count=3)])
+    assert catalog.get_corpus(CORPUS).files_stale
+    assert catalog.refresh_files(CORPUS, list_fn=listing)
+
+    catalog.refresh_corpora(lambda: [_corpus(update_time="2026-02-01", count=3)])
+    assert catalog.refresh_files(CORPUS, list_fn=listing)
+    assert listing.calls == 3
+
+
+def test_refresh_drops_deleted_files_and_keeps_upload_metadata(catalog):
+    catalog.record_file(CORPUS, _file(1), sha256="abc", source="https://a")
+    catalog.record_file(CORPUS, _file(2), sha256="def")
+
+    catalog.refresh_files(CORPUS, list_fn=Listing([_file(1), _file(3)]))
+
+    files = {f.name.rsplit("/", 1)[-1]: f for f in catalog.list_files(CORPUS)}
+    assert sorted(files) == ["1", "3"]
+    assert (files["1"].sha256, files["1"].source) == ("abc", "https://a")
+    assert catalog.find_files(CORPUS, sha256="def") == []
+
+
+def test_deleted_corpora_are_forgotten_with_their_files(catalog):
+    other = "projects/p/locations/l/ragCorpora/2"
+    catalog.refresh_corpora(
+        lambda: [_corpus(), _corpus(name=other, display_name="old")]
+    )
+    catalog.record_file(other, _file(1))
+
+    assert catalog.refresh_corpora(lambda: [_corpus()]) == 1
+    assert catalog.get_corpus(other) is None
+    assert catalog.list_files(other) == []
+
+
+def test_resolve_corpus_name_lists_corpora_only_on_a_miss(catalog, monkeypatch):
+    listed = []
+
+    def refresh_corpora():
+        listed.append(True)
+        return CorpusCatalog.refresh_corpora(catalog, lambda: [_corpus()])
+
+    monkeypatch.setattr(catalog, "refresh_corpora", refresh_corpora)
+
+    assert resolve_corpus_name(CORPUS, catalog) == CORPUS
+    assert resolve_corpus_name("docs", catalog) == CORPUS
+    assert resolve_corpus_name("docs", catalog) == CORPUS
+    assert len(listed) == 1
+    with pytest.raises(ValueError):
+        resolve_corpus_name("missing", catalog)
@@ -0,0 +1,125 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from temporalio.client import WorkflowExecutionStatus
+from temporalio.common import WorkflowIDConflictPolicy, WorkflowIDReusePolicy
+from temporalio.service import RPCError, RPCStatusCode
+
+from coalescing import start_query_workflow
+from shared import Conversation, query_workflow_id
+
+
+class FakeClient:
+    """Records started workflows; `describe` reports the latest run (None: not found)."""
+
+    def __init__(self, described=None):
+        self.described = described
+        self.described_ids = []
+        self.started = []
+
+    def get_workflow_handle(self, workflow_id, run_id=None):
+        client = self
+
+        class Handle:
+            id = workflow_id
+
+            async def describe(self):
+                client.described_ids.append(workflow_id)
+                if client.described is None:
+                    raise RPCError("not found", RPCStatusCode.NOT_FOUND, b"")
+                return client.described
+
+        handle = Handle()
+        handle.run_id = run_id
+        return handle
+
+    async def start_workflow(self, workflow, **kwargs):
+        self.started.append(kwargs)
+        return SimpleNamespace(id=kwargs["id"], run_id=None)
+
+
+def _closed(status=WorkflowExecutionStatus.COMPLETED, seconds_ago=5.0):
+    return SimpleNamespace(
+        status=status,
+        close_time=datetime.now(timezone.utc) - timedelta(seconds=seconds_ago),
+        run_id="run-1",
+    )
+
+
+def test_workflow_ids_are_per_tenant_and_normalized():
+    assert query_workflow_id("What is RAG?", tenant="a") == query_workflow_id(
+        "  what is   rag? ", tenant="a"
+    )
+    assert query_workflow_id("What is RAG?", tenant="a") != query_workflow_id(
+        "What is RAG?", tenant="b"
+    )
+    assert query_workflow_id("What is RAG?", "corpus-1") != query_workflow_id(
+        "What is RAG?", "corpus-2"
+    )
+
+
+@pytest.mark.asyncio
+async def test_identical_queries_attach_to_one_execution_per_tenant():
+    client = FakeClient()
+
+    first = await start_query_workflow(client, "What is RAG?", tenant="a")
+    again = await start_query_workflow(client, "what is rag?", tenant="a")
+    other = await start_query_workflow(client, "What is RAG?", tenant="b")
+
+    assert first.id == again.id != other.id
+    for started in client.started:
+        assert started["id_conflict_policy"] == WorkflowIDConflictPolicy.USE_EXISTING
+        assert started["id_reuse_policy"] == WorkflowIDReusePolicy.ALLOW_DUPLICATE
+    assert client.started[2]["priority"].fairness_key == "b"
+    # Without a freshness window, closed executions aren't looked up.
+    assert client.described_ids == []
+
+
+@pytest.mark.asyncio
+async def test_recent_answer_is_reused_within_the_freshness_window():
+    client = FakeClient(_closed(seconds_ago=5))
+
+    handle = await start_query_workflow(client, "What is RAG?", freshness_seconds=60)
+
+    assert (handle.id, handle.run_id) == (query_workflow_id("What is RAG?"), "run-1")
+    assert client.started == []
+
+
+@pytest.mark.parametrize(
+    "described",
+    [
+        None,
+        _closed(seconds_ago=120),
+        _closed(status=WorkflowExecutionStatus.FAILED),
+        SimpleNamespace(
+            status=WorkflowExecutionStatus.RUNNING, close_time=None, run_id="run-1"
+        ),
+    ],
+    ids=["not-found", "stale", "failed", "running"],
+)
+@pytest.mark.asyncio
+async def test_otherwise_a_workflow_is_started_or_attached(described):
+    client = FakeClient(described)
+
+    handle = await start_query_workflow(client, "What is RAG?", freshness_seconds=60)
+
+    assert len(client.started) == 1
+    assert handle.id == query_workflow_id("What is RAG?")
+
+
+@pytest.mark.asyncio
+async def test_conversation_turns_are_never_coalesced():
+    client = FakeClient(described=_closed())
+
+    first = await start_query_workflow(
+        client, "What next?", session_id="s1", user_id="u1", freshness_seconds=60
+    )
+    again = await start_query_workflow(client, "What next?", session_id="s1")
+
+    assert first.id != again.id
+    assert client.described_ids == []
+    query, hedge, conversation = client.started[0]["args"]
+    assert (query, hedge) == ("What next?", None)
+    assert conversation == Conversation(session_id="s1", user_id="u1")
+    assert client.started[1]["args"][2].user_id == "anonymous"
@@ -0,0 +1,156 @@
+import json
+import os
+from datetime import datetime
+
+import pytest
+from google.api_core.exceptions import PreconditionFailed
+from temporalio.api.common.v1 import Payload
+
+from codec import (
+    ENCODING_BLOB_REF,
+    ENCODING_ZLIB,
+    ENCODING_ZSTD,
+    CompressionCodec,
+    GcsBlobStore,
+    LocalBlobStore,
+    data_converter,
+    zstandard,
+)
+from shared import PartialAnswer
+
+PROSE = " ".join(
+    f"Revenue grew in quarter {i % 4 + 1} as research spending rose."
+    for i in range(200)
+)
+
+
+def _payload(text: str) -> Payload:
+    return Payload(metadata={"encoding": b"json/plain"}, data=json.dumps(text).encode())
+
+
+@pytest.mark.asyncio
+async def test_small_payloads_pass_through():
+    codec = CompressionCodec(min_bytes=512)
+    payload = _payload("hi")
+
+    assert await codec.encode([payload]) == [payload]
+
+
+@pytest.mark.asyncio
+async def test_large_payloads_are_compressed_and_restored():
+    codec = CompressionCodec()
+    payload = _payload(PROSE)
+
+    [encoded] = await codec.encode([payload])
+    assert encoded.metadata["encoding"] == ENCODING_ZLIB
+    assert encoded.ByteSize() < payload.ByteSize() / 4
+    assert await codec.decode([encoded]) == [payload]
+
+
+@pytest.mark.asyncio
+async def test_incompressible_payloads_are_kept_as_is():
+    codec = CompressionCodec(min_bytes=16)
+    payload = Payload(metadata={"encoding": b"binary/plain"}, data=os.urandom(4096))
+
+    assert await codec.encode([payload]) == [payload]
+
+
+@pytest.mark.skipif(zstandard is None, reason="zstandard isn't installed")
+@pytest.mark.asyncio
+async def test_zstd_round_trip():
+    codec = CompressionCodec("zstd")
+    [encoded] = await codec.encode([_payload(PROSE)])
+
+    assert encoded.metadata["encoding"] == ENCODING_ZSTD
+    assert await codec.decode([encoded]) == [_payload(PROSE)]
+
+
+@pytest.mark.asyncio
+async def test_decoding_ignores_the_current_settings():
+    [encoded] = await CompressionCodec("zlib").encode([_payload(PROSE)])
+
+    assert await CompressionCodec("none").decode([encoded]) == [_payload(PROSE)]
+
+
+@pytest.mark.asyncio
+async def test_oversized_payloads_are_offloaded_by_content_hash(tmp_path):
+    codec = CompressionCodec(blob_store=LocalBlobStore(str(tmp_path)), offload_bytes=64)
+    payload = _payload(PROSE)
+
+    first, second = await codec.encode([payload, payload])
+    assert first.metadata["encoding"] == ENCODING_BLOB_REF
+    assert first == second
+    assert len([name for _, _, names in os.walk(tmp_path) for name in names]) == 1
+    assert await codec.decode([first]) == [payload]
+
+
+@pytest.mark.asyncio
+async def test_corrupt_blobs_are_rejected(tmp_path):
+    store = LocalBlobStore(str(tmp_path))
+    codec = CompressionCodec(blob_store=store, offload_bytes=64)
+    [encoded] = await codec.encode([_payload(PROSE)])
+    key = json.loads(encoded.data)["key"]
+    with open(store._path(key), "r+b") as f:
+        f.write(b"\0\0\0\0")
+
+    with pytest.raises(RuntimeError, match="corrupt"):
+        await codec.decode([encoded])
+
+
+@pytest.mark.asyncio
+async def test_offloaded_payload_needs_a_blob_store(tmp_path):
+    [encoded] = await CompressionCodec(
+        blob_store=LocalBlobStore(str(tmp_path)), offload_bytes=64
+    ).encode([_payload(PROSE)])
+
+    with pytest.raises(RuntimeError, match="PAYLOAD_BLOB_STORE"):
+        await CompressionCodec().decode([encoded])
+
+
+@pytest.mark.asyncio
+async def test_data_converter_round_trips_workflow_values():
+    converter = data_converter(CompressionCodec(min_bytes=16))
+    values = [PROSE, PartialAnswer(3, PROSE)]
+
+    payloads = await converter.encode(values)
+    assert all(payload.metadata["encoding"] == ENCODING_ZLIB for payload in payloads)
+    assert await converter.decode(payloads, [str, PartialAnswer]) == values
+
+
+class FakeGcsBucket:
+    """Objects by name; uploads honour `if_generation_match=0` like GCS."""
+
+    def __init__(self):
+        self.objects: dict[str, bytes] = {}
+        self.custom_times: dict[str, datetime] = {}
+
+    def blob(self, name: str):
+        bucket = self
+
+        class Blob:
+            custom_time = None
+
+            def upload_from_string(self, data, if_generation_match=None):
+                if if_generation_match == 0 and name in bucket.objects:
+                    raise PreconditionFailed("object exists")
+                bucket.objects[name] = data
+                bucket.custom_times[name] = self.custom_time
+
+            def patch(self):
+                bucket.custom_times[name] = self.custom_time
+
+        return Blob()
+
+
+@pytest.mark.asyncio
+async def test_gcs_put_of_an_existing_blob_refreshes_its_age():
+    store = object.__new__(GcsBlobStore)
+    store._bucket = FakeGcsBucket()
+    store.prefix = "payloads"
+
+    await store.put("abc", b"data")
+    written = store._bucket.custom_times["payloads/abc"]
+    await store.put("abc", b"data")
+
+    assert store._bucket.objects == {"payloads/abc": b"data"}
+    assert store._bucket.custom_times["payloads/abc"] > written
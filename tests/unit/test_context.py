@@ -0,0 +1,90 @@
+import numpy as np
+
+import context
+from context import (
+    chunk_tokens,
+    drop_near_duplicates,
+    hamming_distances,
+    pack_context,
+    simhash,
+)
+
+REPORT = (
+    "Research and development spending rose to 12 percent of revenue in 2023, driven by "
+    "investment in the new platform and the expansion of the machine learning team in Dublin."
+)
+
+
+def _chunk(title: str, text: str, distance: float | None = None) -> dict:
+    chunk = {"title": title, "text": text}
+    if distance is not None:
+        chunk["distance"] = distance
+    return chunk
+
+
+def test_pack_context_keeps_the_leading_chunks_that_fit():
+    chunks = [_chunk(f"doc{i}", "word " * 40) for i in range(4)]
+    budget = 2 * chunk_tokens(chunks[0]) + 10
+
+    packed = pack_context(chunks, budget)
+
+    assert [chunk["title"] for chunk in packed] == ["doc0", "doc1"]
+
+
+def test_pack_context_truncates_the_next_chunk_to_the_remaining_budget():
+    chunks = [_chunk("short", "word " * 20), _chunk("long", "word " * 400)]
+
+    packed = pack_context(chunks, token_budget=200, min_partial_tokens=64)
+
+    assert [chunk["title"] for chunk in packed] == ["short", "long"]
+    assert packed[1]["text"].endswith("…")
+    assert sum(chunk_tokens(chunk) for chunk in packed) <= 200
+
+
+def test_pack_context_always_includes_the_best_chunk():
+    packed = pack_context(
+        [_chunk("long", "word " * 400)], token_budget=10, min_partial_tokens=64
+    )
+
+    assert len(packed) == 1
+    assert len(packed[0]["text"]) < 400 * 5
+
+
+def test_drop_near_duplicates_keeps_the_closest_copy():
+    chunks = [
+        # Same words, different formatting: SimHash only sees the words.
+        _chunk("mirror", REPORT.upper().replace(", ", " - "), distance=0.30),
+        _chunk(
+            "other",
+            "The board approved a dividend of 40 cents per share payable in March.",
+            distance=0.35,
+        ),
+        _chunk("annual report", REPORT, distance=0.20),
+    ]
+
+    kept, saved = drop_near_duplicates(chunks)
+
+    assert [chunk["title"] for chunk in kept] == ["other", "annual report"]
+    assert saved == chunk_tokens(chunks[0])
+
+
+def test_drop_near_duplicates_leaves_distinct_chunks_alone():
+    chunks = [
+        _chunk("a", REPORT),
+        _chunk("b", "The board approved a dividend of 40 cents per share."),
+    ]
+
+    assert drop_near_duplicates(chunks) == (chunks, 0)
+
+
+def test_hamming_distances_without_bitwise_count(monkeypatch):
+    fingerprints = np.array(
+        [simhash(REPORT), simhash("dividend"), 0, 2**64 - 1], dtype=np.uint64
+    )
+    expected = [
+        [bin(int(a) ^ int(b)).count("1") for b in fingerprints] for a in fingerprints
+    ]
+    assert hamming_distances(fingerprints).tolist() == expected
+
+    monkeypatch.delattr(context.np, "bitwise_count", raising=False)
+    assert hamming_distances(fingerprints).tolist() == expected
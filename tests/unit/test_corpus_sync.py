@@ -0,0 +1,69 @@
+from types import SimpleNamespace
+
+from shared_libraries.corpus_sync import IncrementalSync, SyncManifest, SyncSource
+from shared_libraries.uploader import UploadResult
+
+
+class Deleter:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.deleted: list[str] = []
+
+    def __call__(self, rag_file: str) -> None:
+        if self.fail:
+            raise RuntimeError("503 Service Unavailable")
+        self.deleted.append(rag_file)
+
+
+def upload(sync: IncrementalSync, path, text: str, rag_file: str) -> None:
+    path.write_text(text)
+    job = sync.job_for(SyncSource("doc", str(path), "doc.txt"))
+    assert job is not None
+    sync.record(UploadResult(job, rag_file=SimpleNamespace(name=rag_file)))
+
+
+def test_changed_source_replaces_its_rag_file(tmp_path):
+    manifest = SyncManifest(str(tmp_path / "manifest.json"), "corpora/1")
+    deleter = Deleter()
+    sync = IncrementalSync(manifest, delete_fn=deleter)
+    upload(sync, tmp_path / "doc.txt", "v1", "ragFiles/1")
+    upload(sync, tmp_path / "doc.txt", "v2", "ragFiles/2")
+
+    assert deleter.deleted == ["ragFiles/1"]
+    assert manifest.entries["doc"]["rag_file"] == "ragFiles/2"
+    assert sync.job_for(SyncSource("doc", str(tmp_path / "doc.txt"), "doc.txt")) is None
+
+
+def test_failed_delete_of_replaced_rag_file_is_retried_by_next_sync(tmp_path):
+    path = str(tmp_path / "manifest.json")
+    manifest = SyncManifest(path, "corpora/1")
+    sync = IncrementalSync(manifest, delete_fn=Deleter(fail=True))
+    upload(sync, tmp_path / "doc.txt", "v1", "ragFiles/1")
+    upload(sync, tmp_path / "doc.txt", "v2", "ragFiles/2")
+    sync.retry_pending_deletes()
+    manifest.save()
+
+    assert manifest.pending_delete == ["ragFiles/1"]
+    assert sync.report.delete_errors
+
+    manifest = SyncManifest.load("corpora/1", path)
+    deleter = Deleter()
+    sync = IncrementalSync(manifest, delete_fn=deleter)
+    sync.retry_pending_deletes()
+
+    assert deleter.deleted == ["ragFiles/1"]
+    assert manifest.pending_delete == []
+    assert manifest.entries["doc"]["rag_file"] == "ragFiles/2"
+
+
+def test_removed_source_keeps_its_entry_until_deleted(tmp_path):
+    manifest = SyncManifest(str(tmp_path / "manifest.json"), "corpora/1")
+    sync = IncrementalSync(manifest, delete_fn=Deleter(fail=True))
+    upload(sync, tmp_path / "doc.txt", "v1", "ragFiles/1")
+
+    sync.remove_missing(["doc"])
+    assert "doc" in manifest.entries
+
+    sync.delete_fn = Deleter()
+    sync.remove_missing(["doc"])
+    assert "doc" not in manifest.entries
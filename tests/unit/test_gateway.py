@@ -0,0 +1,121 @@
+import asyncio
+
+import pytest
+
+import server
+from shared import StreamState
+
+
+class FakeHandle:
+    """A running workflow whose partial answer is `text` until `finish()` is called."""
+
+    def __init__(self, workflow_id: str = "rag-query-1"):
+        self.id = workflow_id
+        self.run_id = "run-1"
+        self.result_run_id = "run-1"
+        self.text = ""
+        self._result = asyncio.get_running_loop().create_future()
+
+    def finish(self, answer: str) -> None:
+        self._result.set_result(answer)
+
+    async def result(self) -> str:
+        return await asyncio.shield(self._result)
+
+    async def query(self, name: str, result_type=None) -> StreamState:
+        return StreamState(text=self.text, done=self._result.done(), attempt=1)
+
+
+@pytest.fixture
+def gateway(monkeypatch):
+    handles: dict[str, FakeHandle] = {}
+
+    async def start_query_workflow(client, query, **kwargs):
+        if query not in handles:
+            handles[query] = FakeHandle()
+        return handles[query]
+
+    monkeypatch.setattr(server, "start_query_workflow", start_query_workflow)
+    monkeypatch.setattr(server, "POLL_INTERVAL_SECONDS", 0.01)
+    gateway = server.Gateway(server.TemporalClientPool([object()]))
+    gateway.handles = handles
+    yield gateway
+    gateway.close()
+
+
+@pytest.mark.asyncio
+async def test_requests_for_one_workflow_share_a_stream(gateway):
+    first = await gateway.open(server.AskRequest(query="q"))
+    second = await gateway.open(server.AskRequest(query="q"))
+    assert first is second
+
+    gateway.handles["q"].finish("the answer")
+    await asyncio.wait_for(first.wait_done(), 1)
+    assert first.answer == "the answer"
+    assert gateway.streams == {}
+
+
+@pytest.mark.asyncio
+async def test_request_after_last_subscriber_left_gets_a_fresh_stream(gateway):
+    first = await gateway.open(server.AskRequest(query="q"))
+    first.unsubscribe()
+    # `_follow` hasn't unwound yet; the cancelled stream must not be reused.
+    second = await gateway.open(server.AskRequest(query="q"))
+    assert second is not first
+    assert first.cancelled
+
+    gateway.handles["q"].text = "partial"
+    gateway.handles["q"].finish("the answer")
+    await asyncio.wait_for(second.wait_done(), 1)
+    assert second.error is None
+    assert second.answer == "the answer"
+
+
+@pytest.mark.asyncio
+async def test_cancelled_stream_reports_an_error_not_an_empty_answer(gateway):
+    stream = await gateway.open(server.AskRequest(query="q"))
+    stream.unsubscribe()
+    await asyncio.sleep(0.05)
+    assert stream.done
+    assert stream.answer is None
+    assert stream.error is not None
+
+
+@pytest.mark.asyncio
+async def test_response_releases_subscription_when_client_disconnects_early(gateway):
+    stream = await gateway.open(server.AskRequest(query="q"))
+    response = server.AnswerStreamResponse(stream, deadline=float("inf"))
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        pass
+
+    await response({"type": "http"}, receive, send)
+    assert stream.cancelled
+
+
+@pytest.mark.asyncio
+async def test_polling_backs_off_while_the_answer_is_unchanged(gateway, monkeypatch):
+    monkeypatch.setattr(server, "POLL_MAX_INTERVAL_SECONDS", 0.04)
+    stream = await gateway.open(server.AskRequest(query="q"))
+    handle = gateway.handles["q"]
+    queries = 0
+    query = handle.query
+
+    async def counting_query(name, result_type=None):
+        nonlocal queries
+        queries += 1
+        return await query(name, result_type)
+
+    handle.query = counting_query
+    await asyncio.sleep(0.3)
+    # Fixed 10ms polling would have queried ~30 times.
+    assert 0 < queries <= 10
+
+    handle.text = "partial"
+    await asyncio.wait_for(stream.wait_changed(stream.version, 1), 1)
+    assert stream.text == "partial"
+    handle.finish("the answer")
+    await asyncio.wait_for(stream.wait_done(), 1)
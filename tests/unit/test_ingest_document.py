@@ -0,0 +1,147 @@
+import dataclasses
+from types import SimpleNamespace
+
+import pytest
+from temporalio.testing import ActivityEnvironment
+from vertexai.preview import rag
+
+import activities
+import catalog
+from shared import IngestFileInput, IngestSource
+from shared_libraries.uploader import ConcurrentUploader
+
+
+class RecordingUpload:
+    """Returns a fake RagFile for each upload and remembers the jobs."""
+
+    def __init__(self):
+        self.jobs = []
+
+    def __call__(self, corpus_name, job):
+        self.jobs.append(job)
+        return SimpleNamespace(name=f"{corpus_name}/ragFiles/{len(self.jobs)}")
+
+
+@pytest.fixture
+def upload(monkeypatch):
+    upload = RecordingUpload()
+    uploader = ConcurrentUploader("corpora/1", rate=1000, upload_fn=upload)
+    monkeypatch.setattr(activities, "_uploader", lambda corpus_name: uploader)
+    return upload
+
+
+@pytest.fixture
+def ingest_request(tmp_path):
+    path = tmp_path / "report.txt"
+    path.write_text("annual report")
+    return IngestFileInput(
+        "corpora/1", IngestSource(str(path), "report.txt", "Annual report")
+    )
+
+
+def _environment(heartbeat_details=()):
+    env = ActivityEnvironment()
+    env.info = dataclasses.replace(env.info, heartbeat_details=list(heartbeat_details))
+    heartbeats = []
+    env.on_heartbeat = heartbeats.append
+    return env, heartbeats
+
+
+@pytest.mark.asyncio
+async def test_upload_records_content_hash_and_rag_file(upload, ingest_request):
+    env, heartbeats = _environment()
+    ingested = await env.run(activities.ingest_document, ingest_request)
+
+    assert ingested.rag_file == "corpora/1/ragFiles/1"
+    sha256 = heartbeats[0]["sha256"]
+    assert upload.jobs[0].description == f"Annual report [sha256:{sha256}]"
+    assert heartbeats[-1] == {
+        "stage": "uploaded",
+        "rag_file": "corpora/1/ragFiles/1",
+        "bytes": 13,
+    }
+
+
+@pytest.mark.asyncio
+async def test_retry_returns_file_reported_by_previous_attempt(upload, ingest_request):
+    env, _ = _environment(
+        [{"stage": "uploaded", "rag_file": "corpora/1/ragFiles/7", "bytes": 13}]
+    )
+    ingested = await env.run(activities.ingest_document, ingest_request)
+
+    assert ingested.rag_file == "corpora/1/ragFiles/7"
+    assert upload.jobs == []
+
+
+@pytest.mark.asyncio
+async def test_retry_after_interrupted_upload_finds_file_in_corpus(
+    monkeypatch, upload, ingest_request
+):
+    found = []
+    monkeypatch.setattr(
+        activities,
+        "_find_ingested",
+        lambda corpus, name, sha256: found.append(sha256) or "corpora/1/ragFiles/3",
+    )
+    env, _ = _environment([{"stage": "upload", "bytes": 13, "sha256": "abc"}])
+    ingested = await env.run(activities.ingest_document, ingest_request)
+
+    assert found == ["abc"]
+    assert ingested.rag_file == "corpora/1/ragFiles/3"
+    assert upload.jobs == []
+
+
+@pytest.mark.asyncio
+async def test_retry_uploads_when_corpus_has_no_copy(
+    monkeypatch, upload, ingest_request
+):
+    monkeypatch.setattr(activities, "_find_ingested", lambda corpus, name, sha256: None)
+    env, _ = _environment([{"stage": "upload", "bytes": 13, "sha256": "abc"}])
+    ingested = await env.run(activities.ingest_document, ingest_request)
+
+    assert ingested.rag_file == "corpora/1/ragFiles/1"
+    assert len(upload.jobs) == 1
+
+
+@pytest.fixture
+def listed(monkeypatch):
+    """A fresh in-memory catalog, and a corpus listing that records its calls."""
+    monkeypatch.setattr(catalog, "_catalog", catalog.CorpusCatalog(":memory:"))
+    calls = []
+
+    def list_files(corpus_name):
+        calls.append(corpus_name)
+        return [
+            SimpleNamespace(
+                name=f"{corpus_name}/ragFiles/9",
+                display_name="report.txt",
+                description="Annual report [sha256:abc]",
+            )
+        ]
+
+    monkeypatch.setattr(rag, "list_files", list_files)
+    return calls
+
+
+def test_find_ingested_prefers_the_catalog(listed):
+    catalog.get_catalog().record_file(
+        "corpora/1",
+        SimpleNamespace(name="corpora/1/ragFiles/4"),
+        "report.txt",
+        sha256="abc",
+    )
+
+    assert (
+        activities._find_ingested("corpora/1", "report.txt", "abc")
+        == "corpora/1/ragFiles/4"
+    )
+    assert listed == []
+
+
+def test_find_ingested_lists_the_corpus_on_a_catalog_miss(listed):
+    assert (
+        activities._find_ingested("corpora/1", "report.txt", "abc")
+        == "corpora/1/ragFiles/9"
+    )
+    assert activities._find_ingested("corpora/1", "report.txt", "def") is None
+    assert listed == ["corpora/1", "corpora/1"]
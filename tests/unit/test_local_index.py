@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from embeddings import HashingEmbedder
+from local_index import BruteForceIndex, IVFIndex, build_index, load_index
+from retrieval import LocalIndexBackend
+
+TOPICS = [
+    "quarterly revenue grew in the cloud segment",
+    "the board approved a new dividend policy",
+    "employee headcount rose across engineering teams",
+    "carbon emissions fell after the data center upgrade",
+    "litigation risks are described in the legal section",
+    "capital expenditure was spent on new offices",
+]
+
+
+def _chunks(texts):
+    return [
+        {"title": f"doc-{i}", "source_uri": f"gs://docs/{i}", "text": text}
+        for i, text in enumerate(texts)
+    ]
+
+
+@pytest.fixture
+def embed():
+    return HashingEmbedder()
+
+
+def test_flat_index_round_trip(tmp_path, embed):
+    path = build_index(
+        _chunks(TOPICS),
+        embed.embed_many(TOPICS),
+        str(tmp_path / "index"),
+        embedding_model="hashing",
+    )
+    index = load_index(path)
+
+    assert isinstance(index, BruteForceIndex) and len(index) == len(TOPICS)
+    [best, *rest] = index.search(embed(TOPICS[3]), top_k=3)
+    assert best["title"] == "doc-3"
+    assert best["distance"] == pytest.approx(0.0, abs=1e-5)
+    assert [r["distance"] for r in rest] == sorted(r["distance"] for r in rest)
+    assert index.search(embed(TOPICS[3]), top_k=3, max_distance=0.01) == [best]
+
+
+def test_ivf_index_finds_exact_neighbours_when_probing_every_list(tmp_path, embed):
+    texts = [f"{topic} in region {i}" for topic in TOPICS for i in range(5)]
+    vectors = embed.embed_many(texts)
+    path = build_index(
+        _chunks(texts), vectors, str(tmp_path / "index"), kind="ivf", n_clusters=4
+    )
+    index = load_index(path, nprobe=4)
+    assert isinstance(index, IVFIndex)
+    assert index.list_offsets[-1] == len(texts)
+
+    exact = BruteForceIndex(
+        vectors / np.linalg.norm(vectors, axis=1, keepdims=True), _chunks(texts)
+    )
+    for query in (texts[0], texts[17], "dividend policy"):
+        # Compare distances: chunks of one topic can tie.
+        expected = [r["distance"] for r in exact.search(embed(query), top_k=5)]
+        found = [r["distance"] for r in index.search(embed(query), top_k=5)]
+        assert found == pytest.approx(expected, abs=1e-5)
+
+
+def test_mismatched_chunks_and_vectors_are_rejected(tmp_path, embed):
+    with pytest.raises(ValueError):
+        build_index(_chunks(TOPICS), embed.embed_many(TOPICS[:2]), str(tmp_path))
+
+
+def test_backend_reloads_a_rebuilt_index(tmp_path, embed):
+    path = str(tmp_path / "index")
+    build_index(
+        _chunks(TOPICS[:3]),
+        embed.embed_many(TOPICS[:3]),
+        path,
+        embedding_model="hashing",
+    )
+    backend = LocalIndexBackend(path)
+    identity = backend.cache_identity()
+    assert len(backend.retrieve(TOPICS[0], top_k=10, max_distance=None)) == 3
+
+    build_index(
+        _chunks(TOPICS), embed.embed_many(TOPICS), path, embedding_model="hashing"
+    )
+
+    assert backend.cache_identity() != identity
+    assert len(backend.retrieve(TOPICS[0], top_k=10, max_distance=None)) == len(TOPICS)
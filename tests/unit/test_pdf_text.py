@@ -0,0 +1,106 @@
+import pytest
+
+from shared_libraries import pdf_text
+from shared_libraries.pdf_text import TextChunk, chunk_pages, clean_pages, extract_pdf
+
+
+def _body(n: int) -> str:
+    # Digits are ignored when spotting boilerplate, so page bodies differ in letters.
+    return f"Section {chr(ord('A') + n - 1)}."
+
+
+def _report(pages: int) -> list[tuple[int, list[str]]]:
+    return [
+        (n, ["ACME Quarterly Report", _body(n), f"Page {n} of {pages}"])
+        for n in range(1, pages + 1)
+    ]
+
+
+def test_clean_pages_drops_headers_footers_and_page_numbers():
+    pages = _report(4)
+    # An edge line on fewer than BOILERPLATE_MIN_PAGES pages is content.
+    pages[0][1].insert(2, "Draft")
+    pages[1][1].insert(2, "Draft")
+
+    assert list(clean_pages(pages)) == [
+        (1, "Section A. Draft"),
+        (2, "Section B. Draft"),
+        (3, "Section C."),
+        (4, "Section D."),
+    ]
+
+
+def test_clean_pages_sees_headers_beyond_the_lookahead_window():
+    pages = _report(pdf_text.LOOKAHEAD_PAGES + 4)
+    cleaned = list(clean_pages(pages))
+    assert [number for number, _ in cleaned] == [number for number, _ in pages]
+    assert all(text == _body(n) for n, text in cleaned)
+
+
+def test_clean_pages_joins_hyphenated_lines():
+    lines = ["The recon-", "struction of 2020-", "era data", "Self-", "Driving cars"]
+    assert list(clean_pages([(1, lines)])) == [
+        (1, "The reconstruction of 2020- era data Self- Driving cars")
+    ]
+
+
+def test_chunks_record_the_pages_they_span():
+    pages = [(1, "aaaa bbbb"), (2, "cccc dddd"), (3, "eeee ffff gggg")]
+    assert list(chunk_pages(pages, chunk_chars=20)) == [
+        TextChunk("aaaa bbbb cccc dddd", 1, 2),
+        TextChunk("eeee ffff gggg", 3, 3),
+    ]
+
+
+def test_chunk_after_a_cut_at_a_page_boundary_starts_on_the_next_page():
+    pages = [(1, "aaaa bbbb"), (2, "cccc dddd"), (3, "eeee")]
+    assert list(chunk_pages(pages, chunk_chars=12)) == [
+        TextChunk("aaaa bbbb", 1, 1),
+        TextChunk("cccc dddd", 2, 2),
+        TextChunk("eeee", 3, 3),
+    ]
+
+
+def test_overlapping_chunks_keep_the_page_of_the_repeated_text():
+    pages = [(1, "aaaa bbbb"), (2, "cccc dddd")]
+    assert list(chunk_pages(pages, chunk_chars=12, overlap_chars=5)) == [
+        TextChunk("aaaa bbbb", 1, 1),
+        TextChunk("bbbb cccc", 1, 2),
+        TextChunk("cccc dddd", 2, 2),
+    ]
+
+
+def test_chunk_pages_rejects_overlap_as_large_as_the_chunk():
+    with pytest.raises(ValueError):
+        list(chunk_pages([(1, "text")], chunk_chars=10, overlap_chars=10))
+
+
+def test_extract_pdf_writes_page_tagged_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_text, "iter_pages", lambda path: iter(_report(3)))
+    source = tmp_path / "report.pdf"
+    source.write_bytes(b"%PDF-1.7 " + b"x" * 1000)
+    out = tmp_path / "report.txt"
+
+    prepared = extract_pdf(str(source), str(out), chunk_chars=24)
+
+    assert out.read_text() == (
+        "[pages 1-2]\nSection A. Section B.\n\n[page 3]\nSection C.\n\n"
+    )
+    assert (prepared.pages, prepared.chunks) == (3, 2)
+    assert prepared.bytes_in == 1009
+    assert prepared.bytes_out == len(out.read_bytes())
+
+
+def test_extract_pdf_removes_partial_output_on_failure(tmp_path, monkeypatch):
+    def broken(path):
+        yield from _report(1)
+        raise ValueError("corrupt xref table")
+
+    monkeypatch.setattr(pdf_text, "iter_pages", broken)
+    source = tmp_path / "broken.pdf"
+    source.write_bytes(b"%PDF-1.7")
+    out = tmp_path / "broken.txt"
+
+    with pytest.raises(ValueError):
+        extract_pdf(str(source), str(out))
+    assert not out.exists()
@@ -0,0 +1,86 @@
+import time
+
+import pytest
+
+from shared_libraries.rate_limit import AdaptiveRateLimiter, TokenBucket
+
+
+class Clock:
+    """Stands in for time.monotonic and time.sleep: sleeping advances the clock."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(time, "sleep", clock.sleep)
+    return clock
+
+
+def test_bucket_allows_a_burst_then_paces(clock):
+    bucket = TokenBucket(rate=2, capacity=3)
+
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.acquire() == pytest.approx(0.5)
+    assert bucket.acquire() == pytest.approx(0.5)
+
+
+def test_bucket_refills_up_to_capacity(clock):
+    bucket = TokenBucket(rate=1, capacity=2)
+    bucket.acquire(2)
+    clock.now += 60
+
+    assert bucket.acquire(2) == 0.0
+    assert bucket.acquire() == pytest.approx(1.0)
+
+
+def test_bucket_rejects_non_positive_rate():
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0)
+
+
+def test_adaptive_limiter_increases_additively_up_to_max(clock):
+    limiter = AdaptiveRateLimiter(rate=10, max_rate=11, increase=0.5)
+    limiter.on_success()
+    assert limiter.rate == 10.5
+    for _ in range(5):
+        limiter.on_success()
+    assert limiter.rate == 11
+
+
+def test_adaptive_limiter_halves_on_throttling_and_drops_its_burst(clock):
+    limiter = AdaptiveRateLimiter(rate=4, min_rate=1)
+    limiter.on_throttled()
+    assert limiter.rate == 2
+    # The saved-up token is gone, so the next call waits a full interval.
+    assert limiter.acquire() == pytest.approx(0.5)
+
+    for _ in range(5):
+        clock.now += limiter.cooldown
+        limiter.on_throttled()
+    assert limiter.rate == 1
+
+
+def test_adaptive_limiter_cuts_the_rate_once_per_cooldown(clock):
+    limiter = AdaptiveRateLimiter(rate=8, cooldown=2.0)
+
+    # Eight uploads in flight are throttled together: one cut, not eight.
+    assert [limiter.on_throttled() for _ in range(8)] == [True] + [False] * 7
+    assert limiter.rate == 4
+
+    clock.now += 1.0
+    assert not limiter.on_throttled()
+    clock.now += 1.0
+    assert limiter.on_throttled()
+    assert limiter.rate == 2
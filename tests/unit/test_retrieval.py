@@ -0,0 +1,129 @@
+import pytest
+
+import agent
+from cache import LRUTTLCache
+from retrieval import RetrievalTool
+
+
+class FakeBackend:
+    """Returns `chunks` for every query and counts the calls."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.generation = 0
+        self.calls = []
+
+    def cache_identity(self):
+        return ("fake", self.generation)
+
+    def retrieve(self, query, top_k, max_distance):
+        self.calls.append(top_k)
+        return self.chunks[:top_k]
+
+
+def _chunk(i, distance=0.1):
+    return {
+        "title": f"doc-{i}",
+        "source_uri": f"gs://docs/{i}",
+        "text": f"chunk {i}",
+        "distance": distance,
+    }
+
+
+def _tool(backend, **kwargs):
+    return RetrievalTool(
+        name="retrieve", description="Retrieve", backend=backend, **kwargs
+    )
+
+
+@pytest.mark.asyncio
+async def test_retrieval_cache_hits_until_the_corpus_changes():
+    backend = FakeBackend([_chunk(i) for i in range(3)])
+    tool = _tool(backend, cache=LRUTTLCache())
+
+    first = await tool.retrieve("What is RAG?")
+    assert await tool.retrieve("  what is rag? ") == first
+    assert len(backend.calls) == 1
+
+    backend.generation += 1
+    await tool.retrieve("What is RAG?")
+    assert len(backend.calls) == 2
+
+
+def _build(monkeypatch, backend="vertex", **env):
+    monkeypatch.setattr(agent, "RETRIEVAL_BACKEND", backend)
+    for name in ("RETRIEVAL_CACHE_ENABLED", "RETRIEVAL_ADAPTIVE_ENABLED"):
+        monkeypatch.delenv(name, raising=False)
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    return agent.build_retrieval_tool("retrieve", "Retrieve", [], 10, 0.6)
+
+
+def test_disabling_the_cache_keeps_adaptive_retrieval(monkeypatch):
+    tool = _build(monkeypatch, RETRIEVAL_CACHE_ENABLED="0")
+
+    assert isinstance(tool, RetrievalTool)
+    assert tool.cache is None
+    assert tool.initial_top_k < tool.similarity_top_k
+    assert tool.dedup_max_bits is not None
+
+
+def test_disabling_adaptive_retrieval_keeps_the_cache(monkeypatch):
+    tool = _build(monkeypatch, RETRIEVAL_ADAPTIVE_ENABLED="0")
+
+    assert tool.cache is not None
+    assert tool.initial_top_k == tool.similarity_top_k
+    assert tool.dedup_max_bits is None
+    assert tool.context_token_budget is None
+
+
+def test_builtin_backend_uses_gemini_retrieval(monkeypatch):
+    from google.adk.tools.retrieval.vertex_ai_rag_retrieval import (
+        VertexAiRagRetrieval,
+    )
+
+    assert isinstance(_build(monkeypatch, "vertex-builtin"), VertexAiRagRetrieval)
+
+
+@pytest.mark.asyncio
+async def test_adaptive_top_k_stops_at_a_strong_first_page():
+    backend = FakeBackend([_chunk(i) for i in range(10)])
+    tool = _tool(backend, similarity_top_k=10, initial_top_k=2, min_strong=2)
+
+    assert len(await tool.retrieve("q")) == 2
+    assert backend.calls == [2]
+
+
+@pytest.mark.asyncio
+async def test_adaptive_top_k_doubles_while_results_are_weak():
+    chunks = [_chunk(0)] + [_chunk(i, distance=0.8) for i in range(1, 10)]
+    backend = FakeBackend(chunks)
+    tool = _tool(backend, similarity_top_k=10, initial_top_k=2, min_strong=2)
+
+    assert len(await tool.retrieve("q")) == 10
+    assert backend.calls == [2, 4, 8, 10]
+
+
+@pytest.mark.asyncio
+async def test_adaptive_top_k_stops_when_the_threshold_cut_results():
+    backend = FakeBackend([_chunk(0, distance=0.8)])
+    tool = _tool(backend, similarity_top_k=10, initial_top_k=2)
+
+    assert len(await tool.retrieve("q")) == 1
+    assert backend.calls == [2]
+
+
+@pytest.mark.asyncio
+async def test_tool_output_is_packed_into_the_token_budget():
+    chunks = [{**_chunk(i), "text": f"chunk {i} " + "word " * 200} for i in range(5)]
+    tool = _tool(
+        FakeBackend(chunks),
+        similarity_top_k=5,
+        context_token_budget=450,
+        dedup_max_bits=None,
+    )
+
+    output = await tool.run_async(args={"query": "q"}, tool_context=None)
+
+    assert [chunk["title"] for chunk in output] == ["doc-0", "doc-1"]
+    assert set(output[0]) == {"title", "text"}
@@ -0,0 +1,86 @@
+import pytest
+
+import agent
+from router import CORPUS, SMALL_TALK, classify_intent, is_escalation
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "hello",
+        "Hi there!",
+        "thanks a lot",
+        "Thank you very much!",
+        "how's it going?",
+        "ok, bye",
+        "",
+    ],
+)
+def test_small_talk_takes_the_fast_path(query):
+    route = classify_intent(query)
+    assert route.intent == SMALL_TALK
+    assert route.confidence >= agent.ROUTER_MIN_CONFIDENCE
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "What does the annual report say about R&D spending?",
+        "hi, what does the report say about revenue",
+        "explain fraud detection",
+        "revenue growth in the cloud segment during the last fiscal year",
+    ],
+)
+def test_questions_go_to_the_corpus(query):
+    assert classify_intent(query).intent == CORPUS
+
+
+@pytest.mark.parametrize("query", ["hey revenue", "lovely weather"])
+def test_unsure_small_talk_is_below_the_threshold(query):
+    route = classify_intent(query)
+    assert route.intent == SMALL_TALK
+    assert route.confidence < agent.ROUTER_MIN_CONFIDENCE
+
+
+def test_escalation_token_tolerates_case_and_punctuation():
+    assert is_escalation(" escalate. ")
+    assert not is_escalation("I can escalate that for you.")
+
+
+@pytest.fixture
+def routes(monkeypatch):
+    """Which agent answered; the small-talk agent escalates queries containing "report"."""
+    answered = []
+
+    async def small_talk(query, on_partial):
+        answered.append(SMALL_TALK)
+        return None if "report" in query else ["Hello!"]
+
+    async def run_agent(pool, query, on_partial):
+        answered.append(CORPUS)
+        return ["From the documents."]
+
+    monkeypatch.setattr(agent, "answer_cache", None)
+    monkeypatch.setattr(agent, "ROUTER_ENABLED", True)
+    monkeypatch.setattr(agent, "ROUTER_CASCADE", False)
+    monkeypatch.setattr(agent, "_answer_small_talk", small_talk)
+    monkeypatch.setattr(agent, "_run_agent", run_agent)
+    monkeypatch.setattr(agent, "get_runner_pool", lambda: None)
+    return answered
+
+
+@pytest.mark.asyncio
+async def test_ask_routes_by_intent_and_confidence(routes):
+    assert await agent.ask_rag_agent("hello") == "Hello!"
+    assert await agent.ask_rag_agent("hey revenue") == "From the documents."
+    assert await agent.ask_rag_agent("What is in the report?") == "From the documents."
+    assert routes == [SMALL_TALK, CORPUS, CORPUS]
+
+
+@pytest.mark.asyncio
+async def test_cascade_tries_the_small_model_and_escalates(routes, monkeypatch):
+    monkeypatch.setattr(agent, "ROUTER_CASCADE", True)
+
+    assert await agent.ask_rag_agent("lovely weather") == "Hello!"
+    assert await agent.ask_rag_agent("hey report") == "From the documents."
+    assert routes == [SMALL_TALK, SMALL_TALK, CORPUS]
@@ -0,0 +1,43 @@
+import pytest
+from google.adk.agents import LlmAgent
+
+from runner_pool import RunnerPool
+
+
+@pytest.fixture
+def pool():
+    return RunnerPool(
+        LlmAgent(name="test_agent", model="gemini-2.0-flash"),
+        idle_ttl_seconds=0,
+        sweep_interval_seconds=0,
+        delete_on_evict=False,
+    )
+
+
+@pytest.mark.asyncio
+async def test_shared_session_stays_in_use_until_every_run_releases_it(pool):
+    sid = await pool.acquire("user", "conversation")
+    await pool.acquire("user", sid)
+
+    await pool.release("user", sid, finished=False)
+    assert await pool.evict_idle() == 0
+
+    await pool.release("user", sid, finished=False)
+    assert await pool.evict_idle() == 1
+    assert len(pool) == 0
+
+
+@pytest.mark.asyncio
+async def test_finished_session_is_deleted_by_the_last_release(pool):
+    sid = await pool.acquire("user")
+    await pool.acquire("user", sid)
+
+    await pool.release("user", sid)
+    assert await pool.session_service.get_session(
+        app_name=pool.app_name, user_id="user", session_id=sid
+    )
+
+    await pool.release("user", sid)
+    assert not await pool.session_service.get_session(
+        app_name=pool.app_name, user_id="user", session_id=sid
+    )
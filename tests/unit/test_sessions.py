@@ -0,0 +1,154 @@
+import logging
+
+import pytest
+from google.adk.events import Event
+from google.adk.sessions.base_session_service import GetSessionConfig
+from google.genai import types
+
+from context import CHARS_PER_TOKEN
+from sessions import SUMMARY_PREFIX, SqliteSessionService
+
+APP, USER = "rag_agent", "alice"
+# Each turn's text is 10 tokens long.
+TURN_CHARS = 10 * CHARS_PER_TOKEN
+
+
+def _event(role: str, text: str, timestamp: float) -> Event:
+    return Event(
+        author="user" if role == "user" else "rag_agent",
+        content=types.Content(role=role, parts=[types.Part.from_text(text=text)]),
+        timestamp=timestamp,
+    )
+
+
+async def _converse(service: SqliteSessionService, exchanges: int) -> str:
+    session = await service.create_session(app_name=APP, user_id=USER)
+    for i in range(exchanges):
+        await service.append_event(
+            session, _event("user", f"q{i}".ljust(TURN_CHARS, "."), 2 * i + 1.0)
+        )
+        await service.append_event(
+            session, _event("model", f"a{i}".ljust(TURN_CHARS, "."), 2 * i + 2.0)
+        )
+    return session.id
+
+
+async def _texts(
+    service: SqliteSessionService,
+    session_id: str,
+    config: GetSessionConfig | None = None,
+) -> list[str]:
+    session = await service.get_session(
+        app_name=APP, user_id=USER, session_id=session_id, config=config
+    )
+    return [event.content.parts[0].text.rstrip(".") for event in session.events]
+
+
+@pytest.mark.asyncio
+async def test_oldest_turns_are_evicted_over_budget(tmp_path, caplog):
+    service = SqliteSessionService(
+        str(tmp_path / "sessions.db"), history_token_budget=45
+    )
+    with caplog.at_level(logging.INFO, logger="sessions"):
+        session_id = await _converse(service, 3)
+
+    assert await _texts(service, session_id) == ["q1", "a1", "q2", "a2"]
+    assert "Trimmed 2 turns" in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_latest_exchange_is_kept_even_over_budget(tmp_path):
+    service = SqliteSessionService(
+        str(tmp_path / "sessions.db"), history_token_budget=5
+    )
+    session_id = await _converse(service, 2)
+
+    assert await _texts(service, session_id) == ["q1", "a1"]
+
+
+@pytest.mark.asyncio
+async def test_evicted_turns_are_replayed_as_a_summary(tmp_path, caplog):
+    folded = []
+
+    async def summarize(summary, turns):
+        folded.append((summary, [(role, text.rstrip(".")) for role, text in turns]))
+        return "asked q0"
+
+    service = SqliteSessionService(
+        str(tmp_path / "sessions.db"), history_token_budget=45, summarizer=summarize
+    )
+    with caplog.at_level(logging.INFO, logger="sessions"):
+        session_id = await _converse(service, 3)
+
+    assert folded == [("", [("user", "q0"), ("model", "a0")])]
+    assert await _texts(service, session_id) == [
+        SUMMARY_PREFIX + "asked q0",
+        "q1",
+        "a1",
+        "q2",
+        "a2",
+    ]
+    assert "Summarized 2 turns" in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_failed_summary_is_logged_as_trimming(tmp_path, caplog):
+    calls = []
+
+    async def summarize(summary, turns):
+        calls.append(summary)
+        if len(calls) > 1:
+            raise RuntimeError("model unavailable")
+        return "asked q0"
+
+    service = SqliteSessionService(
+        str(tmp_path / "sessions.db"), history_token_budget=45, summarizer=summarize
+    )
+    session_id = await _converse(service, 3)
+    session = await service.get_session(
+        app_name=APP, user_id=USER, session_id=session_id
+    )
+    caplog.clear()
+    with caplog.at_level(logging.INFO, logger="sessions"):
+        await service.append_event(
+            session, _event("user", "q3".ljust(TURN_CHARS, "."), 7.0)
+        )
+        await service.append_event(
+            session, _event("model", "a3".ljust(TURN_CHARS, "."), 8.0)
+        )
+
+    # The earlier summary is kept; the turns that failed to fold in are just dropped.
+    assert await _texts(service, session_id) == [
+        SUMMARY_PREFIX + "asked q0",
+        "q2",
+        "a2",
+        "q3",
+        "a3",
+    ]
+    assert "trimming instead" in caplog.text
+    assert "Trimmed 2 turns" in caplog.text
+    assert "Summarized" not in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_get_session_filters_events(tmp_path):
+    service = SqliteSessionService(
+        str(tmp_path / "sessions.db"), history_token_budget=1000
+    )
+    session_id = await _converse(service, 3)
+
+    assert await _texts(service, session_id, GetSessionConfig(after_timestamp=4.0)) == [
+        "a1",
+        "q2",
+        "a2",
+    ]
+    assert await _texts(service, session_id, GetSessionConfig(num_recent_events=2)) == [
+        "q2",
+        "a2",
+    ]
+    assert (
+        await _texts(service, session_id, GetSessionConfig(num_recent_events=0)) == []
+    )
+    assert await _texts(
+        service, session_id, GetSessionConfig(after_timestamp=2.0, num_recent_events=3)
+    ) == ["a1", "q2", "a2"]
@@ -0,0 +1,118 @@
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+from google.adk.events import Event
+from google.genai import types
+from temporalio.testing import ActivityEnvironment
+
+import activities
+import agent
+from shared import PartialAnswer
+from workflow import RAGAgentWorkflow
+
+
+def test_partial_answers_accumulate_per_attempt():
+    wf = RAGAgentWorkflow()
+    wf.publish_partial(PartialAnswer(1, "The report "))
+    wf.publish_partial(PartialAnswer(1, "covers"))
+    assert wf.partial_answer().text == "The report covers"
+
+    # A retry regenerates the answer; late text from the failed attempt is dropped.
+    wf.publish_partial(PartialAnswer(2, "The "))
+    wf.publish_partial(PartialAnswer(1, "2023."))
+    state = wf.partial_answer()
+    assert (state.text, state.attempt, state.done) == ("The ", 2, False)
+
+
+class FakePool:
+    """A pool whose runner replays canned ADK events."""
+
+    def __init__(self, events):
+        async def run_async(**kwargs):
+            for event in events:
+                yield event
+
+        self.runner = SimpleNamespace(
+            agent=SimpleNamespace(model="gemini-test"), run_async=run_async
+        )
+
+    @asynccontextmanager
+    async def session(self, user_id, session_id=None, keep=False):
+        yield session_id or "session"
+
+
+def _event(text, partial):
+    return Event(
+        author="rag_agent",
+        content=types.Content(role="model", parts=[types.Part(text=text)]),
+        partial=partial,
+    )
+
+
+@pytest.mark.asyncio
+async def test_run_agent_streams_deltas_and_returns_final_text():
+    deltas = []
+
+    async def on_partial(text):
+        deltas.append(text)
+
+    pool = FakePool(
+        [
+            _event("The report ", True),
+            _event("covers 2023.", True),
+            _event("The report covers 2023.", False),
+        ]
+    )
+    parts = await agent._run_agent(pool, "what does it cover?", on_partial)
+
+    assert deltas == ["The report ", "covers 2023."]
+    assert parts == ["The report covers 2023."]
+
+
+class FakeHandle:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.signals = []
+
+    async def signal(self, name, partial):
+        if self.fail:
+            raise RuntimeError("workflow closed")
+        self.signals.append((name, partial))
+
+
+def _client(handle):
+    return SimpleNamespace(get_workflow_handle=lambda workflow_id, run_id: handle)
+
+
+@pytest.mark.asyncio
+async def test_publisher_sends_first_token_then_batches():
+    handle = FakeHandle()
+
+    async def publish():
+        publisher = activities._PartialAnswerPublisher(flush_interval=60)
+        for text in ["The", " report", " covers"]:
+            await publisher(text)
+        assert len(handle.signals) == 1
+        await publisher.flush()
+
+    await ActivityEnvironment(client=_client(handle)).run(publish)
+
+    assert [partial.text for _, partial in handle.signals] == ["The", " report covers"]
+    assert {name for name, _ in handle.signals} == {"publish_partial"}
+
+
+@pytest.mark.asyncio
+async def test_publisher_stops_streaming_after_a_failed_signal():
+    handle = FakeHandle(fail=True)
+
+    async def publish():
+        publisher = activities._PartialAnswerPublisher(flush_interval=0)
+        await publisher("The")
+        handle.fail = False
+        await publisher(" report")
+        await publisher.flush()
+
+    await ActivityEnvironment(client=_client(handle)).run(publish)
+
+    assert handle.signals == []
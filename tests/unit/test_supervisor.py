@@ -0,0 +1,108 @@
+import argparse
+from types import SimpleNamespace
+
+import pytest
+
+import supervisor
+from supervisor import MAX_RESTART_DELAY_SECONDS, STABLE_AFTER_SECONDS, Supervisor
+
+
+def _args(**overrides):
+    args = {
+        "processes": 0,
+        "workflow_processes": 1,
+        "activity_processes": 2,
+        "metrics_port": 9000,
+        "otel_metrics_port": None,
+        "max_concurrent_activities": None,
+        "max_concurrent_workflow_tasks": None,
+        "warm_up": False,
+        "otlp_endpoint": None,
+    }
+    args.update(overrides)
+    return argparse.Namespace(**args)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(supervisor, "time", clock)
+    return clock
+
+
+class FakeSupervisor(Supervisor):
+    """Starts fake processes that stay alive until `crash` is called."""
+
+    def __init__(self, args, clock):
+        super().__init__(args)
+        self.clock = clock
+        self.started = []
+
+    def start(self, slot):
+        slot.process = SimpleNamespace(
+            name=f"worker-{slot.index}", exitcode=None, is_alive=lambda: True
+        )
+        slot.started_at = self.clock.now
+        self.started.append(slot.index)
+
+    def crash(self, index):
+        self.slots[index].process.is_alive = lambda: False
+        self.slots[index].process.exitcode = 1
+
+
+def test_slots_get_roles_and_metrics_ports():
+    slots = Supervisor(_args()).slots
+
+    assert [slot.role for slot in slots] == ["workflow", "activity", "activity"]
+    assert [slot.metrics_port for slot in slots] == [9001, 9002, 9003]
+
+
+def test_nothing_to_run_is_an_error():
+    with pytest.raises(SystemExit):
+        Supervisor(_args(workflow_processes=0, activity_processes=0))
+
+
+def test_crashed_workers_restart_with_backoff(clock):
+    sup = FakeSupervisor(_args(workflow_processes=0, activity_processes=1), clock)
+    sup.check()
+    assert sup.started == [0]
+
+    sup.crash(0)
+    sup.check()  # First restart waits 1s.
+    assert sup.started == [0]
+    clock.now += 1
+    sup.check()
+    assert sup.started == [0, 0]
+
+    sup.crash(0)
+    sup.check()
+    clock.now += 1
+    sup.check()  # The second waits 2s.
+    assert sup.started == [0, 0]
+    clock.now += 1
+    sup.check()
+    assert sup.started == [0, 0, 0]
+    assert sup.slots[0].restarts == 2
+
+
+def test_backoff_is_capped_and_resets_once_stable(clock):
+    sup = FakeSupervisor(_args(workflow_processes=0, activity_processes=1), clock)
+    sup.check()
+    for _ in range(10):
+        sup.crash(0)
+        sup.check()
+        clock.now = sup.slots[0].restart_at
+        sup.check()
+    assert sup.slots[0].restart_at - clock.now <= MAX_RESTART_DELAY_SECONDS
+
+    clock.now += STABLE_AFTER_SECONDS + 1
+    sup.check()
+    assert sup.slots[0].restarts == 0
@@ -0,0 +1,141 @@
+import dataclasses
+from datetime import timedelta
+
+import pytest
+from google.adk.events import Event
+from google.genai import types
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import (
+    InMemorySpanExporter,
+)
+from temporalio.testing import ActivityEnvironment
+
+import telemetry
+from interceptors import _ActivityTelemetryInbound
+from telemetry import AgentRunTelemetry, stage
+
+
+class Recorded:
+    """Spans and metric points recorded through telemetry.py's instruments."""
+
+    def __init__(self, monkeypatch):
+        self.spans = InMemorySpanExporter()
+        tracer_provider = TracerProvider()
+        tracer_provider.add_span_processor(SimpleSpanProcessor(self.spans))
+        self.reader = InMemoryMetricReader()
+        meter = MeterProvider(metric_readers=[self.reader]).get_meter("test")
+        monkeypatch.setattr(telemetry, "tracer", tracer_provider.get_tracer("test"))
+        for attribute, name in (
+            ("stage_duration", "rag.stage.duration"),
+            ("model_tokens", "rag.model.tokens"),
+            ("context_tokens_saved", "rag.context.tokens_saved"),
+        ):
+            monkeypatch.setattr(telemetry, attribute, meter.create_histogram(name))
+
+    def span_attributes(self) -> list[dict]:
+        return [dict(span.attributes) for span in self.spans.get_finished_spans()]
+
+    def points(self, metric_name: str) -> list[tuple[dict, int]]:
+        data = self.reader.get_metrics_data()
+        return [
+            (dict(point.attributes), point.count)
+            for resource in data.resource_metrics
+            for scope in resource.scope_metrics
+            for metric in scope.metrics
+            if metric.name == metric_name
+            for point in metric.data.data_points
+        ]
+
+
+@pytest.fixture
+def recorded(monkeypatch):
+    return Recorded(monkeypatch)
+
+
+def test_stage_records_a_span_and_a_duration(recorded):
+    with stage("retrieval", backend="fake") as attributes:
+        attributes["cache_hit"] = True
+
+    expected = {"stage": "retrieval", "backend": "fake", "cache_hit": True}
+    assert recorded.span_attributes() == [expected]
+    assert recorded.points("rag.stage.duration") == [(expected, 1)]
+
+
+def test_stage_marks_errors(recorded):
+    with pytest.raises(RuntimeError), stage("retrieval"):
+        raise RuntimeError("backend down")
+
+    assert recorded.span_attributes() == [{"stage": "retrieval", "error": True}]
+
+
+def _event(author="rag_agent", partial=False, **part):
+    return Event(
+        author=author,
+        partial=partial,
+        content=types.Content(role="model", parts=[types.Part(**part)]),
+        usage_metadata=types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=100, candidates_token_count=20
+        )
+        if not partial
+        else None,
+    )
+
+
+def test_agent_run_stages_are_derived_from_events(recorded):
+    run = AgentRunTelemetry(model="gemini-test")
+    call = types.FunctionCall(name="retrieve", args={"query": "q"})
+    response = types.FunctionResponse(name="retrieve", response={"result": []})
+    for event in [
+        _event(function_call=call),
+        _event(author="user", function_response=response),
+        _event(partial=True, text="The "),
+        _event(partial=True, text="answer"),
+        _event(text="The answer"),
+    ]:
+        run.observe(event)
+
+    stages = [(a["stage"], a.get("function_call")) for a in recorded.span_attributes()]
+    assert stages == [
+        ("model_turn", True),
+        ("tool_call", None),
+        ("first_token", None),
+        ("model_turn", False),
+    ]
+    tokens = {
+        a["token_type"]: count for a, count in recorded.points("rag.model.tokens")
+    }
+    assert tokens == {"prompt": 2, "completion": 2}
+
+
+class Next:
+    def __init__(self):
+        self.calls = 0
+
+    async def execute_activity(self, input):
+        self.calls += 1
+        return "answer"
+
+
+@pytest.mark.asyncio
+async def test_activity_interceptor_records_queue_wait_and_run(recorded):
+    env = ActivityEnvironment()
+    started = env.info.started_time
+    env.info = dataclasses.replace(
+        env.info,
+        attempt=2,
+        current_attempt_scheduled_time=started - timedelta(seconds=3),
+    )
+    inbound = _ActivityTelemetryInbound(Next())
+
+    assert await env.run(inbound.execute_activity, None) == "answer"
+
+    spans = recorded.spans.get_finished_spans()
+    assert [span.name for span in spans] == [
+        "rag.activity.queue_wait",
+        "rag.activity.run",
+    ]
+    assert spans[0].end_time - spans[0].start_time == pytest.approx(3e9, rel=1e-3)
+    assert spans[1].attributes["retry"] is True
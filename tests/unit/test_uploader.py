@@ -0,0 +1,112 @@
+from types import SimpleNamespace
+
+import pytest
+from google.api_core.exceptions import ResourceExhausted
+
+from shared_libraries import uploader
+from shared_libraries.uploader import ConcurrentUploader, UploadJob, is_throttled
+
+
+class FlakyUpload:
+    """Fails the first `failures` calls with `error`, then returns a fake RagFile name."""
+
+    def __init__(self, error: Exception, failures: int):
+        self.error = error
+        self.failures = failures
+        self.calls = 0
+
+    def __call__(self, corpus_name: str, job: UploadJob) -> str:
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error
+        return f"{corpus_name}/ragFiles/{job.display_name}"
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(uploader.time, "sleep", lambda seconds: None)
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        ResourceExhausted("quota"),
+        RuntimeError("Failed in uploading the RagFile due to: <Response [429]>"),
+        ValueError(
+            "429 RESOURCE_EXHAUSTED: Quota exceeded for aiplatform.googleapis.com"
+        ),
+    ],
+)
+def test_throttling_is_retried_with_backoff(tmp_path, error):
+    path = tmp_path / "doc.txt"
+    path.write_text("text")
+    upload = FlakyUpload(error, failures=2)
+    instance = ConcurrentUploader("corpora/1", rate=1000, upload_fn=upload)
+
+    result = instance.upload(UploadJob(str(path), "doc.txt"))
+
+    assert result.ok
+    assert result.rag_file == "corpora/1/ragFiles/doc.txt"
+    assert result.attempts == 3
+    assert instance._throttled == 2
+    assert instance.limiter.rate < 1000
+
+
+def test_gives_up_after_max_retries(tmp_path):
+    upload = FlakyUpload(RuntimeError("<Response [429]>"), failures=100)
+    instance = ConcurrentUploader(
+        "corpora/1", rate=1000, max_retries=2, upload_fn=upload
+    )
+
+    result = instance.upload(UploadJob(str(tmp_path / "doc.txt"), "doc.txt"))
+
+    assert not result.ok
+    assert result.error.startswith("quota exhausted after 3 attempts")
+    assert upload.calls == 3
+
+
+def test_other_errors_fail_the_file_at_once(tmp_path):
+    upload = FlakyUpload(
+        RuntimeError("Failed in uploading the RagFile due to: <Response [400]>"),
+        failures=1,
+    )
+    instance = ConcurrentUploader("corpora/1", rate=1000, upload_fn=upload)
+
+    result = instance.upload(UploadJob(str(tmp_path / "doc.txt"), "doc.txt"))
+
+    assert not result.ok
+    assert upload.calls == 1
+    assert instance._throttled == 0
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        RuntimeError(
+            "Failed in indexing the RagFile due to: ",
+            {"code": 429, "message": "Quota exceeded", "status": "RESOURCE_EXHAUSTED"},
+        ),
+        RuntimeError(
+            "Failed in uploading the RagFile due to: ",
+            SimpleNamespace(response=SimpleNamespace(status_code=429)),
+        ),
+        RuntimeError("HTTP 429 while uploading report.pdf"),
+    ],
+)
+def test_is_throttled_reads_the_status(error):
+    assert is_throttled(error)
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        RuntimeError("Failed to upload report_4291.pdf: <Response [400]>"),
+        RuntimeError("Failed to upload report-429.pdf: <Response [400]>"),
+        RuntimeError(
+            "Failed in indexing the RagFile due to: ",
+            {"code": 400, "message": "Bad file invoice-429.pdf"},
+        ),
+    ],
+)
+def test_is_throttled_ignores_429_inside_names(error):
+    assert not is_throttled(error)
@@ -0,0 +1,159 @@
+import threading
+
+import pytest
+import requests
+
+from shared_libraries.uploader import ConcurrentUploader
+from shared_libraries.url_ingest import (
+    DiskBudget,
+    UrlDocument,
+    UrlIngestPipeline,
+    load_url_list,
+)
+
+
+class FakeResponse:
+    def __init__(self, body: bytes | None, content_length: bool = True):
+        self.body = body
+        self.headers = (
+            {"Content-Length": str(len(body))} if body and content_length else {}
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        if self.body is None:
+            raise requests.HTTPError("404 Client Error: Not Found")
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.body), chunk_size):
+            yield self.body[start : start + chunk_size]
+
+
+class FakeSession:
+    """Serves `bodies` by URL; a missing URL is a 404."""
+
+    def __init__(self, bodies):
+        self.bodies = bodies
+
+    def get(self, url, stream, timeout):
+        return FakeResponse(self.bodies.get(url))
+
+
+class RecordingUpload:
+    def __init__(self):
+        self.uploaded = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, corpus_name, job):
+        with open(job.path, "rb") as f:
+            body = f.read()
+        with self._lock:
+            self.uploaded[job.key] = body
+        return f"{corpus_name}/ragFiles/{job.display_name}"
+
+
+def _pipeline(tmp_path, bodies, upload, max_temp_bytes=1 << 20):
+    uploader = ConcurrentUploader("corpora/1", workers=2, rate=1000, upload_fn=upload)
+    return UrlIngestPipeline(
+        uploader,
+        str(tmp_path),
+        download_workers=3,
+        max_temp_bytes=max_temp_bytes,
+        session=FakeSession(bodies),
+    )
+
+
+def test_load_url_list_reads_urls_and_json_lines(tmp_path):
+    path = tmp_path / "urls.txt"
+    path.write_text(
+        "# annual reports\n"
+        "https://example.com/docs/report%202023.pdf\n"
+        "\n"
+        '{"url": "https://example.com/a.pdf", "display_name": "A", "description": "d"}\n'
+    )
+
+    assert list(load_url_list(str(path))) == [
+        UrlDocument("https://example.com/docs/report%202023.pdf", "report 2023.pdf"),
+        UrlDocument("https://example.com/a.pdf", "A", "d"),
+    ]
+
+
+def test_pipeline_uploads_downloads_and_cleans_up(tmp_path):
+    bodies = {f"https://example.com/{i}.txt": bytes([65 + i]) * 1000 for i in range(6)}
+    upload = RecordingUpload()
+    documents = [UrlDocument(url, url.rsplit("/", 1)[-1]) for url in bodies]
+    documents.append(UrlDocument("https://example.com/missing.txt", "missing.txt"))
+    pipeline = _pipeline(tmp_path, bodies, upload, max_temp_bytes=2500)
+
+    report = pipeline.run(documents)
+
+    assert upload.uploaded == bodies
+    assert len(report.succeeded) == 6
+    assert [f.document.display_name for f in report.download_failures] == [
+        "missing.txt"
+    ]
+    assert report.bytes_downloaded == 6000
+    assert 0 < report.peak_temp_bytes <= 2500
+    assert pipeline.budget.used == 0
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_prepare_can_skip_downloaded_files(tmp_path):
+    bodies = {"https://example.com/a.txt": b"a", "https://example.com/b.txt": b"b"}
+    upload = RecordingUpload()
+    pipeline = _pipeline(tmp_path, bodies, upload)
+
+    def prepare(document, path):
+        return None
+
+    report = pipeline.run(
+        [UrlDocument(url, url[-5:]) for url in bodies], prepare=prepare
+    )
+
+    assert report.skipped == 2
+    assert upload.uploaded == {}
+    assert pipeline.budget.used == 0
+
+
+def test_disk_budget_blocks_until_space_is_released():
+    budget = DiskBudget(max_bytes=100)
+    budget.reserve(80)
+    reserved = threading.Event()
+
+    def reserve():
+        budget.reserve(50)
+        reserved.set()
+
+    thread = threading.Thread(target=reserve)
+    thread.start()
+    assert not reserved.wait(0.05)
+
+    budget.release(80)
+    assert reserved.wait(1)
+    thread.join()
+    assert (budget.used, budget.peak) == (50, 80)
+
+
+def test_disk_budget_grants_an_oversized_reservation_when_empty():
+    budget = DiskBudget(max_bytes=100)
+    budget.reserve(500)
+    assert budget.used == 500
+
+
+@pytest.mark.parametrize("length", [True, False])
+def test_download_corrects_the_reservation_to_the_file_size(tmp_path, length):
+    pipeline = _pipeline(tmp_path, {}, RecordingUpload())
+    pipeline.session.get = lambda url, stream, timeout: FakeResponse(
+        b"x" * 10, content_length=length
+    )
+
+    size = pipeline.download(
+        UrlDocument("https://example.com/a.txt", "a.txt"), str(tmp_path / "a.txt")
+    )
+
+    assert size == pipeline.budget.used == 10